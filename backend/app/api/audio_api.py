@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.audio_index import get_audio_index
+
+router = APIRouter()
+
+def _list_audio(limit: int, offset: int):
+    index = get_audio_index()
+    entries = index.newest(offset, limit)
+    return {
+        "total": len(index),
+        "offset": offset,
+        "files": [entry.info(index.root) for entry in entries],
+    }
+
+@router.get("/audio")
+async def list_audio(limit: int = Query(50, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """AUDIO_DIR の音声ファイルを新しい順に返す（索引から引くのでディレクトリは走査しない）"""
+    # 索引の確認（stat / scandir）はイベントループを止めないようスレッドプールで行う
+    return await run_in_threadpool(_list_audio, limit, offset)
+
+@router.get("/audio/latest")
+async def latest_audio():
+    index = get_audio_index()
+    latest = await run_in_threadpool(index.latest)
+    if latest is None:
+        return JSONResponse(content={"error": "Audio file not found"}, status_code=404)
+    return latest.info(index.root)
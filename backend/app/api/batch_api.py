@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, conint
+from typing import Optional
+import os
+from app.config import AUDIO_DIR, ARCHIVE_DIR, get_job_workers
+from app.core.batch import BatchRun
+
+router = APIRouter()
+
+# 実行中・実行済みのバッチ（プロセス内のみ。進捗はチェックポイントにも残る）
+_batches = {}
+
+class BatchRequest(BaseModel):
+    source: Optional[str] = None  # 省略時は AUDIO_DIR
+    # 省略時は JOB_WORKERS。API からは JOB_WORKERS を超える並列数は指定できない
+    workers: Optional[conint(ge=1)] = None
+    archive: bool = True
+
+def _resolve_source(source: Optional[str]) -> str:
+    """AUDIO_DIR / ARCHIVE_DIR 配下のパスのみ受け付ける"""
+    path = os.path.abspath(os.path.join(AUDIO_DIR, source) if source else AUDIO_DIR)
+    for root in (AUDIO_DIR, ARCHIVE_DIR):
+        root = os.path.abspath(root)
+        if os.path.commonpath([root, path]) == root:
+            return path
+    raise HTTPException(status_code=400, detail="source は AUDIO_DIR か ARCHIVE_DIR 配下を指定してください")
+
+@router.post("/batch")
+async def start_batch(request: BatchRequest):
+    source = _resolve_source(request.source)
+    if not os.path.exists(source):
+        raise HTTPException(status_code=404, detail=f"source が見つかりません: {source}")
+    workers = request.workers
+    if workers is not None and workers > get_job_workers():
+        print(f"[API] バッチの並列数を JOB_WORKERS に制限します: {workers} → {get_job_workers()}")
+        workers = get_job_workers()
+    batch = BatchRun(source, workers, archive=request.archive)
+    _batches[batch.batch_id] = batch
+    batch.start()
+    print(f"[API] バッチ開始: {batch.batch_id} ({source})")
+    return JSONResponse(content=batch.summary(), status_code=202)
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    batch = _batches.get(batch_id)
+    if batch is None:
+        return JSONResponse(content={"batch_id": batch_id, "status": "not_found"}, status_code=404)
+    return batch.summary()
@@ -1,22 +1,38 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pathlib import Path
-from fastapi.responses import FileResponse
-import tempfile
+from starlette.concurrency import run_in_threadpool
+from app.core.job_queue import result_paths
+from app.core.segment_store import RENDERERS
+from app.core.delivery import prepare, prepare_rendered, respond
 
 router = APIRouter()
 
-@router.get("/download/txt/{file_id}")
-async def download_txt(file_id: str):
-    temp_dir = Path(tempfile.gettempdir())
-    path = temp_dir / f"{file_id}_result.txt"
-    if not path.exists():
-        return {"error": "Text result not found."}
-    return FileResponse(path, media_type="text/plain", filename="result.txt")
+def _read_file(path: str):
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(64 * 1024), b"")
 
-@router.get("/download/json/{file_id}")
-async def download_json(file_id: str):
-    temp_dir = Path(tempfile.gettempdir())
-    path = temp_dir / f"{file_id}_result.json"
-    if not path.exists():
-        return {"error": "JSON result not found."}
-    return FileResponse(path, media_type="application/json", filename="result.json")
\ No newline at end of file
+async def _legacy_response(request: Request, file_id: str, fmt: str):
+    """セグメントストア導入前に書き出された .txt / .json を返す"""
+    paths = dict(zip(("txt", "json"), result_paths(file_id)))
+    if fmt not in paths or not Path(paths[fmt]).exists():
+        return {"error": f"{fmt.upper()} result not found."}
+    media_type = "text/plain; charset=utf-8" if fmt == "txt" else "application/json"
+    path = paths[fmt]
+    variants = await run_in_threadpool(prepare, f"{file_id}/legacy-{fmt}", path, lambda: _read_file(path))
+    return respond(request.headers, variants, media_type, filename=f"result.{fmt}")
+
+@router.get("/download/{fmt}/{file_id}")
+async def download_result(fmt: str, file_id: str, request: Request):
+    """
+    セグメントストアから生成した TXT / JSON / SRT / VTT を返す。
+    初回に生成した結果（と gzip / zstd で圧縮した版）を使い回し、
+    Accept-Encoding・If-None-Match（304）・Range（206）に対応する。
+    """
+    if fmt not in RENDERERS:
+        return {"error": f"Unsupported format: {fmt}. Supported: {', '.join(RENDERERS)}"}
+    variants = await run_in_threadpool(prepare_rendered, file_id, fmt)
+    if variants is None:
+        return await _legacy_response(request, file_id, fmt)
+
+    _renderer, media_type, extension = RENDERERS[fmt]
+    return respond(request.headers, variants, media_type, filename=f"result.{extension}")
@@ -1,7 +1,58 @@
 from fastapi import APIRouter
+from app.config import get_batching_settings
+from app.core.model_pool import get_model_pool
+from app.core.result_cache import get_result_cache
+from app.core.startup import startup_timer
+from app.core.admission import get_admission_controller
+from app.core.batching import batcher_stats
+from app.core.storage import get_audio_store
+from app.core.feature_cache import get_feature_cache
+from app.core.profiles import get_profile, get_profiles
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+@router.get("/health/models")
+async def model_pool_stats():
+    """モデルプールのヒット／ミス／読み込み時間などの統計"""
+    return get_model_pool().stats()
+
+@router.get("/health/cache")
+async def result_cache_stats():
+    """結果キャッシュのヒット率／使用バイト数などの統計"""
+    return get_result_cache().stats()
+
+@router.get("/health/features")
+async def feature_cache_stats():
+    """log-mel・エンコーダー出力キャッシュのヒット数／使用バイト数などの統計"""
+    return get_feature_cache().stats()
+
+@router.get("/health/profiles")
+async def decoding_profiles():
+    """デコードプロファイルごとのモデル・ビーム幅・フォールバックの温度と上限"""
+    return {"default": get_profile().name, "profiles": [profile.info() for profile in get_profiles().values()]}
+
+@router.get("/health/startup")
+async def startup_report():
+    """起動フェーズごとの所要時間とウォームアップの状態"""
+    return startup_timer.report()
+
+@router.get("/health/admission")
+async def admission_status():
+    """メモリ予算・予約中／待機中のリクエストと受付数"""
+    return get_admission_controller().snapshot()
+
+@router.get("/health/batching")
+async def batching_stats():
+    """マイクロバッチの平均バッチサイズ・個別処理に回した数など"""
+    if not get_batching_settings()["enabled"]:
+        return {"enabled": False}
+    return {"enabled": True, "profiles": batcher_stats()}
+
+@router.get("/health/storage")
+async def storage_stats():
+    """音声ストレージの使用量・重複排除数・アーカイブ数"""
+    return get_audio_store().stats()
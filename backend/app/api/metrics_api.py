@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+from app.core.job_queue import get_job_queue
+from app.core.model_pool import get_model_pool
+from app.core.admission import get_admission_controller
+
+router = APIRouter()
+
+def _gauges():
+    memory = metrics.process_memory()
+    pool = get_model_pool().stats()
+    queue = get_job_queue()
+    admission = get_admission_controller().snapshot()
+    gauges = [
+        ("process_resident_memory_mb", "現在の RSS（MB）", memory["rss_mb"], {}),
+        ("process_peak_resident_memory_mb", "ピーク RSS（MB）", memory["peak_rss_mb"], {}),
+        ("whisper_job_queue_depth", "実行中＋実行待ちのジョブ数", queue.pending, {}),
+        ("whisper_job_queue_capacity", "受け付けるジョブの上限", queue.max_pending, {}),
+        ("whisper_model_pool_instances", "プール内のモデル数", pool["instances"], {}),
+        ("whisper_model_pool_in_use", "貸し出し中のモデル数", pool["in_use"], {}),
+        ("whisper_model_pool_resident_mb", "プール内のモデルの推定メモリ（MB）", pool["resident_mb"], {}),
+        ("whisper_admission_budget_mb", "アドミッション制御のメモリ予算（MB）", admission["budget_mb"], {}),
+        ("whisper_admission_reserved_mb", "予約中のメモリ（MB）", admission["reserved_mb"], {}),
+        ("whisper_admission_active", "予約中のリクエスト数", len(admission["active"]), {}),
+        ("whisper_admission_waiting", "メモリの空きを待っているリクエスト数", len(admission["waiting"]), {}),
+        ("whisper_audio_seconds_per_wall_second", "処理時間 1 秒あたりに文字起こしした音声の秒数", metrics.throughput(), {}),
+        ("whisper_metrics_enabled", "段階ごとの計測が有効か", 1 if metrics.ENABLED else 0, {}),
+    ]
+    for name, value in metrics.torch_stats().items():
+        gauges.append((f"torch_{name}", f"torch の {name}", value, {}))
+    return gauges
+
+def _counters():
+    admission = get_admission_controller().snapshot()
+    help_text = "メモリ不足で断ったリクエストの累計"
+    return [
+        ("whisper_admission_rejected_total", help_text, admission["rejected"], {"reason": "full"}),
+        ("whisper_admission_rejected_total", help_text, admission["timeouts"], {"reason": "timeout"}),
+    ]
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus のテキスト形式で段階ごとの所要時間・メモリ・キュー長などを返す"""
+    return PlainTextResponse(metrics.registry.render(_gauges(), _counters()), media_type="text/plain; version=0.0.4")
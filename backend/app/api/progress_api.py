@@ -0,0 +1,83 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+from app.core.broker import STATUS_DONE, STATUS_FAILED
+from app.core.job_queue import get_job_queue
+from app.core.progress import progress_hub, TERMINAL_STATUSES
+
+router = APIRouter()
+
+# 接続維持のためのコメントを送る間隔（秒）
+KEEPALIVE_SEC = 15
+# 別プロセスのワーカーが処理しているジョブは、この間隔でジョブテーブルを見に行く（秒）
+STORE_POLL_SEC = 1.0
+
+def _sse(state: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(state, ensure_ascii=False)}\n\n"
+
+@router.get("/progress/{file_id}")
+async def stream_progress(file_id: str):
+    """
+    文字起こしの進捗を Server-Sent Events で配信する。
+    data: {"status", "progress", "decoded_sec", "total_sec", "segments"}
+    （segments は長時間音声の分割処理などセグメント数が分かる経路でだけ増える）
+    完了（done / failed）を送ったらストリームを閉じる。
+    """
+    job = get_job_queue().store.get(file_id)
+    if job is None:
+        return JSONResponse(content={"file_id": file_id, "status": "not_found"}, status_code=404)
+
+    queue = progress_hub.subscribe(file_id)
+
+    async def events():
+        try:
+            # 購読開始時点の状態を最初に送る
+            current = get_job_queue().store.get(file_id)
+            state = progress_hub.latest(file_id) or {
+                "file_id": file_id,
+                "status": current["status"],
+                "progress": current["progress"],
+                "error": current["error"],
+            }
+            yield _sse(state)
+            if current["status"] in (STATUS_DONE, STATUS_FAILED):
+                return
+            # 別プロセスのワーカー（JOB_MODE=api）の進捗はこのプロセスに publish されないので、テーブルを見る
+            poll_sec = KEEPALIVE_SEC if get_job_queue().embedded else STORE_POLL_SEC
+            last = (current["status"], current["progress"])
+            idle_sec = 0.0
+            while True:
+                try:
+                    state = await asyncio.wait_for(queue.get(), timeout=poll_sec)
+                except asyncio.TimeoutError:
+                    current = get_job_queue().store.get(file_id)
+                    if current is not None and (current["status"], current["progress"]) != last:
+                        last = (current["status"], current["progress"])
+                        idle_sec = 0.0
+                        yield _sse({
+                            "file_id": file_id,
+                            "status": current["status"],
+                            "progress": current["progress"],
+                            "error": current["error"],
+                        })
+                        if current["status"] in (STATUS_DONE, STATUS_FAILED):
+                            return
+                        continue
+                    idle_sec += poll_sec
+                    if idle_sec >= KEEPALIVE_SEC:
+                        idle_sec = 0.0
+                        yield ": keepalive\n\n"
+                    continue
+                idle_sec = 0.0
+                yield _sse(state)
+                if state.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            progress_hub.unsubscribe(file_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
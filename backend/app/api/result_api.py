@@ -1,18 +1,46 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 from pathlib import Path
-import tempfile
 import json
+from starlette.concurrency import run_in_threadpool
+from app.core.broker import STATUS_DONE, STATUS_FAILED
+from app.core.job_queue import get_job_queue
+from app.core.delivery import prepare, prepare_rendered, respond
 
 router = APIRouter()
 
+def _legacy_body(text_path: Path, json_path: Path):
+    """保存済みの .json は解析せずにそのまま埋め込む"""
+    yield b'{"text": ' + json.dumps(text_path.read_text(encoding="utf-8"), ensure_ascii=False).encode("utf-8") + b', "json": '
+    with open(json_path, "rb") as f:
+        yield from iter(lambda: f.read(64 * 1024), b"")
+    yield b"}"
+
 @router.get("/result/{file_id}")
-async def get_result(file_id: str):
-    temp_dir = Path(tempfile.gettempdir())
-    text_path = temp_dir / "result.txt"
-    json_path = temp_dir / "result.json"
-    if not text_path.exists() or not json_path.exists():
-        return {"error": "Result files not found"}
-    return {
-        "text": text_path.read_text(encoding="utf-8"),
-        "json": json.loads(json_path.read_text(encoding="utf-8"))
-    }
\ No newline at end of file
+async def get_result(file_id: str, request: Request):
+    """
+    完了したジョブの {"text", "json"} を返す（生成済みの JSON をそのままストリーミングする）。
+    Accept-Encoding（gzip / zstd）・If-None-Match（304）・Range（206）に対応する。
+    """
+    job = get_job_queue().store.get(file_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    if job["status"] == STATUS_FAILED:
+        return JSONResponse(content={"status": job["status"], "error": job["error"]}, status_code=500)
+    if job["status"] != STATUS_DONE:
+        # まだ処理中：クライアントは /status をポーリングする
+        return JSONResponse(content={"status": job["status"], "progress": job["progress"]}, status_code=202)
+
+    if job["segments_path"] and Path(job["segments_path"]).exists():
+        variants = await run_in_threadpool(prepare_rendered, file_id, "result")
+        return respond(request.headers, variants, "application/json")
+
+    # セグメントストア導入前のジョブ
+    text_path = Path(job["text_path"] or "")
+    json_path = Path(job["json_path"] or "")
+    if not text_path.is_file() or not json_path.is_file():
+        return JSONResponse(content={"error": "Result files not found"}, status_code=404)
+    variants = await run_in_threadpool(
+        prepare, f"{file_id}/legacy-result", str(json_path), lambda: _legacy_body(text_path, json_path)
+    )
+    return respond(request.headers, variants, "application/json")
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query
+from starlette.concurrency import run_in_threadpool
+from app.core.search_index import get_search_index
+
+router = APIRouter()
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    file_id: str = Query(None),
+):
+    """
+    文字起こし結果をセグメント単位で全文検索する（空白区切りの語はすべて含むものを返す）。
+    results: [{"file_id", "filename", "segment", "start_ms", "end_ms", "text", "highlight"}]
+    """
+    return await run_in_threadpool(get_search_index().search, q, limit, offset, file_id)
+
+@router.get("/search/stats")
+async def search_stats():
+    return await run_in_threadpool(get_search_index().stats)
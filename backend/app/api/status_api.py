@@ -1,10 +1,13 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
+from app.core.job_queue import get_job_queue, job_summary
 
 router = APIRouter()
 
-# 仮のステータス確認エンドポイント
+# ジョブテーブルから file_id に対応する実際の状態を返す
 @router.get("/status/{file_id}")
 async def get_status(file_id: str):
-    # 実際の処理では、file_id に対応するステータス管理ロジックをここに実装する
-    return JSONResponse(content={"file_id": file_id, "status": "processing"}, status_code=200)
+    job = get_job_queue().store.get(file_id)
+    if job is None:
+        return JSONResponse(content={"file_id": file_id, "status": "not_found"}, status_code=404)
+    return JSONResponse(content=job_summary(job), status_code=200)
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from app.config import get_model_name, get_stream_max_sessions
+from app.core.admission import AdmissionRejectedError, estimate_memory_mb, get_admission_controller
+from app.core.backends import get_backend
+from app.core.streaming import MAX_WINDOW_SEC, PcmDecoder, StreamingSession
+
+router = APIRouter()
+
+# 実行中のセッション数（イベントループの上でだけ増減する）
+_sessions = 0
+
+def _run_step(session: StreamingSession, final: bool):
+    # 推論ごとにモデルを借りる（ウォームなモデルを他のリクエストと共有するため）。
+    # セッションの間は pin しているので、返却してもプールから外れず読み込み直さない
+    with get_backend().lease(get_model_name()) as model:
+        return session.step(model, final=final)
+
+@router.websocket("/stream")
+async def stream_transcribe(websocket: WebSocket):
+    """
+    録音中の音声を受け取りながら逐次文字起こしする。
+    - クライアント → サーバー: 16kHz モノラル PCM のバイナリフレーム
+      （?format=s16le（デフォルト） または ?format=f32le）、終了時はテキスト "stop"
+    - サーバー → クライアント: {"type": "partial" | "final", "start", "end", "text"}、最後に {"type": "done"}
+    """
+    global _sessions
+    await websocket.accept()
+    sample_format = websocket.query_params.get("format", "s16le")
+    max_sessions = get_stream_max_sessions()
+    if _sessions >= max_sessions:
+        # セッションごとにモデルを pin して毎秒推論するので、同時に受け付ける数を絞る
+        print(f"[Stream] セッション数が上限（{max_sessions}）に達しているため受付不可")
+        await websocket.send_json({"type": "error", "error": f"同時に使えるセッションは {max_sessions} までです"})
+        # 1013: Try Again Later
+        await websocket.close(code=1013)
+        return
+    backend = get_backend()
+    model_name = get_model_name()
+    try:
+        # セッションの間、最大のウィンドウ分のメモリを予約しておく（待たせずに断る）
+        reservation = get_admission_controller().try_acquire(estimate_memory_mb(MAX_WINDOW_SEC, model_name), "stream")
+    except AdmissionRejectedError as e:
+        print(f"[Stream] メモリ不足のため受付不可: {e}")
+        await websocket.send_json({"type": "error", "error": str(e), "retry_after": e.retry_after})
+        # 1013: Try Again Later
+        await websocket.close(code=1013)
+        return
+    _sessions += 1
+    session = StreamingSession()
+    decoder = PcmDecoder(sample_format)
+    wake = asyncio.Event()
+    print(f"[Stream] セッション開始（format={sample_format}）")
+    # 1 秒ごとの推論の合間にモデルが解放されないよう、セッションの間は pin しておく
+    backend.pin(model_name)
+
+    async def process():
+        while True:
+            await wake.wait()
+            wake.clear()
+            final = session.closed
+            events = await run_in_threadpool(_run_step, session, final)
+            for event in events:
+                await websocket.send_json(event)
+            if final:
+                await websocket.send_json({"type": "done"})
+                return
+            if session.ready():
+                wake.set()
+
+    processor = asyncio.create_task(process())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                session.feed(decoder.decode(message["bytes"]))
+                if session.ready():
+                    wake.set()
+            elif (message.get("text") or "").strip().lower() in ("stop", '{"event": "stop"}', '{"event":"stop"}'):
+                session.close()
+                wake.set()
+                break
+        await processor
+        await websocket.close()
+        print("[Stream] セッション終了")
+    except WebSocketDisconnect:
+        processor.cancel()
+        print("[Stream] クライアントが切断しました")
+    except Exception as e:
+        processor.cancel()
+        print(f"[Stream] エラー: {e}")
+        await websocket.close(code=1011)
+    finally:
+        # 最後のセッションなら（低メモリ設定では）ここでモデルが解放される
+        _sessions -= 1
+        await run_in_threadpool(backend.unpin, model_name)
+        reservation.release()
@@ -1,13 +1,84 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from pathlib import Path
-import tempfile
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+import asyncio
+import time
+import uuid
 import os
-from app.core.transcribe_logic import transcribe_file, transcribe_latest_file
+from app.core.transcribe_logic import transcribe_result, lookup_cached_result, make_options
+from app.core.profiles import get_profile
+from app.core.broker import STATUS_DONE, STATUS_FAILED
+from app.core.job_queue import get_job_queue, QueueFullError
+from app.core.segment_store import SegmentStore
+from app.core.audio_index import get_audio_index
+from app.core.ingest import ingest_upload, IngestError
+from app.core.storage import get_audio_store
+from app.core.admission import get_admission_controller, estimate_file_mb, AdmissionRejectedError
+from app.config import get_admission_wait_sec, get_job_wait_sec
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
+# JOB_MODE=api で、同期エンドポイントから登録したジョブの完了を確認する間隔（秒）
+JOB_POLL_SEC = 0.5
+
+def _transcribe_admitted(tmp_path: str, audio_hash: str, estimate_mb: float, label: str, options: dict, profile) -> dict:
+    # メモリの予約はワーカー上で行う（キュー待ちの間に予算を押さえ続けると、
+    # 予約待ちのジョブがワーカーを塞いだときに互いに待ち合ってしまうため）
+    # 待ちきれなければ AdmissionRejectedError → 503 + Retry-After
+    with get_admission_controller().acquire(estimate_mb, label, timeout=get_admission_wait_sec()):
+        return transcribe_result(tmp_path, audio_hash, options, profile)
+
+async def _run_as_job(
+    request: Request, file_id: str, filename: str, audio_path: str, audio_hash, options: dict, profile,
+) -> dict:
+    """
+    JOB_MODE=api 用：API プロセスでは推論せず、ブローカー経由でワーカーにジョブとして渡して完了を待つ。
+    音声のアーカイブはワーカーが行う。JOB_WAIT_SEC を過ぎたら 504（ジョブは残るので /api/status で追える）、
+    クライアントが切断したら待つのをやめる。
+    """
+    queue = get_job_queue()
+    await run_in_threadpool(
+        queue.enqueue, file_id, filename, audio_path, audio_hash, {**(options or {}), "profile": profile.name},
+    )
+    wait_sec = get_job_wait_sec()
+    deadline = time.monotonic() + wait_sec
+    print(f"[API] ワーカーにジョブを登録して完了を待ちます: {file_id}")
+    while True:
+        await asyncio.sleep(JOB_POLL_SEC)
+        job = await run_in_threadpool(queue.store.get, file_id)
+        if job is None:
+            raise RuntimeError(f"ジョブが見つかりません: {file_id}")
+        if job["status"] == STATUS_FAILED:
+            raise RuntimeError(job["error"])
+        if job["status"] == STATUS_DONE:
+            store = await run_in_threadpool(SegmentStore.load, job["segments_path"])
+            return {"text": store.text}
+        if await request.is_disconnected():
+            print(f"[API] クライアントが切断したため待機を終了します（ジョブは継続）: {file_id}")
+            raise HTTPException(status_code=499, detail="クライアントが切断しました")
+        if time.monotonic() >= deadline:
+            print(f"[API] ジョブの完了待ちがタイムアウトしました（{job['status']}）: {file_id}")
+            raise HTTPException(
+                status_code=504,
+                detail=f"{wait_sec:.0f}秒以内に完了しませんでした（状態: {job['status']}）。"
+                       f"/api/status/{file_id} で結果を確認できます",
+            )
+
 @router.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(
+    request: Request,
+    file: UploadFile = File(...),
+    language: str = Form(None),
+    task: str = Form(None),
+    prompt: str = Form(None),
+    temperature: float = Form(None),
+    profile: str = Form(None),
+):
+    """
+    language: 言語コード（"auto" で自動判定、省略時は ja）
+    task: transcribe / translate、prompt: 前置きのテキスト、temperature: 0〜1（省略時は温度フォールバック）
+    profile: fast / balanced / accurate（モデル・ビーム幅・フォールバックの上限。省略時は TRANSCRIBE_PROFILE）
+    同じ音声を設定を変えて再実行した場合は、キャッシュしたエンコーダー出力を使う。
+    """
     print(f"[API] /transcribe 呼び出し - ファイル名: {file.filename}")
     print(f"[API] ファイルサイズ: {file.size} bytes")
     print(f"[API] ファイルタイプ: {file.content_type}")
@@ -18,46 +89,53 @@ async def transcribe(file: UploadFile = File(...)):
     
     if file.size == 0:
         raise HTTPException(status_code=400, detail="ファイルが空です")
-    
-    # 音声ファイルの拡張子チェック
-    allowed_extensions = {'.mp3', '.wav', '.m4a', '.flac', '.ogg'}
-    file_extension = Path(file.filename).suffix.lower()
-    if file_extension not in allowed_extensions:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"サポートされていないファイル形式です: {file_extension}. サポート形式: {', '.join(allowed_extensions)}"
-        )
 
-    # 一時ファイルとして保存
-    suffix = Path(file.filename).suffix
+    try:
+        options = make_options(language, task, prompt, temperature)
+        decoding_profile = get_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 音声ストレージへストリーミング保存（形式は先頭バイトで判定、同じ内容は 1 つにまとめる）
     tmp_path = None
+    store = get_audio_store()
+    file_id = str(uuid.uuid4())
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            contents = await file.read()
-            print(f"[API] ファイル内容読み込み完了: {len(contents)} bytes")
-            
-            if len(contents) == 0:
-                raise HTTPException(status_code=400, detail="ファイル内容が空です")
-            
-            tmp.write(contents)
-            tmp_path = tmp.name
-            tmp.flush()  # 確実にディスクに書き込み
-            os.fsync(tmp.fileno())  # ファイルシステムに同期
-        
+        ingested = await ingest_upload(file, store.incoming_dir, str(uuid.uuid4()))
+        tmp_path = store.store(ingested.path, ingested.sha256, ingested.format, file_id)
         print(f"[API] 一時ファイル保存成功: {tmp_path}")
-        print(f"[API] 一時ファイルサイズ: {os.path.getsize(tmp_path)} bytes")
+        print(f"[API] 一時ファイルサイズ: {ingested.size} bytes（形式: {ingested.format}）")
         
+    except IngestError as e:
+        print(f"[API] ファイル取り込みエラー: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         print(f"[API] 一時ファイル保存エラー: {e}")
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)  # 一時ファイルを削除
         raise HTTPException(status_code=500, detail=f"ファイル保存エラー: {e}")
 
-    # ロジック関数で文字起こし
+    # ロジック関数で文字起こし（イベントループを塞がないようワーカープールで実行）
     try:
-        print(f"[API] 文字起こし処理開始")
-        text = transcribe_file(tmp_path)
+        cached = lookup_cached_result(ingested.sha256, options, decoding_profile)
+        if cached is not None:
+            # キャッシュヒット時は推論キューを通さずに即座に返す
+            print(f"[API] キャッシュヒット: {ingested.sha256[:12]}")
+            return {"transcription": cached["text"], "cached": True, "profile": decoding_profile.name}
+
+        if not get_job_queue().embedded:
+            # 推論は別プロセスのワーカーが行う（メモリの予約もワーカー側）。音声はジョブに引き渡す
+            audio_path, tmp_path = tmp_path, None
+            result = await _run_as_job(
+                request, file_id, file.filename, audio_path, ingested.sha256, options, decoding_profile,
+            )
+        else:
+            get_admission_controller().check_capacity()
+            estimate_mb = await run_in_threadpool(estimate_file_mb, tmp_path, decoding_profile.model_name)
+            print(f"[API] 文字起こし処理開始（プロファイル {decoding_profile.name}、メモリ見積もり {estimate_mb:.0f}MB）")
+            result = await asyncio.wrap_future(get_job_queue().submit_call(
+                _transcribe_admitted, tmp_path, ingested.sha256, estimate_mb, file.filename, options, decoding_profile
+            ))
+        text = result["text"]
         
         if not text or text.strip() == "":
             raise HTTPException(status_code=500, detail="文字起こし結果が空です")
@@ -65,26 +143,54 @@ async def transcribe(file: UploadFile = File(...)):
         print(f"[API] 文字起こし成功（先頭100文字）: {text[:100]}")
         print(f"[API] 文字起こし結果の長さ: {len(text)} 文字")
         
-        return {"transcription": text}
+        decoding = result.get("decoding", {})
+        return {
+            "transcription": text,
+            "profile": decoding_profile.name,
+            "fallbacks": decoding.get("fallbacks"),
+            "skipped_fallbacks": decoding.get("skipped_fallbacks"),
+        }
         
+    except QueueFullError as e:
+        print(f"[API] キュー満杯のため受付不可: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except AdmissionRejectedError as e:
+        print(f"[API] メモリ不足のため受付不可: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[API] 文字起こし失敗: {e}")
         raise HTTPException(status_code=500, detail=f"文字起こし失敗: {e}")
         
     finally:
-        # 一時ファイルのクリーンアップ
+        # 処理済みの音声をアーカイブへ移す（圧縮はスレッドプールで行う）
         if tmp_path and os.path.exists(tmp_path):
             try:
-                os.unlink(tmp_path)
-                print(f"[API] 一時ファイル削除完了: {tmp_path}")
+                archived = await run_in_threadpool(store.archive, tmp_path, ingested.sha256)
+                print(f"[API] 音声をアーカイブしました: {archived}")
             except Exception as cleanup_error:
-                print(f"[API] 一時ファイル削除エラー: {cleanup_error}")
+                print(f"[API] アーカイブエラー: {cleanup_error}")
 
 @router.post("/transcribe/latest")
-async def transcribe_latest():
+async def transcribe_latest(request: Request):
     print("[API] /transcribe/latest 呼び出し")
     try:
-        text = transcribe_latest_file()
+        latest = await run_in_threadpool(get_audio_index().latest)
+        if latest is None:
+            raise FileNotFoundError("音声ファイルが見つかりません")
+        decoding_profile = get_profile()
+        label = os.path.basename(latest.path)
+        if not get_job_queue().embedded:
+            # JOB_MODE=api：最新ファイルをジョブとしてワーカーに渡す（メモリの予約はワーカー側）
+            result = await _run_as_job(request, str(uuid.uuid4()), label, latest.path, None, None, decoding_profile)
+        else:
+            get_admission_controller().check_capacity()
+            estimate_mb = await run_in_threadpool(estimate_file_mb, latest.path, decoding_profile.model_name)
+            result = await asyncio.wrap_future(get_job_queue().submit_call(
+                _transcribe_admitted, latest.path, None, estimate_mb, label, None, decoding_profile
+            ))
+        text = result["text"]
         
         if not text or text.strip() == "":
             raise HTTPException(status_code=500, detail="文字起こし結果が空です")
@@ -92,6 +198,13 @@ async def transcribe_latest():
         print(f"[API] 最新ファイル文字起こし成功（先頭100文字）: {text[:100]}")
         return {"text": text}
         
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except AdmissionRejectedError as e:
+        print(f"[API] メモリ不足のため受付不可: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[API] 最新ファイル文字起こし失敗: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
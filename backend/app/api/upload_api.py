@@ -1,16 +1,44 @@
-from fastapi import APIRouter, UploadFile, File
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 import uuid
-from pathlib import Path
-import tempfile
+from app.core.job_queue import get_job_queue, QueueFullError
+from app.core.ingest import ingest_upload, IngestError
+from app.core.storage import get_audio_store
+from app.core.transcribe_logic import make_options
 
 router = APIRouter()
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    language: str = Form(None),
+    task: str = Form(None),
+    prompt: str = Form(None),
+    temperature: float = Form(None),
+):
+    """言語・タスク・前置き・温度は /transcribe と同じ（ジョブに保存してワーカーに渡す）"""
+    try:
+        options = make_options(language, task, prompt, temperature)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     file_id = str(uuid.uuid4())
-    temp_dir = Path(tempfile.gettempdir())
-    output_path = temp_dir / f"{file_id}_{file.filename}"
-    with output_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"file_id": file_id, "filename": file.filename}
\ No newline at end of file
+    store = get_audio_store()
+    try:
+        ingested = await ingest_upload(file, store.incoming_dir, file_id)
+    except IngestError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    # 内容のハッシュごとに保存し、ジョブからはハードリンクで参照する
+    audio_path = store.store(ingested.path, ingested.sha256, ingested.format, file_id)
+
+    # 文字起こしジョブをキューに登録（処理はワーカーで非同期に行う）
+    try:
+        get_job_queue().enqueue(file_id, file.filename, audio_path, ingested.sha256, options)
+    except QueueFullError as e:
+        store.release(audio_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "file_id": file_id,
+        "filename": file.filename,
+        "size": ingested.size,
+        "sha256": ingested.sha256,
+        "status": "queued",
+    }
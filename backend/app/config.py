@@ -8,10 +8,37 @@ AUDIO_DIR = os.path.join(BASE_DIR, "data/audio")
 OUTPUT_DIR = os.path.join(BASE_DIR, "data/output")
 ARCHIVE_DIR = os.path.join(BASE_DIR, "data/audio_archive")
 
+# 文字起こし対象とする音声ファイルの拡張子
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg'}
+
+# ジョブ管理（/api/upload → /api/status → /api/result）
+JOB_DB_PATH = os.path.join(BASE_DIR, "data/jobs.sqlite3")
+
+# 結果の配信用ファイル（圧縮した版と ETag。/api/download・/api/result）
+DELIVERY_CACHE_DIR = os.path.join(BASE_DIR, "data/cache/delivery")
+
+# 文字起こし結果の全文検索索引（/api/search）
+SEARCH_DB_PATH = os.path.join(BASE_DIR, "data/search.sqlite3")
+
+# 文字起こし結果のキャッシュ（音声ハッシュ＋モデル＋デコード設定をキーにする）
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "data/cache/results")
+
+# log-mel とエンコーダー出力のキャッシュ（言語・タスク・プロンプトを変えた再デコード用）
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, "data/cache/features")
+
 # Whisperモデル設定（メモリ効率化）
 MODEL_NAME = "tiny"  # tiny: 39MB, base: 139MB, small: 244MB, medium: 769MB, large: 1550MB
 LANGUAGE = "ja"
 
+# モデルごとのおおよそのメモリサイズ（MB）。上記コメントの値を機械可読にしたもの
+MODEL_SIZES_MB = {
+    "tiny": 39,
+    "base": 139,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+}
+
 # メモリ効率化設定
 PYTORCH_CUDA_ALLOC_CONF = "max_split_size_mb:128"
 WHISPER_FP16 = False  # FP16を無効化してメモリ使用量を削減
@@ -25,6 +52,208 @@ def get_model_name():
     """環境変数からモデル名を取得（デフォルト: tiny）"""
     return os.getenv("WHISPER_MODEL", MODEL_NAME)
 
+def get_default_profile():
+    """リクエストで指定が無いときのデコードプロファイル（fast / balanced / accurate、デフォルト: balanced）"""
+    return os.getenv("TRANSCRIBE_PROFILE", "balanced")
+
+def get_profile_models():
+    """デコードプロファイルごとのモデル名
+
+    fast は tiny、balanced は WHISPER_MODEL、accurate は WHISPER_MODEL の 1 つ上のサイズ。
+    PROFILE_FAST_MODEL / PROFILE_BALANCED_MODEL / PROFILE_ACCURATE_MODEL で個別に変えられる。
+    """
+    default = get_model_name()
+    sizes = list(MODEL_SIZES_MB)
+    base_name = default.split(".")[0].split("-")[0]
+    larger = sizes[min(sizes.index(base_name) + 1, len(sizes) - 1)] if base_name in sizes else default
+    return {
+        "fast": os.getenv("PROFILE_FAST_MODEL", "tiny"),
+        "balanced": os.getenv("PROFILE_BALANCED_MODEL", default),
+        "accurate": os.getenv("PROFILE_ACCURATE_MODEL", larger),
+    }
+
+def get_backend_name():
+    """環境変数から推論バックエンドを取得（デフォルト: whisper）
+
+    "whisper": openai-whisper（fp32） / "whisper-int8": Linear 層を動的 int8 量子化したもの
+    """
+    return os.getenv("WHISPER_BACKEND", "whisper")
+
 def get_memory_limit():
     """メモリ制限を取得（MB）"""
-    return int(os.getenv("MEMORY_LIMIT_MB", "256"))
\ No newline at end of file
+    return int(os.getenv("MEMORY_LIMIT_MB", "256"))
+
+def get_model_size_mb(model_name: str) -> int:
+    """モデルのおおよそのメモリサイズ（MB）を取得（"base.en" や "large-v3" も考慮）"""
+    base_name = model_name.split(".")[0].split("-")[0]
+    return MODEL_SIZES_MB.get(base_name, MODEL_SIZES_MB["large"])
+
+def get_model_pool_size():
+    """プロセス内で保持するウォームモデルの最大数（デフォルト: 1）"""
+    return max(1, int(os.getenv("WHISPER_POOL_SIZE", "1")))
+
+def get_model_idle_timeout():
+    """未使用モデルを解放するまでの秒数（0 の場合は使用後すぐに解放）
+
+    低メモリ環境（MEMORY_LIMIT_MB <= 512）ではデフォルトで従来通り毎回解放する。
+    """
+    default = "0" if get_memory_limit() <= 512 else "300"
+    return float(os.getenv("WHISPER_MODEL_IDLE_SEC", default))
+
+def get_job_workers():
+    """文字起こしワーカーの並列数（デフォルト: 1）"""
+    return max(1, int(os.getenv("JOB_WORKERS", "1")))
+
+def get_job_queue_size():
+    """実行待ちを含めて受け付けるジョブの上限（デフォルト: 16）"""
+    return max(1, int(os.getenv("JOB_QUEUE_SIZE", "16")))
+
+def get_local_queue_size():
+    """デスクトップアプリ（main_local.py）で実行待ちにできるファイル数（デフォルト: 32）"""
+    return max(1, int(os.getenv("LOCAL_QUEUE_SIZE", "32")))
+
+def get_job_mode():
+    """ジョブの実行場所
+
+    "embedded"（デフォルト）: API プロセス内のワーカーが処理する
+    "api": API はジョブを登録するだけで、別プロセスの `python -m app.worker` が処理する
+           （同期の /api/transcribe・/api/transcribe/latest もジョブとして登録し、完了を待って返す）
+    """
+    return os.getenv("JOB_MODE", "embedded")
+
+def get_job_wait_sec():
+    """JOB_MODE=api で、同期の /api/transcribe がワーカーの完了を待つ最大秒数（超えたら 504。ジョブは残る）"""
+    return float(os.getenv("JOB_WAIT_SEC", "600"))
+
+def get_job_broker():
+    """ジョブブローカーの実装（現在は "sqlite" のみ。JOB_DB_PATH を共有できるワーカーから使える）"""
+    return os.getenv("JOB_BROKER", "sqlite")
+
+def get_job_lease_sec():
+    """ワーカーがジョブを確保しておく期間（秒）。ハートビートが途絶えると他のワーカーが再実行する"""
+    return float(os.getenv("JOB_LEASE_SEC", "60"))
+
+def get_job_max_attempts():
+    """ワーカーの異常終了などで再実行する回数の上限（これを超えたジョブは失敗にする）"""
+    return max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+
+def get_job_poll_sec():
+    """ワーカーが新しいジョブを確認する間隔（秒）"""
+    return float(os.getenv("JOB_POLL_SEC", "1"))
+
+def get_long_audio_min_sec():
+    """この長さ（秒）以上の音声を分割・並列で文字起こしする（0 で無効）"""
+    return float(os.getenv("LONG_AUDIO_MIN_SEC", "600"))
+
+def get_long_audio_chunk_sec():
+    """長時間音声を分割する際の目安となるチャンク長（秒）"""
+    return float(os.getenv("LONG_AUDIO_CHUNK_SEC", "120"))
+
+def get_long_audio_workers(model_name: str):
+    """長時間音声用のワーカープロセス数
+
+    ワーカーごとにモデルを 1 つ保持するため、CPU コア数とメモリ制限の両方で上限を決める。
+    （推論時の作業領域を含め、モデルサイズの約 4 倍を 1 ワーカーの目安とする）
+    """
+    env = os.getenv("LONG_AUDIO_WORKERS")
+    if env:
+        return max(1, int(env))
+    by_memory = get_memory_limit() // (get_model_size_mb(model_name) * 4)
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+def get_max_upload_mb():
+    """アップロードを受け付ける最大サイズ（MB、デフォルト: 200）"""
+    return int(os.getenv("MAX_UPLOAD_MB", "200"))
+
+def get_result_cache_mb():
+    """結果キャッシュのディスク上限（MB、0 で無効）"""
+    return int(os.getenv("RESULT_CACHE_MB", "256"))
+
+def get_feature_cache_mb():
+    """log-mel・エンコーダー出力キャッシュのディスク上限（MB、デフォルト: 0 = 無効）
+
+    有効にすると、通常モードの文字起こしは model.transcribe（タイムスタンプに従って窓を進める）ではなく
+    30 秒の固定窓ごとにエンコードしてデコードする。窓の境目で語が切れることがあり、結果も変わる。
+    また、最初の実行ではファイル全体の log-mel をメモリ上に作る（1 時間で約 115MB）。
+    同じ音声を言語・プロンプトを変えて何度もデコードし直す用途でのみ有効にする。
+    """
+    return int(os.getenv("FEATURE_CACHE_MB", "0"))
+
+def get_vad_settings():
+    """音声区間検出（VAD）の設定
+
+    VAD_ENABLED=0 で無効化。しきい値は dB（フルスケール基準）とミリ秒で指定する。
+    """
+    return {
+        "enabled": os.getenv("VAD_ENABLED", "1") == "1",
+        # これより小さいフレームは常に非音声
+        "threshold_db": float(os.getenv("VAD_THRESHOLD_DB", "-45")),
+        # 推定した雑音レベルからこれだけ大きいフレームを音声候補にする
+        "margin_db": float(os.getenv("VAD_MARGIN_DB", "10")),
+        # スペクトル平坦度がこれ以上のフレームは雑音とみなす（0〜1）
+        "flatness": float(os.getenv("VAD_FLATNESS", "0.6")),
+        "min_speech_ms": int(os.getenv("VAD_MIN_SPEECH_MS", "250")),
+        "min_silence_ms": int(os.getenv("VAD_MIN_SILENCE_MS", "500")),
+        "pad_ms": int(os.getenv("VAD_PAD_MS", "200")),
+    }
+
+def get_admission_base_mb():
+    """メモリ予算のうち、推論以外（Python・FastAPI・torch 本体など）に確保しておく量（MB）"""
+    return int(os.getenv("ADMISSION_BASE_MB", "150"))
+
+def get_admission_wait_sec():
+    """/api/transcribe がメモリの空きを待つ最大秒数（超えたら 503）"""
+    return float(os.getenv("ADMISSION_WAIT_SEC", "30"))
+
+def get_admission_max_waiting():
+    """メモリの空きを待てるリクエスト数（超えたら即座に 503、デフォルト: JOB_QUEUE_SIZE）"""
+    return int(os.getenv("ADMISSION_MAX_WAITING", str(get_job_queue_size())))
+
+def get_stream_max_sessions():
+    """同時に受け付ける /api/stream のセッション数（デフォルト: 2。超えたら close code 1013 で断る）"""
+    return max(1, int(os.getenv("STREAM_MAX_SESSIONS", "2")))
+
+def get_batching_settings():
+    """短い音声をまとめて 1 回の推論にするマイクロバッチの設定
+
+    BATCH_ENABLED: "auto"（デフォルト、JOB_WORKERS > 1 のときだけ有効） / "1" / "0"
+    同時に処理される音声が無ければまとめようがないため、ワーカーが 1 つなら使わない。
+    """
+    mode = os.getenv("BATCH_ENABLED", "auto")
+    return {
+        "enabled": get_job_workers() > 1 if mode == "auto" else mode == "1",
+        # 最初のリクエストが来てから、同じバッチに入れる相手を待つ時間（ミリ秒）
+        "window_ms": float(os.getenv("BATCH_WINDOW_MS", "10")),
+        "max_size": max(1, int(os.getenv("BATCH_MAX_SIZE", "8"))),
+        # これより長い音声はバッチに入れない（Whisper の 1 窓 = 30 秒が上限）
+        "max_clip_sec": min(30.0, float(os.getenv("BATCH_MAX_CLIP_SEC", "30"))),
+    }
+
+def get_storage_settings():
+    """音声ストレージ（AUDIO_DIR 配下のハッシュ別保存とアーカイブ）の設定"""
+    return {
+        # AUDIO_DIR（保存中）＋ARCHIVE_DIR（アーカイブ）の合計の上限（MB、0 で無制限）
+        "quota_mb": int(os.getenv("STORAGE_QUOTA_MB", "2048")),
+        # アーカイブを残す日数（0 で無期限）
+        "retention_days": float(os.getenv("AUDIO_RETENTION_DAYS", "30")),
+        # 保持期間・容量を確認する間隔（秒）
+        "sweep_sec": float(os.getenv("STORAGE_SWEEP_SEC", "600")),
+        # アーカイブ時に圧縮するか（圧縮が効く非圧縮形式のみ）
+        "compress": os.getenv("ARCHIVE_COMPRESS", "1") == "1",
+    }
+
+def get_audio_index_refresh_sec():
+    """音声ディレクトリの索引を確認し直す最短間隔（秒）"""
+    return float(os.getenv("AUDIO_INDEX_REFRESH_SEC", "2"))
+
+def get_metrics_enabled():
+    """段階ごとの計測と構造化ログを有効にするか（METRICS_ENABLED=0 で無効、無効時のコストはほぼゼロ）"""
+    return os.getenv("METRICS_ENABLED", "1") == "1"
+
+def get_warmup_mode():
+    """起動後のバックグラウンドウォームアップ
+
+    "0"（デフォルト）: 何もしない / "import": torch・whisper の import のみ / "model": モデルの読み込みまで
+    （"model" は WHISPER_MODEL_IDLE_SEC > 0 でモデルがプールに残る場合のみ効果がある）
+    """
+    return os.getenv("WHISPER_WARMUP", "0")
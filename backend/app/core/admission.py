@@ -0,0 +1,253 @@
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+from app.config import (
+    get_admission_base_mb,
+    get_admission_max_waiting,
+    get_long_audio_chunk_sec,
+    get_long_audio_min_sec,
+    get_long_audio_workers,
+    get_memory_limit,
+    get_model_name,
+    get_model_size_mb,
+)
+
+#
+# メモリを考慮したアドミッション制御
+#
+# - リクエストごとに必要なメモリをモデルサイズと音声の長さから見積もる
+# - 見積もりの合計が MEMORY_LIMIT_MB（から基本使用量を引いた分）に収まる範囲でだけ処理を始める
+# - 収まらない分は先着順に待たせ、待ちきれない／待ち行列が満杯なら 503（Retry-After 付き）にする
+# - 何も処理していないときは、見積もりが予算を超えるリクエストでも 1 件だけは通す
+# - 推論の入口（/api/transcribe・/api/transcribe/latest・ジョブ・バッチ・/api/stream・デスクトップアプリ）は
+#   すべてここで予約する。見積もりにはリクエストのプロファイルのモデルを使う
+#
+
+# モデルの重みに対する推論時の作業領域（活性値・KV キャッシュなど）を含めた倍率
+MODEL_WORKING_FACTOR = 2.0
+# 音声 1 秒あたりのメモリ（16kHz float32 の波形を、デコード・無音除去・VAD 結合で最大 3 つ持つ）
+AUDIO_MB_PER_SEC = 16000 * 4 * 3 / (1024 * 1024)
+# 長さが分からないときに仮定するビットレート（bps）。WAV などでは長めに見積もることになる
+FALLBACK_BITRATE = 128_000
+# 実績が無いときの Retry-After（秒）
+DEFAULT_RETRY_AFTER_SEC = 10
+
+
+class AdmissionRejectedError(Exception):
+    """メモリの空きが得られなかった（HTTP 503 にする）"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_duration(path: str) -> float:
+    """音声の長さ（秒）。ffprobe が使えなければファイルサイズから見積もる"""
+    from app.core.audio_preprocess import probe_duration
+
+    try:
+        return probe_duration(path)
+    except Exception:
+        return os.path.getsize(path) * 8 / FALLBACK_BITRATE
+
+
+def estimate_memory_mb(duration_sec: float, model_name: Optional[str] = None) -> float:
+    """1 リクエストの処理に必要なメモリの見積もり（MB）"""
+    model_name = model_name or get_model_name()
+    model_mb = get_model_size_mb(model_name) * MODEL_WORKING_FACTOR
+    min_sec = get_long_audio_min_sec()
+    workers = get_long_audio_workers(model_name)
+    if 0 < min_sec <= duration_sec and workers >= 2:
+        # 長時間音声モード：ワーカーごとにモデルとチャンク 1 つ分の音声を持つ
+        return workers * (model_mb + get_long_audio_chunk_sec() * AUDIO_MB_PER_SEC)
+    return model_mb + duration_sec * AUDIO_MB_PER_SEC
+
+
+def estimate_file_mb(path: str, model_name: Optional[str] = None) -> float:
+    return estimate_memory_mb(estimate_duration(path), model_name)
+
+
+class Reservation:
+    def __init__(self, controller: "AdmissionController", reservation_id: int, memory_mb: float, label: str):
+        self._controller = controller
+        self.id = reservation_id
+        self.memory_mb = memory_mb
+        self.label = label
+        self.requested_at = time.time()
+        self.granted_at: Optional[float] = None
+        self.released = False
+
+    def release(self):
+        self._controller.release(self)
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def info(self) -> Dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "memory_mb": round(self.memory_mb, 1),
+            "requested_at": self.requested_at,
+            "granted_at": self.granted_at,
+        }
+
+
+class AdmissionController:
+    def __init__(self, budget_mb: float, max_waiting: int):
+        self.budget_mb = budget_mb
+        self.max_waiting = max_waiting
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active: Dict[int, Reservation] = {}
+        self._waiting: "deque[tuple]" = deque()  # (Reservation, Future)
+        # 直近の処理時間（Retry-After の目安）
+        self._hold_times: "deque[float]" = deque(maxlen=20)
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    # --- 予約 ---
+
+    def _reserved_mb(self) -> float:
+        return sum(reservation.memory_mb for reservation in self._active.values())
+
+    def _fits(self, memory_mb: float) -> bool:
+        if not self._active:
+            return True
+        return self._reserved_mb() + memory_mb <= self.budget_mb
+
+    def _grant(self, reservation: Reservation):
+        reservation.granted_at = time.time()
+        self._active[reservation.id] = reservation
+        self._counters["admitted"] += 1
+
+    def _submit(self, memory_mb: float, label: str, queue: bool):
+        """予約を試み、(Reservation, 待つための Future または None) を返す"""
+        reservation = Reservation(self, next(self._ids), memory_mb, label)
+        with self._lock:
+            # 先に待っているリクエストを追い越さない
+            if not self._waiting and self._fits(memory_mb):
+                self._grant(reservation)
+                return reservation, None
+            if not queue or len(self._waiting) >= self.max_waiting:
+                self._counters["rejected"] += 1
+                raise AdmissionRejectedError(
+                    f"メモリの空きがありません（予約済み {self._reserved_mb():.0f}MB / 予算 {self.budget_mb:.0f}MB）",
+                    self.retry_after(),
+                )
+            waiter: Future = Future()
+            # 実行中にしておき、待ち側のキャンセルで Future が取り消されないようにする
+            waiter.set_running_or_notify_cancel()
+            self._waiting.append((reservation, waiter))
+            self._counters["queued"] += 1
+        print(f"[Admission] 待機: {label}（{memory_mb:.0f}MB、待ち {len(self._waiting)}件）")
+        return reservation, waiter
+
+    def _abandon(self, reservation: Reservation, waiter: Future):
+        """待ちきれなかった予約を取り下げる（直前に許可されていた場合は返却する）"""
+        with self._lock:
+            self._counters["timeouts"] += 1
+            self._waiting = deque(item for item in self._waiting if item[1] is not waiter)
+            granted = reservation.id in self._active
+        if granted:
+            self.release(reservation)
+        return AdmissionRejectedError("メモリの空き待ちがタイムアウトしました", self.retry_after())
+
+    def acquire(self, memory_mb: float, label: str = "", timeout: Optional[float] = None) -> Reservation:
+        """空きが出るまでブロックして予約する（ワーカースレッド用。timeout=None なら無期限に待つ）"""
+        reservation, waiter = self._submit(memory_mb, label, queue=True)
+        if waiter is not None:
+            try:
+                waiter.result(timeout)
+            except FutureTimeoutError:
+                raise self._abandon(reservation, waiter)
+        return reservation
+
+    def try_acquire(self, memory_mb: float, label: str = "") -> Reservation:
+        """待たずに予約する。すぐに空きが無ければ AdmissionRejectedError（/api/stream 用）"""
+        reservation, _waiter = self._submit(memory_mb, label, queue=False)
+        return reservation
+
+    def check_capacity(self):
+        """待ち行列が満杯なら、キューに入れる前に AdmissionRejectedError を送出する"""
+        with self._lock:
+            if len(self._waiting) < self.max_waiting:
+                return
+            self._counters["rejected"] += 1
+        raise AdmissionRejectedError("メモリの空きを待っているリクエストが多すぎます", self.retry_after())
+
+    def release(self, reservation: Reservation):
+        granted = []
+        with self._lock:
+            if reservation.released or reservation.id not in self._active:
+                return
+            reservation.released = True
+            del self._active[reservation.id]
+            self._hold_times.append(time.time() - reservation.granted_at)
+            # 先頭から順に、収まる限り許可する
+            while self._waiting and self._fits(self._waiting[0][0].memory_mb):
+                waiting, waiter = self._waiting.popleft()
+                self._grant(waiting)
+                granted.append(waiter)
+        for waiter in granted:
+            waiter.set_result(True)
+
+    # --- 状態 ---
+
+    def retry_after(self) -> int:
+        """Retry-After に使う秒数（直近の平均処理時間 × 待ち行列の長さ）"""
+        if not self._hold_times:
+            return DEFAULT_RETRY_AFTER_SEC
+        average = sum(self._hold_times) / len(self._hold_times)
+        return max(1, math.ceil(average * (len(self._waiting) + 1) / max(1, len(self._active))))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            reserved = self._reserved_mb()
+            active: List[Dict] = [reservation.info() for reservation in self._active.values()]
+            waiting: List[Dict] = [reservation.info() for reservation, _ in self._waiting]
+            counters = dict(self._counters)
+            retry_after = self.retry_after()
+        return {
+            "budget_mb": self.budget_mb,
+            "reserved_mb": round(reserved, 1),
+            "available_mb": round(max(0.0, self.budget_mb - reserved), 1),
+            "max_waiting": self.max_waiting,
+            "active": active,
+            "waiting": waiting,
+            "retry_after_sec": retry_after,
+            **counters,
+        }
+
+
+def reserve_for_file(
+    path: str, label: str = "", timeout: Optional[float] = None, model_name: Optional[str] = None,
+) -> Reservation:
+    """音声ファイルの処理に必要なメモリを予約する（空くまでブロックする）。model_name はプロファイルのモデル"""
+    return get_admission_controller().acquire(
+        estimate_file_mb(path, model_name), label or os.path.basename(path), timeout,
+    )
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """プロセス全体で共有するアドミッション制御"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                budget = max(1, get_memory_limit() - get_admission_base_mb())
+                _controller = AdmissionController(budget, get_admission_max_waiting())
+    return _controller
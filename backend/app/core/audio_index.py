@@ -0,0 +1,217 @@
+import bisect
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import AUDIO_DIR, AUDIO_EXTENSIONS, get_audio_index_refresh_sec
+
+#
+# 音声ディレクトリの索引
+#
+# - AUDIO_DIR 以下の音声ファイルを更新時刻順に並べて保持する（「最新のファイル」は末尾を見るだけ）
+# - 問い合わせ時、前回から AUDIO_INDEX_REFRESH_SEC 以上経っていればディレクトリの mtime を確認し、
+#   変化したディレクトリだけを scandir し直す（ファイルの追加・削除・リネームで mtime が変わる）
+# - その場で上書きされたファイルはディレクトリの mtime を変えない。全ファイルを stat し直すと
+#   確認のたびにファイル数ぶんかかるので、更新時刻が RECENT_SEC 以内のファイル（書き込み途中の録音など）
+#   だけを stat し直す。それより古いファイルを上書きした場合は invalidate(path) で知らせる
+# - 音声ストレージの管理領域（.blobs / .incoming などの隠しディレクトリと uploads）は対象外
+#
+
+# 音声ストレージが管理するディレクトリ（ジョブ処理中の一時的な参照なので索引に載せない）
+EXCLUDED_DIRS = ("uploads",)
+# 確認のたびに stat し直す、最近更新されたファイルの範囲（秒）
+RECENT_SEC = 60.0
+
+
+class AudioEntry(NamedTuple):
+    mtime: float
+    path: str
+    size: int
+
+    def info(self, root: str) -> Dict:
+        return {
+            "path": os.path.relpath(self.path, root),
+            "name": os.path.basename(self.path),
+            "size": self.size,
+            "mtime": self.mtime,
+        }
+
+
+class AudioIndex:
+    def __init__(self, root: str = AUDIO_DIR, refresh_sec: Optional[float] = None):
+        self.root = os.path.abspath(root)
+        self.refresh_sec = get_audio_index_refresh_sec() if refresh_sec is None else refresh_sec
+        self._lock = threading.Lock()
+        # (mtime, path) の昇順
+        self._order: List[Tuple[float, str]] = []
+        self._entries: Dict[str, AudioEntry] = {}
+        # ディレクトリ → (前回の mtime, 直下の音声ファイル, 直下のサブディレクトリ)
+        self._dirs: Dict[str, Tuple[float, set, set]] = {}
+        self._checked_at = 0.0
+        self.scans = 0
+
+    # --- 更新 ---
+
+    def _add(self, entry: AudioEntry):
+        self._entries[entry.path] = entry
+        bisect.insort(self._order, (entry.mtime, entry.path))
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        index = bisect.bisect_left(self._order, (entry.mtime, path))
+        if index < len(self._order) and self._order[index] == (entry.mtime, path):
+            del self._order[index]
+
+    def _update(self, path: str, stat: os.stat_result):
+        known = self._entries.get(path)
+        if known is None or known.mtime != stat.st_mtime or known.size != stat.st_size:
+            self._remove(path)
+            self._add(AudioEntry(stat.st_mtime, path, stat.st_size))
+
+    def _check_file(self, path: str):
+        """ディレクトリの mtime が変わらない変更（その場での上書き）を拾う"""
+        try:
+            self._update(path, os.stat(path))
+        except FileNotFoundError:
+            # 消えていればディレクトリの mtime も変わるが、同じ時刻の内に消えた場合に備える
+            known = self._dirs.get(os.path.dirname(path))
+            if known is not None:
+                known[1].discard(path)
+            self._remove(path)
+
+    def _check_recent(self):
+        index = bisect.bisect_left(self._order, (time.time() - RECENT_SEC, ""))
+        for _mtime, path in self._order[index:]:
+            self._check_file(path)
+
+    def _forget_dir(self, directory: str):
+        _mtime, files, subdirs = self._dirs.pop(directory, (0.0, set(), set()))
+        for path in files:
+            self._remove(path)
+        for subdir in subdirs:
+            self._forget_dir(subdir)
+
+    def _scan_dir(self, directory: str, mtime: float):
+        """1 つのディレクトリの直下だけを読み直し、差分を索引に反映する"""
+        self.scans += 1
+        _old_mtime, old_files, old_subdirs = self._dirs.get(directory, (0.0, set(), set()))
+        files, subdirs = set(), set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if directory == self.root and entry.name in EXCLUDED_DIRS:
+                        continue
+                    subdirs.add(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                    stat = entry.stat()
+                    files.add(entry.path)
+                    self._update(entry.path, stat)
+        for path in old_files - files:
+            self._remove(path)
+        for subdir in old_subdirs - subdirs:
+            self._forget_dir(subdir)
+        self._dirs[directory] = (mtime, files, subdirs)
+        for subdir in subdirs - old_subdirs:
+            self._check_dir(subdir)
+
+    def _check_dir(self, directory: str):
+        try:
+            mtime = os.stat(directory).st_mtime
+        except FileNotFoundError:
+            self._forget_dir(directory)
+            return
+        known = self._dirs.get(directory)
+        if known is None or known[0] != mtime:
+            self._scan_dir(directory, mtime)
+            known = self._dirs[directory]
+        for subdir in list(known[2]):
+            self._check_dir(subdir)
+
+    def refresh(self, force: bool = False):
+        """前回の確認から refresh_sec 以上経っていれば、変化したディレクトリだけ読み直す"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_sec:
+                return
+            self._checked_at = now
+            if os.path.isdir(self.root):
+                self._check_dir(self.root)
+                self._check_recent()
+            else:
+                self._forget_dir(self.root)
+
+    def invalidate(self, path: str):
+        """path（ファイルかディレクトリ）が変わったことを知らせる。RECENT_SEC より古いファイルの上書きはこれで拾う"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._entries:
+                self._check_file(path)
+                return
+            # 索引に無いファイルやディレクトリは、そのディレクトリを次の確認で読み直す
+            directory = path if path in self._dirs else os.path.dirname(path)
+            if directory in self._dirs:
+                _mtime, files, subdirs = self._dirs[directory]
+                self._dirs[directory] = (0.0, files, subdirs)
+                self._checked_at = 0.0
+
+    # --- 問い合わせ ---
+
+    def latest(self) -> Optional[AudioEntry]:
+        """更新時刻が最も新しい音声ファイル"""
+        self.refresh()
+        with self._lock:
+            if not self._order:
+                return None
+            return self._entries[self._order[-1][1]]
+
+    def newest(self, offset: int = 0, limit: int = 50) -> List[AudioEntry]:
+        """新しい順に offset 件目から limit 件"""
+        self.refresh()
+        with self._lock:
+            end = len(self._order) - offset
+            start = max(0, end - limit)
+            return [self._entries[path] for _, path in reversed(self._order[start:max(0, end)])]
+
+    def since(self, mtime: float) -> List[AudioEntry]:
+        """mtime より後に更新されたファイル（古い順）"""
+        self.refresh()
+        with self._lock:
+            index = bisect.bisect_right(self._order, (mtime, "\U0010ffff"))
+            return [self._entries[path] for _, path in self._order[index:]]
+
+    def files_under(self, directory: str) -> Optional[List[str]]:
+        """directory 以下の音声ファイルのパス。索引の対象外のディレクトリなら None"""
+        directory = os.path.abspath(directory)
+        if os.path.commonpath([self.root, directory]) != self.root:
+            return None
+        parts = os.path.relpath(directory, self.root).split(os.sep)
+        if parts[0] in EXCLUDED_DIRS or any(part.startswith(".") and part != "." for part in parts):
+            return None
+        self.refresh()
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self._lock:
+            return [path for path in self._entries if path.startswith(prefix)]
+
+    def __len__(self) -> int:
+        self.refresh()
+        with self._lock:
+            return len(self._order)
+
+
+_index: Optional[AudioIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_audio_index() -> AudioIndex:
+    """AUDIO_DIR の索引（プロセス全体で共有）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AudioIndex()
+    return _index
@@ -1,7 +1,7 @@
 import subprocess
-import os
 
 def remove_silence(input_path: str, output_path: str):
+    # ファイルを書き出す旧来の無音除去（文字起こしでは decode_audio + trim_leading_silence を使う）
     print(f"[Silence] 無音除去開始: 入力={input_path} → 出力={output_path}")  # ← ログ追加
 
     cmd = [
@@ -16,4 +16,117 @@ def remove_silence(input_path: str, output_path: str):
         return output_path
     except subprocess.CalledProcessError as e:
         print(f"[Silence] 無音除去エラー: {e}")  # ← ログ追加
-        return None
\ No newline at end of file
+        return None
+
+def probe_duration(input_path: str) -> float:
+    """ffprobe で音声の長さ（秒）を取得する（デコードはしない）"""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_path
+    ]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+    return float(output) if output and output != "N/A" else 0.0
+
+
+def detect_silences(input_path: str, noise_db: int = -30, min_silence_sec: float = 0.5):
+    """
+    silenceremove と同じしきい値で ffmpeg の silencedetect を実行し、
+    無音区間 [(開始秒, 終了秒), ...] を返す（ファイルは書き出さない）
+    """
+    print(f"[Silence] 無音区間検出開始: {input_path}")
+    cmd = [
+        "ffmpeg",
+        "-hide_banner", "-nostats",
+        "-i", input_path,
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence_sec}",
+        "-f", "null", "-"
+    ]
+    completed = subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+    silences = []
+    start = None
+    for line in completed.stderr.splitlines():
+        if "silence_start:" in line:
+            start = float(line.split("silence_start:")[1].split()[0])
+        elif "silence_end:" in line and start is not None:
+            end = float(line.split("silence_end:")[1].split()[0])
+            silences.append((max(0.0, start), end))
+            start = None
+    print(f"[Silence] 無音区間検出完了: {len(silences)}箇所")
+    return silences
+
+
+SAMPLE_RATE = 16000
+
+
+def _decode_pcm(cmd):
+    """ffmpeg の標準出力（s16le）を float32 の NumPy 配列に変換する"""
+    import numpy as np
+
+    raw = subprocess.run(cmd, check=True, capture_output=True).stdout
+    return np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(input_path: str, sample_rate: int = SAMPLE_RATE):
+    """
+    ファイル全体を 1 回だけデコードし、16kHz モノラルの float32 波形を返す。
+    中間ファイルは作らず、ffmpeg の出力をパイプで直接受け取る。
+    16kHz モノラル 16bit の WAV は ffmpeg を起動せず mmap で直接読む。
+    """
+    from app.core.storage import read_wav_mmap
+
+    audio = read_wav_mmap(input_path, sample_rate)
+    if audio is not None:
+        return audio
+    cmd = [
+        "ffmpeg",
+        "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", input_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "-"
+    ]
+    return _decode_pcm(cmd)
+
+
+def load_audio_segment(input_path: str, start: float, duration: float, sample_rate: int = SAMPLE_RATE):
+    """
+    指定区間だけを ffmpeg でデコードし、float32 のモノラル波形（NumPy 配列）を返す。
+    ファイル全体をメモリに載せずに長時間音声の一部を読むために使う。
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}",
+        "-t", f"{duration:.3f}",
+        "-i", input_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "-"
+    ]
+    return _decode_pcm(cmd)
+
+
+def trim_leading_silence(audio, threshold_db: float = -30.0, sample_rate: int = SAMPLE_RATE, frame_ms: int = 10):
+    """
+    silenceremove=1:0:-30dB と同じく先頭の無音だけを取り除く（NumPy でベクトル化）。
+    取り除いた後の波形と、取り除いた長さ（秒）を返す。
+    """
+    import numpy as np
+
+    frame = sample_rate * frame_ms // 1000
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return audio, 0.0
+    frames = audio[: n_frames * frame].reshape(n_frames, frame)
+    # フレームごとのピーク振幅で判定（silenceremove のデフォルト detection=peak 相当）
+    peaks = np.abs(frames).max(axis=1)
+    voiced = np.flatnonzero(peaks > 10 ** (threshold_db / 20))
+    if voiced.size == 0:
+        return audio[:0], len(audio) / sample_rate
+    start = int(voiced[0]) * frame
+    if start == 0:
+        return audio, 0.0
+    print(f"[Silence] 先頭の無音を除去: {start / sample_rate:.2f}秒")
+    return audio[start:], start / sample_rate
@@ -0,0 +1,123 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from app.config import get_backend_name
+
+#
+# 推論バックエンド
+#
+# - "whisper"      : openai-whisper をそのまま fp32 で使う（従来の処理）
+# - "whisper-int8" : 読み込んだモデルの Linear 層を torch の動的量子化で int8 にする（CPU 専用）
+# - WHISPER_BACKEND で切り替える。モデルプールには dtype をキーに別々に保持される
+#
+
+
+class InferenceBackend:
+    name = ""
+    # モデルプールのキーに使う dtype
+    dtype = ""
+    description = ""
+
+    def load(self, model_name: str, device: str = "cpu"):
+        raise NotImplementedError
+
+    @contextmanager
+    def lease(self, model_name: Optional[str] = None, timeout: Optional[float] = None):
+        """このバックエンドのモデルをモデルプールから借りる"""
+        from app.core.model_pool import get_model_pool
+
+        with get_model_pool().lease(model_name, device="cpu", dtype=self.dtype, timeout=timeout) as model:
+            yield model
+
+    def pin(self, model_name: Optional[str] = None):
+        """unpin() されるまで、このバックエンドのモデルをプールに残す"""
+        from app.core.model_pool import get_model_pool
+
+        get_model_pool().pin(model_name, device="cpu", dtype=self.dtype)
+
+    def unpin(self, model_name: Optional[str] = None):
+        from app.core.model_pool import get_model_pool
+
+        get_model_pool().unpin(model_name, device="cpu", dtype=self.dtype)
+
+    def info(self) -> Dict:
+        return {"name": self.name, "dtype": self.dtype, "description": self.description}
+
+
+class WhisperBackend(InferenceBackend):
+    name = "whisper"
+    dtype = "fp32"
+    description = "openai-whisper（PyTorch fp32）"
+
+    def load(self, model_name: str, device: str = "cpu"):
+        import whisper
+
+        return whisper.load_model(model_name, device=device)
+
+
+_quantize_lock = threading.Lock()
+
+
+def _plain_linears(model):
+    """whisper.model.Linear（nn.Linear のサブクラス）を同じ重みの nn.Linear に置き換える"""
+    import torch
+    import whisper.model
+
+    # quantize_dynamic はサブクラスを変換できない（from_float がクラス名で弾く）
+    targets = [(name, module) for name, module in model.named_modules() if type(module) is whisper.model.Linear]
+    for name, module in targets:
+        linear = torch.nn.Linear(module.in_features, module.out_features, bias=module.bias is not None)
+        linear.weight = module.weight
+        linear.bias = module.bias
+        parent_name, _, attr = name.rpartition(".")
+        setattr(model.get_submodule(parent_name), attr, linear)
+    return model
+
+
+def quantize_model(model):
+    """whisper のモデルの Linear 層を動的 int8 量子化する（埋め込み行列を使う出力層と畳み込み層は fp32 のまま）"""
+    import torch
+
+    with _quantize_lock:
+        if torch.backends.quantized.engine == "none":
+            engines = torch.backends.quantized.supported_engines
+            torch.backends.quantized.engine = "fbgemm" if "fbgemm" in engines else "qnnpack"
+        # 置き換えた時点で元のモデルは変わっているので、複製せずにそのまま変換する（fp32 の重みを 2 重に持たない）
+        model = torch.quantization.quantize_dynamic(
+            _plain_linears(model), {torch.nn.Linear}, dtype=torch.qint8, inplace=True,
+        )
+    model.eval()
+    return model
+
+
+class WhisperInt8Backend(WhisperBackend):
+    name = "whisper-int8"
+    dtype = "int8"
+    description = "openai-whisper の Linear 層を動的 int8 量子化（CPU のみ）"
+
+    def load(self, model_name: str, device: str = "cpu"):
+        if device != "cpu":
+            raise ValueError(f"{self.name} は CPU でのみ使用できます: {device}")
+        return quantize_model(super().load(model_name, device))
+
+
+BACKENDS: Dict[str, InferenceBackend] = {
+    backend.name: backend for backend in (WhisperBackend(), WhisperInt8Backend())
+}
+
+
+def get_backend(name: Optional[str] = None) -> InferenceBackend:
+    """名前（省略時は WHISPER_BACKEND）からバックエンドを取得する"""
+    name = name or get_backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"不明な推論バックエンドです: {name}（選択肢: {', '.join(BACKENDS)}）")
+    return BACKENDS[name]
+
+
+def load_model(model_name: str, device: str = "cpu", dtype: str = "fp32"):
+    """モデルプールのローダー：dtype に対応するバックエンドで読み込む"""
+    for backend in BACKENDS.values():
+        if backend.dtype == dtype:
+            return backend.load(model_name, device)
+    raise ValueError(f"サポートされていない dtype です: {dtype}")
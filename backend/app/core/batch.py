@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.config import ARCHIVE_DIR, AUDIO_EXTENSIONS, OUTPUT_DIR, get_job_workers
+from app.core.job_queue import write_result_files
+from app.core.audio_index import get_audio_index
+
+#
+# ディレクトリ／マニフェスト単位のバッチ文字起こし
+#
+# - 入力: 音声ディレクトリ（再帰的に探索）か、パスを 1 行ずつ書いたマニフェスト（.txt / .json）
+# - 大きいファイルから順にワーカープールへ投入する（最後に巨大ファイルが残って待たされないように）
+# - 1 ファイル終わるごとにチェックポイント（JSON Lines）へ追記し、途中から再開できる
+# - 結果は OUTPUT_DIR に書き出し、処理済みの音声は ARCHIVE_DIR へ移動する
+#
+
+
+def collect_files(source: str) -> List[str]:
+    """ディレクトリまたはマニフェストから音声ファイルの絶対パス一覧を作る"""
+    source = os.path.abspath(source)
+    if os.path.isdir(source):
+        # AUDIO_DIR 以下なら索引から引く（ディレクトリを歩かない）
+        indexed = get_audio_index().files_under(source)
+        if indexed is not None:
+            return indexed
+        files = []
+        for root, dirs, names in os.walk(source):
+            # 音声ストレージの管理領域（.store / .blobs など）には入らない
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in names:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    files.append(os.path.join(root, name))
+        return files
+
+    base_dir = os.path.dirname(source)
+    with open(source, "r", encoding="utf-8") as f:
+        if source.endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [os.path.normpath(os.path.join(base_dir, entry)) for entry in entries]
+
+
+def default_checkpoint_path(source: str) -> str:
+    name = os.path.basename(os.path.normpath(source)) or "batch"
+    return os.path.join(OUTPUT_DIR, f"batch_{name}.checkpoint.jsonl")
+
+
+class BatchRun:
+    def __init__(
+        self,
+        source: str,
+        workers: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        archive: bool = True,
+    ):
+        self.batch_id = str(uuid.uuid4())
+        self.source = os.path.abspath(source)
+        self.workers = workers or get_job_workers()
+        self.checkpoint_path = checkpoint_path or default_checkpoint_path(source)
+        self.archive = archive
+        self.status = "pending"
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._counts = {"total": 0, "done": 0, "failed": 0, "skipped": 0}
+
+    # --- チェックポイント ---
+
+    def _load_checkpoint(self) -> set:
+        completed = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 書き込み途中で止まった行は無視する
+                    if record.get("status") == "done":
+                        completed.add(record["path"])
+        return completed
+
+    def _record(self, record: Dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._counts[record["status"]] += 1
+
+    # --- 実行 ---
+
+    def _relative_name(self, path: str) -> str:
+        base = self.source if os.path.isdir(self.source) else os.path.dirname(self.source)
+        relative = os.path.relpath(path, base)
+        if relative.startswith(".."):
+            relative = os.path.basename(path)
+        return relative
+
+    def _process(self, path: str):
+        # 循環 import を避けるためここで import する
+        from app.core.transcribe_logic import transcribe_result
+        from app.core.admission import reserve_for_file
+        from app.core.profiles import get_profile
+
+        started = time.perf_counter()
+        relative = self._relative_name(path)
+        stem = os.path.splitext(relative)[0].replace(os.sep, "__")
+        try:
+            profile = get_profile()
+            with reserve_for_file(path, model_name=profile.model_name):
+                result = transcribe_result(path, profile=profile)
+            text_path, json_path = write_result_files(
+                stem, result,
+                paths=(os.path.join(OUTPUT_DIR, f"{stem}.txt"), os.path.join(OUTPUT_DIR, f"{stem}.json")),
+            )
+            archived_path = self._archive(path, relative) if self.archive else None
+        except Exception as e:
+            print(f"[Batch] 失敗: {path}: {e}")
+            self._record({"path": path, "status": "failed", "error": str(e)})
+            return
+        self._record({
+            "path": path,
+            "status": "done",
+            "text_path": text_path,
+            "json_path": json_path,
+            "archived_path": archived_path,
+            "elapsed_sec": round(time.perf_counter() - started, 3),
+        })
+        print(f"[Batch] 完了: {relative}")
+
+    def _archive(self, path: str, relative: str) -> str:
+        archive_root = os.path.abspath(ARCHIVE_DIR)
+        if os.path.commonpath([archive_root, path]) == archive_root:
+            return path  # すでにアーカイブ内のファイル
+        destination = os.path.join(archive_root, relative)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(path, destination)
+        return destination
+
+    def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        completed = self._load_checkpoint()
+        files = [path for path in collect_files(self.source) if os.path.isfile(path)]
+        pending = [path for path in files if path not in completed]
+        # 大きいファイルから処理する
+        pending.sort(key=os.path.getsize, reverse=True)
+        with self._lock:
+            self._counts.update(total=len(files), skipped=len(files) - len(pending))
+        print(f"[Batch] 開始: {len(pending)}件（スキップ {len(files) - len(pending)}件）/ {self.workers}ワーカー")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-worker") as executor:
+                list(executor.map(self._process, pending))
+        except Exception:
+            self.status = "failed"
+            raise
+        finally:
+            self.finished_at = time.time()
+        self.status = "done"
+        print(f"[Batch] 終了: {self.summary()}")
+
+    def start(self) -> threading.Thread:
+        """バックグラウンドスレッドで実行する（API 用）"""
+        thread = threading.Thread(target=self.run, name=f"batch-{self.batch_id[:8]}", daemon=True)
+        thread.start()
+        return thread
+
+    def summary(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "batch_id": self.batch_id,
+            "source": self.source,
+            "status": self.status,
+            "workers": self.workers,
+            "checkpoint": self.checkpoint_path,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **counts,
+            "remaining": counts["total"] - counts["done"] - counts["failed"] - counts["skipped"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ディレクトリ／マニフェスト単位でバッチ文字起こしを行う")
+    parser.add_argument("source", help="音声ディレクトリ、またはパスを列挙したマニフェスト（.txt / .json）")
+    parser.add_argument("--workers", type=int, default=None, help="並列数（デフォルト: JOB_WORKERS）")
+    parser.add_argument("--checkpoint", default=None, help="チェックポイントファイルのパス")
+    parser.add_argument("--no-archive", action="store_true", help="処理済みの音声を ARCHIVE_DIR へ移動しない")
+    args = parser.parse_args()
+
+    batch = BatchRun(args.source, args.workers, args.checkpoint, archive=not args.no_archive)
+    batch.run()
+    print(json.dumps(batch.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
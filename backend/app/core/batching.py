@@ -0,0 +1,292 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import get_batching_settings, get_model_name
+from app.core import metrics
+from app.core.audio_preprocess import SAMPLE_RATE
+
+#
+# 短い音声のマイクロバッチ推論
+#
+# - 30 秒以下の音声を数ミリ秒だけ溜め、log-mel を 1 つのバッチ（B × n_mels × 3000）に積む
+# - エンコーダーと最初の温度（通常は 0）のデコードをバッチのまま 1 回で実行し、結果を各呼び出し元に返す
+# - デコードプロファイルごとに別のバッチャーを持ち、プロファイルのビーム幅・温度・判定基準で推論する
+# - 品質の基準（圧縮率・平均対数尤度）を満たさなかった音声は、呼び出し元のスレッドに戻してから
+#   従来通り個別に transcribe する（温度を上げて再試行する Whisper の通常のフォールバック。
+#   呼び出し元の DecodeBudget の上限まで）。同じバッチの他の呼び出し元はフォールバックを待たない
+# - どうせ 30 秒に詰め物をするので、バッチに入れる音声には VAD を使わない
+#
+
+# whisper.transcribe の既定の判定基準
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+# タイムスタンプトークン 1 つ分の秒数
+TIME_PRECISION = 0.02
+# 個別処理に回す音声の印（バッチの結果の代わりに返す）
+FALLBACK = None
+
+
+class _Request(NamedTuple):
+    audio: object
+    future: Future
+    submitted: float
+
+
+def split_segments(tokenizer, tokens: List[int], duration: float) -> List[Dict]:
+    """タイムスタンプトークンの位置でセグメントに分ける"""
+    segments = []
+    begin = tokenizer.timestamp_begin
+    start_time = None
+    text_tokens: List[int] = []
+    for token in tokens:
+        if token >= begin:
+            time_sec = (token - begin) * TIME_PRECISION
+            if start_time is None:
+                start_time = time_sec
+            elif text_tokens:
+                segments.append((start_time, time_sec, text_tokens))
+                text_tokens = []
+                start_time = None
+            else:
+                start_time = time_sec
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    if text_tokens:
+        # 終わりのタイムスタンプが無い場合は音声の終わりまでとする
+        segments.append((start_time or 0.0, duration, text_tokens))
+    return [
+        {
+            "id": index,
+            "start": round(start, 3),
+            "end": round(min(end, duration), 3),
+            "text": tokenizer.decode(text_tokens),
+        }
+        for index, (start, end, text_tokens) in enumerate(segments)
+    ]
+
+
+def _thresholds(options: Dict):
+    return (
+        options.get("compression_ratio_threshold", COMPRESSION_RATIO_THRESHOLD),
+        options.get("logprob_threshold", LOGPROB_THRESHOLD),
+        options.get("no_speech_threshold", NO_SPEECH_THRESHOLD),
+    )
+
+
+def needs_fallback(result, options: Dict) -> bool:
+    """whisper.transcribe の decode_with_fallback と同じ順で判定する（無音とみなした窓はやり直さない）"""
+    compression_ratio_threshold, logprob_threshold, no_speech_threshold = _thresholds(options)
+    needed = False
+    if compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold:
+        needed = True
+    if logprob_threshold is not None and result.avg_logprob < logprob_threshold:
+        needed = True
+    if (
+        no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold
+        and logprob_threshold is not None and result.avg_logprob < logprob_threshold
+    ):
+        needed = False
+    return needed
+
+
+def is_silent(result, options: Dict) -> bool:
+    """whisper.transcribe が窓を読み飛ばす条件（無音確率が高く、平均対数尤度も高くない）"""
+    _compression_ratio_threshold, logprob_threshold, no_speech_threshold = _thresholds(options)
+    if no_speech_threshold is None or result.no_speech_prob <= no_speech_threshold:
+        return False
+    return logprob_threshold is None or result.avg_logprob <= logprob_threshold
+
+
+def _temperatures(options: Dict) -> Tuple[float, ...]:
+    temperature = options.get("temperature", 0.0)
+    return (float(temperature),) if isinstance(temperature, (int, float)) else tuple(temperature)
+
+
+class MicroBatcher:
+    def __init__(self, window_ms: float, max_size: int, max_clip_sec: float, options: Dict, model_name: Optional[str] = None):
+        self.window_sec = window_ms / 1000
+        self.max_size = max_size
+        self.max_clip_sec = max_clip_sec
+        self.options = options
+        self.model_name = model_name or get_model_name()
+        self._cond = threading.Condition()
+        self._queue: List[_Request] = []
+        self._worker: Optional[threading.Thread] = None
+        self._counters = {"batches": 0, "clips": 0, "fallbacks": 0, "max_batch": 0}
+
+    def accepts(self, audio) -> bool:
+        return len(audio) / SAMPLE_RATE <= self.max_clip_sec
+
+    def transcribe(self, audio, budget=None) -> Dict:
+        """バッチに入れて推論し、結果が出るまで待つ（ワーカースレッドから呼ぶ）
+
+        品質の基準を満たさなかった音声は、このスレッドで個別に文字起こしし直す。
+        そのフォールバックは budget（DecodeBudget）の上限までに抑え、回数も budget に記録する。
+        """
+        future: Future = Future()
+        with self._cond:
+            self._queue.append(_Request(audio, future, time.monotonic()))
+            self._ensure_worker()
+            self._cond.notify()
+        result = future.result()
+        if result is FALLBACK:
+            result = self._fallback(audio, budget)
+        return result
+
+    def _fallback(self, audio, budget) -> Dict:
+        # グリーディでは品質が足りないので、温度フォールバック付きの通常処理に回す
+        # （呼び出し元の予算で打ち切れるよう BudgetedModel 経由で行う）
+        from app.core.backends import get_backend
+        from app.core.profiles import BudgetedModel
+
+        with get_backend().lease(self.model_name) as model:
+            target = model if budget is None else BudgetedModel(model, budget)
+            with metrics.stage("inference"):
+                return target.transcribe(audio, **self.options)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # 最初の 1 件が来てから window の間だけ相手を待つ
+            deadline = self._queue[0].submitted + self.window_sec
+            while len(self._queue) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._queue = self._queue[:self.max_size], self._queue[self.max_size:]
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._run_batch([request.audio for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+    def _decode_batch(self, model, clips: List):
+        """30 秒に詰めた log-mel を積んで 1 回でデコードする → (クリップごとの DecodingResult, トークナイザー)"""
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        with metrics.stage("batch_mel"):
+            n_mels = getattr(model.dims, "n_mels", 80)
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)), n_mels)
+                for clip in clips
+            ]).to(model.device)
+
+        temperature = _temperatures(self.options)[0]
+        decode_options = whisper.DecodingOptions(
+            task=self.options.get("task", "transcribe"),
+            language=self.options.get("language"),
+            temperature=temperature,
+            # whisper.transcribe と同じく、温度 0 ではビームサーチ、それ以外ではサンプリング数を使う
+            beam_size=self.options.get("beam_size") if temperature == 0 else None,
+            best_of=self.options.get("best_of") if temperature > 0 else None,
+            fp16=self.options.get("fp16", False),
+        )
+        with metrics.stage("batch_inference"):
+            decoded = whisper.decode(model, mel, decode_options)
+
+        tokenizer = get_tokenizer(
+            model.is_multilingual,
+            num_languages=getattr(model, "num_languages", 99),
+            language=decode_options.language,
+            task=decode_options.task,
+        )
+        return decoded, tokenizer
+
+    def _run_batch(self, clips: List) -> List[Optional[Dict]]:
+        """クリップごとの結果を返す。個別処理に回すものは FALLBACK"""
+        from app.core.backends import get_backend
+
+        with get_backend().lease(self.model_name) as model:
+            decoded, tokenizer = self._decode_batch(model, clips)
+
+        # 温度を上げる余地が無いプロファイル（fast）では、基準を満たさなくてもそのまま使う
+        can_fall_back = len(_temperatures(self.options)) > 1
+        results = []
+        fallbacks = 0
+        for clip, result in zip(clips, decoded):
+            if can_fall_back and needs_fallback(result, self.options):
+                fallbacks += 1
+                results.append(FALLBACK)
+                continue
+            segments = [] if is_silent(result, self.options) else split_segments(
+                tokenizer, result.tokens, len(clip) / SAMPLE_RATE,
+            )
+            for segment in segments:
+                segment.update(avg_logprob=result.avg_logprob, no_speech_prob=result.no_speech_prob)
+            results.append({
+                "text": "".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "language": result.language,
+            })
+
+        with self._cond:
+            self._counters["batches"] += 1
+            self._counters["clips"] += len(clips)
+            self._counters["fallbacks"] += fallbacks
+            self._counters["max_batch"] = max(self._counters["max_batch"], len(clips))
+        print(f"[Batcher] {len(clips)}件をまとめて推論（個別処理に回した数: {fallbacks}）")
+        return results
+
+    def stats(self) -> Dict:
+        with self._cond:
+            counters = dict(self._counters)
+            waiting = len(self._queue)
+        return {
+            **counters,
+            "waiting": waiting,
+            "avg_batch": round(counters["clips"] / counters["batches"], 2) if counters["batches"] else 0.0,
+            "window_ms": self.window_sec * 1000,
+            "max_size": self.max_size,
+            "max_clip_sec": self.max_clip_sec,
+            "model": self.model_name,
+        }
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_micro_batcher(profile, options: Dict) -> Optional[MicroBatcher]:
+    """マイクロバッチが有効ならプロファイルごとのプロセス共有のインスタンスを、無効なら None を返す
+
+    options はそのプロファイルで model.transcribe に渡すオプション（既定の設定＋プロファイル）。
+    """
+    settings = get_batching_settings()
+    if not settings["enabled"]:
+        return None
+    batcher = _batchers.get(profile.name)
+    if batcher is None or batcher.options != options or batcher.model_name != profile.model_name:
+        with _batchers_lock:
+            batcher = _batchers.get(profile.name)
+            if batcher is None or batcher.options != options or batcher.model_name != profile.model_name:
+                batcher = MicroBatcher(
+                    settings["window_ms"], settings["max_size"], settings["max_clip_sec"], options, profile.model_name,
+                )
+                _batchers[profile.name] = batcher
+    return batcher
+
+
+def batcher_stats() -> Dict:
+    """プロファイルごとのマイクロバッチの統計（まだ使われていないプロファイルは含まない）"""
+    with _batchers_lock:
+        return {name: batcher.stats() for name, batcher in _batchers.items()}
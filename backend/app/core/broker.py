@@ -0,0 +1,139 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from app.config import get_job_broker, get_job_max_attempts
+
+#
+# ジョブブローカー
+#
+# - API 層（ジョブの登録）と推論ワーカー（ジョブの実行）の間の受け渡しを抽象化する
+# - ワーカーはジョブをリース（期限付き）で確保し、実行中はハートビートで期限を延ばす
+# - 期限切れのジョブ（ワーカーが落ちた等）は別のワーカーが確保し直して再実行する
+# - 完了・失敗の記録は確保しているワーカーからのものだけを受け付ける（期限切れ後の二重書き込みを防ぐ）
+#
+# 現在の実装は SQLite（JOB_DB_PATH を共有できる同一ホスト／共有ボリューム上のワーカー向け）。
+# Redis などを使う場合は JobBroker を実装して create_broker() に追加する。
+#
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobBroker(ABC):
+    @abstractmethod
+    def claim(self, worker_id: str, lease_sec: float) -> Optional[Dict]:
+        """実行待ち（またはリース切れ）のジョブを 1 件確保して返す。無ければ None"""
+
+    @abstractmethod
+    def heartbeat(self, file_id: str, worker_id: str, lease_sec: float) -> bool:
+        """リースを延長する。すでに確保していなければ False"""
+
+    @abstractmethod
+    def progress(self, file_id: str, worker_id: str, progress: float):
+        """進捗を記録する"""
+
+    @abstractmethod
+    def complete(self, file_id: str, worker_id: str, **fields) -> bool:
+        """完了を記録する。確保していなければ何もせず False"""
+
+    @abstractmethod
+    def fail(self, file_id: str, worker_id: str, error: str) -> bool:
+        """失敗を記録する。確保していなければ何もせず False"""
+
+    @abstractmethod
+    def pending_count(self) -> int:
+        """実行待ち＋実行中のジョブ数"""
+
+
+class SqliteJobBroker(JobBroker):
+    """JobStore（jobs テーブル）をそのまま待ち行列として使う"""
+
+    def __init__(self, store, max_attempts: Optional[int] = None):
+        self.store = store
+        self.max_attempts = max_attempts or get_job_max_attempts()
+
+    def claim(self, worker_id: str, lease_sec: float) -> Optional[Dict]:
+        now = time.time()
+        conn = self.store.conn
+        with self.store.lock:
+            # BEGIN IMMEDIATE で書き込みロックを取り、複数プロセスのワーカーが同じジョブを取らないようにする
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        """
+                        SELECT * FROM jobs
+                        WHERE status = ? OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?))
+                        ORDER BY created_at LIMIT 1
+                        """,
+                        (STATUS_QUEUED, STATUS_RUNNING, now),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    job = dict(row)
+                    attempts = (job["attempts"] or 0) + 1
+                    if attempts > self.max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, worker_id = NULL WHERE file_id = ?",
+                            (STATUS_FAILED, f"再実行の上限（{self.max_attempts}回）に達しました", now, job["file_id"]),
+                        )
+                        continue
+                    conn.execute(
+                        """
+                        UPDATE jobs SET status = ?, worker_id = ?, lease_expires_at = ?, attempts = ?,
+                                        started_at = ?, progress = 0
+                        WHERE file_id = ?
+                        """,
+                        (STATUS_RUNNING, worker_id, now + lease_sec, attempts, now, job["file_id"]),
+                    )
+                    conn.execute("COMMIT")
+                    job.update(status=STATUS_RUNNING, worker_id=worker_id, attempts=attempts, started_at=now)
+                    return job
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _update_owned(self, file_id: str, worker_id: str, **fields) -> bool:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.store.lock, self.store.conn:
+            cursor = self.store.conn.execute(
+                f"UPDATE jobs SET {columns} WHERE file_id = ? AND worker_id = ? AND status = ?",
+                (*fields.values(), file_id, worker_id, STATUS_RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, file_id: str, worker_id: str, lease_sec: float) -> bool:
+        return self._update_owned(file_id, worker_id, lease_expires_at=time.time() + lease_sec)
+
+    def progress(self, file_id: str, worker_id: str, progress: float):
+        self._update_owned(file_id, worker_id, progress=progress)
+
+    def complete(self, file_id: str, worker_id: str, **fields) -> bool:
+        return self._update_owned(
+            file_id, worker_id, status=STATUS_DONE, progress=1.0, finished_at=time.time(),
+            lease_expires_at=None, **fields,
+        )
+
+    def fail(self, file_id: str, worker_id: str, error: str) -> bool:
+        return self._update_owned(
+            file_id, worker_id, status=STATUS_FAILED, error=error, finished_at=time.time(), lease_expires_at=None,
+        )
+
+    def pending_count(self) -> int:
+        with self.store.lock:
+            row = self.store.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchone()
+        return row[0]
+
+
+def create_broker(store) -> JobBroker:
+    """JOB_BROKER に応じたブローカーを作る"""
+    name = get_job_broker()
+    if name == "sqlite":
+        return SqliteJobBroker(store)
+    raise ValueError(f"不明なジョブブローカーです: {name}")
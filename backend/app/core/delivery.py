@@ -0,0 +1,331 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from app.config import DELIVERY_CACHE_DIR
+from app.core.segment_store import RENDERERS, SegmentStore, render_result, segments_path
+
+#
+# 文字起こし結果の配信
+#
+# - 結果（TXT / JSON / SRT / VTT と /api/result の JSON）は一度だけ生成してファイルに書き出し、
+#   gzip（zstandard が入っていれば zstd も）で圧縮した版を並べて置く
+# - Accept-Encoding で配信する版を選び、版ごとの強い ETag で If-None-Match に 304 を返す
+# - Range（bytes=開始-終了 の単一範囲）に 206 で応える。範囲指定は常に無圧縮の版に対して行う
+# - 生成元（セグメントストア等）の更新時刻・サイズが変わったら作り直す
+# - 音声ストレージの整理（AUDIO_RETENTION_DAYS）と同じ周期で、保持期間を過ぎたもの・生成元が消えたものを消す
+#
+
+# これより小さい結果は圧縮しない（ヘッダーの方が大きくなる）
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+# ファイルを読み出す単位
+READ_CHUNK = 64 * 1024
+# 優先する順（同じ q 値なら先にあるもの）
+ENCODINGS = ("zstd", "gzip", "identity")
+SUFFIXES = {"identity": "", "gzip": ".gz", "zstd": ".zst"}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# meta.json の無い（作成途中の）ディレクトリを消してよくなるまでの時間
+INCOMPLETE_STALE_SEC = 3600
+
+
+def _zstd():
+    """zstandard は任意の依存（無ければ zstd 版は作らない）"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class Variants(NamedTuple):
+    etag: str
+    # encoding → (パス, バイト数)
+    files: Dict[str, Tuple[str, int]]
+
+    def etag_for(self, encoding: str) -> str:
+        # 版ごとに中身が違うので、強い ETag も版ごとに分ける
+        return f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_for(name: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _tmp_path(path: str) -> str:
+    # API とワーカーの別プロセスが同時に作っても衝突しないよう、プロセスとスレッドで分ける
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _source_stamp(source_path: str) -> Dict:
+    stat = os.stat(source_path)
+    return {"source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size}
+
+
+def _load_variants(directory: str, stamp: Dict) -> Optional[Variants]:
+    try:
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(key) != value for key, value in stamp.items()):
+        return None
+    files = {}
+    for encoding, size in meta["sizes"].items():
+        path = os.path.join(directory, f"body{SUFFIXES[encoding]}")
+        if not os.path.exists(path):
+            return None
+        files[encoding] = (path, size)
+    return Variants(meta["etag"], files)
+
+
+def prepare(name: str, source_path: str, produce: Callable[[], Iterable[bytes]]) -> Variants:
+    """name（例: "{file_id}/srt"）の配信用ファイルを用意する
+
+    source_path は生成元のファイル（更新されたら作り直す）、produce は無圧縮の本文をバイト列で返す。
+    """
+    directory = os.path.join(DELIVERY_CACHE_DIR, name)
+    stamp = _source_stamp(source_path)
+    variants = _load_variants(directory, stamp)
+    if variants is not None:
+        return variants
+
+    with _lock_for(name):
+        variants = _load_variants(directory, stamp)
+        if variants is not None:
+            return variants
+        os.makedirs(directory, exist_ok=True)
+        identity_path = os.path.join(directory, "body")
+        digest = hashlib.sha256()
+        tmp_path = _tmp_path(identity_path)
+        with open(tmp_path, "wb") as f:
+            for chunk in produce():
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(tmp_path, identity_path)
+        sizes = {"identity": os.path.getsize(identity_path)}
+
+        if sizes["identity"] >= MIN_COMPRESS_BYTES:
+            gzip_path = identity_path + SUFFIXES["gzip"]
+            # mtime=0 で同じ内容からは同じバイト列にする（ETag を内容で決めるため）
+            gzip_tmp = _tmp_path(gzip_path)
+            with open(identity_path, "rb") as src, open(gzip_tmp, "wb") as raw, \
+                    gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, READ_CHUNK)
+            os.replace(gzip_tmp, gzip_path)
+            sizes["gzip"] = os.path.getsize(gzip_path)
+
+            zstandard = _zstd()
+            if zstandard is not None:
+                zstd_path = identity_path + SUFFIXES["zstd"]
+                zstd_tmp = _tmp_path(zstd_path)
+                with open(identity_path, "rb") as src, open(zstd_tmp, "wb") as dst:
+                    zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+                os.replace(zstd_tmp, zstd_path)
+                sizes["zstd"] = os.path.getsize(zstd_path)
+
+        meta = {"etag": digest.hexdigest()[:32], "sizes": sizes, "source": os.path.abspath(source_path), **stamp}
+        meta_path = os.path.join(directory, "meta.json")
+        meta_tmp = _tmp_path(meta_path)
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # meta.json が揃った版の目印なので最後に置く
+        os.replace(meta_tmp, meta_path)
+        ratio = {encoding: round(size / sizes["identity"], 3) for encoding, size in sizes.items() if sizes["identity"]}
+        print(f"[Delivery] 配信用ファイルを作成: {name}（{sizes['identity']} bytes、圧縮率 {ratio}）")
+        return Variants(meta["etag"], {
+            encoding: (identity_path + SUFFIXES[encoding], size) for encoding, size in sizes.items()
+        })
+
+
+def prepare_rendered(file_id: str, fmt: str) -> Optional[Variants]:
+    """セグメントストアから fmt（RENDERERS の形式か "result"）の配信用ファイルを用意する。ストアが無ければ None"""
+    source_path = segments_path(file_id)
+    if not os.path.exists(source_path):
+        return None
+    renderer = render_result if fmt == "result" else RENDERERS[fmt][0]
+
+    def produce() -> Iterator[bytes]:
+        store = SegmentStore.load(source_path)
+        for chunk in renderer(store, file_id):
+            yield chunk.encode("utf-8")
+
+    return prepare(f"{file_id}/{fmt}", source_path, produce)
+
+
+def sweep(retention_days: float) -> int:
+    """保持期間（作成から retention_days 日、0 で無期限）を過ぎたもの・生成元が消えたものを消し、消した数を返す"""
+    if not os.path.isdir(DELIVERY_CACHE_DIR):
+        return 0
+    now = time.time()
+    removed = 0
+    for file_id in os.listdir(DELIVERY_CACHE_DIR):
+        file_dir = os.path.join(DELIVERY_CACHE_DIR, file_id)
+        if not os.path.isdir(file_dir):
+            continue
+        for fmt in os.listdir(file_dir):
+            directory = os.path.join(file_dir, fmt)
+            if _expired(directory, now, retention_days):
+                with _lock_for(f"{file_id}/{fmt}"):
+                    shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        try:
+            os.rmdir(file_dir)  # 空になった file_id のディレクトリ
+        except OSError:
+            pass
+    if removed:
+        print(f"[Delivery] 配信用ファイルを {removed} 件削除しました")
+    return removed
+
+
+def _expired(directory: str, now: float, retention_days: float) -> bool:
+    meta_path = os.path.join(directory, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        created = os.path.getmtime(meta_path)
+    except (OSError, ValueError):
+        # 作成途中（または壊れた）ディレクトリは、しばらく経ってから消す
+        try:
+            return now - os.path.getmtime(directory) > INCOMPLETE_STALE_SEC
+        except OSError:
+            return False
+    if meta.get("source") and not os.path.exists(meta["source"]):
+        return True
+    return retention_days > 0 and now - created > retention_days * 86400
+
+
+# --- HTTP のネゴシエーション ---
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> str:
+    """Accept-Encoding から配信する版を選ぶ（無圧縮は明示的に q=0 にされない限り常に候補）"""
+    available = set(available)
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        parts = [part.strip() for part in item.split(";")]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    def weight(encoding: str) -> float:
+        if encoding in weights:
+            return weights[encoding]
+        if "*" in weights:
+            return weights["*"]
+        return 1.0 if encoding == "identity" else 0.0
+
+    candidates = [encoding for encoding in ENCODINGS if encoding in available and weight(encoding) > 0]
+    if not candidates:
+        return "identity"
+    return max(candidates, key=lambda encoding: (weight(encoding), -ENCODINGS.index(encoding)))
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱い比較（W/ は無視する）
+    return any(tag.strip().replace("W/", "", 1) == etag for tag in if_none_match.split(","))
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """単一の bytes 範囲を (開始, 終了) で返す。ヘッダーが無い・解釈できない・複数範囲なら None
+
+    満たせない範囲は ValueError。
+    """
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N（末尾 N バイト）
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def _iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def respond(headers, variants: Variants, media_type: str, filename: Optional[str] = None):
+    """リクエストヘッダーに応じて 200 / 206 / 304 / 416 のレスポンスを作る"""
+    from starlette.responses import Response, StreamingResponse
+
+    range_header = headers.get("range")
+    if range_header and headers.get("if-range") not in (None, variants.etag_for("identity")):
+        # 手元の版が変わっているので範囲指定は無視して全体を返す
+        range_header = None
+    # 範囲指定は無圧縮の版に対して行う（圧縮した版のバイト位置は再開に使いにくい）
+    encoding = "identity" if range_header else negotiate_encoding(headers.get("accept-encoding"), variants.files)
+    path, size = variants.files[encoding]
+    etag = variants.etag_for(encoding)
+
+    common = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes",
+        # 結果は変わらないが、作り直された場合に備えて毎回 ETag で確認させる
+        "Cache-Control": "no-cache",
+    }
+    if filename:
+        common["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if encoding != "identity":
+        common["Content-Encoding"] = encoding
+
+    if _etag_matches(headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={k: v for k, v in common.items() if k != "Content-Disposition"})
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**common, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status = 206
+        common["Content-Range"] = f"bytes {start}-{end}/{size}"
+    common["Content-Length"] = str(end - start + 1 if size else 0)
+    return StreamingResponse(_iter_file(path, start, end), status_code=status, media_type=media_type, headers=common)
@@ -0,0 +1,405 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from app.config import FEATURE_CACHE_DIR, get_feature_cache_mb, get_vad_settings
+from app.core import metrics
+from app.core.audio_preprocess import SAMPLE_RATE
+from app.core.batching import is_silent, needs_fallback, split_segments
+from app.core.progress import current_reporter
+from app.core.vad import JOIN_GAP_SEC, MIN_SKIP_RATIO, SpeechRegion, TimeMap, detect_speech, join_regions
+
+#
+# log-mel とエンコーダー出力のディスクキャッシュ
+#
+# - 音声を 30 秒の固定窓に区切り、窓ごとの log-mel（n_mels × 3000）と
+#   エンコーダー出力（n_audio_ctx × n_audio_state）を float16 の .npy で保存する
+# - 再利用時は np.load(mmap_mode="r") で開き、必要な窓だけを読む
+# - デコード（model.decode）にはエンコーダー出力を直接渡すので、2 回目以降はエンコーダーを通らない
+#   （言語・タスク・プロンプト・温度を変えた再実行では、CPU 時間の大半を占めるエンコーダーを省ける）
+# - キャッシュの単位: 音声の SHA-256 ＋ n_mels ＋ VAD 設定 ごとに 1 ディレクトリ
+#   log-mel はモデル間で共有し、エンコーダー出力はモデル名＋dtype ごとに別ファイルにする
+# - 固定窓のデコードは model.transcribe と結果が変わるので、FEATURE_CACHE_MB を指定したときだけ使う
+#   （結果キャッシュもこのときは別のキーに入れる）
+#
+
+# Whisper の 1 窓（30 秒 = 3000 フレーム、1 フレーム 10ms）
+WINDOW_SEC = 30
+WINDOW_FRAMES = 3000
+FRAMES_PER_SEC = 100
+# エンコーダーに一度に通す窓の数
+ENCODER_BATCH = 4
+# whisper.transcribe と同じ温度フォールバック
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+META_FILE = "meta.json"
+MEL_FILE = "mel.npy"
+
+
+def feature_key(audio_hash: str, n_mels: int, vad_settings: Dict) -> str:
+    payload = json.dumps({"audio": audio_hash, "n_mels": n_mels, "vad": vad_settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+class FeatureEntry:
+    """1 つの音声の特徴量（meta.json / mel.npy / encoder_{model}_{dtype}.npy）"""
+
+    def __init__(self, cache: "FeatureCache", key: str, path: str):
+        self.cache = cache
+        self.key = key
+        self.path = path
+        self._meta: Optional[Dict] = None
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, META_FILE))
+
+    @property
+    def meta(self) -> Dict:
+        if self._meta is None:
+            with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    def build(self, audio, offset: float, n_mels: int, vad_settings: Dict):
+        """波形から（VAD で音声区間だけをつないだうえで）窓ごとの log-mel を作って保存する"""
+        import numpy as np
+        import torch
+        import whisper
+
+        source, regions, vad_summary = audio, None, None
+        if vad_settings["enabled"]:
+            with metrics.stage("vad"):
+                vad = detect_speech(audio, SAMPLE_RATE, vad_settings)
+            vad_summary = vad.summary()
+            if vad.regions and vad.skipped_ratio >= MIN_SKIP_RATIO:
+                source, _time_map = join_regions(audio, vad.regions)
+                regions = [[region.start, region.end] for region in vad.regions]
+            else:
+                vad_summary.update(speech_sec=vad_summary["total_sec"], skipped_ratio=0.0)
+
+        with metrics.stage("mel"):
+            mel = whisper.log_mel_spectrogram(torch.from_numpy(source), n_mels)
+            frames = mel.shape[-1]
+            windows = max(1, -(-frames // WINDOW_FRAMES))
+            # 最後の窓は whisper.transcribe と同じく log-mel 上で 0 を詰める
+            mel = torch.nn.functional.pad(mel, (0, windows * WINDOW_FRAMES - frames))
+            mel = mel.reshape(n_mels, windows, WINDOW_FRAMES).permute(1, 0, 2)
+
+        os.makedirs(self.path, exist_ok=True)
+        self._save_npy(MEL_FILE, mel.numpy().astype(np.float16))
+        meta = {
+            "windows": windows,
+            "frames": frames,
+            "n_mels": n_mels,
+            "audio_sec": len(audio) / SAMPLE_RATE,
+            "offset": offset,
+            "regions": regions,
+            "vad": vad_summary,
+        }
+        tmp_path = os.path.join(self.path, f"{META_FILE}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # meta.json があれば完成したエントリとみなすので最後に置く
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+        self._meta = meta
+        self.cache.added(self.key, self.path)
+
+    def _save_npy(self, name: str, array):
+        import numpy as np
+
+        tmp_path = os.path.join(self.path, f"{name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def mel(self):
+        import numpy as np
+
+        return np.load(os.path.join(self.path, MEL_FILE), mmap_mode="r")
+
+    def encoder_output(self, model, tag: str):
+        """エンコーダー出力（窓数 × n_audio_ctx × n_audio_state）。無ければ log-mel から計算して保存する"""
+        import numpy as np
+        import torch
+
+        path = os.path.join(self.path, f"encoder_{tag}.npy")
+        if os.path.exists(path):
+            self.cache.count("encoder_hits")
+            return np.load(path, mmap_mode="r")
+        self.cache.count("encoder_misses")
+
+        mel = self.mel()
+        windows = self.meta["windows"]
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        output = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float16,
+            shape=(windows, model.dims.n_audio_ctx, model.dims.n_audio_state),
+        )
+        with torch.no_grad(), metrics.stage("encoder"):
+            for begin in range(0, windows, ENCODER_BATCH):
+                batch = torch.from_numpy(np.asarray(mel[begin:begin + ENCODER_BATCH], dtype=np.float32))
+                output[begin:begin + ENCODER_BATCH] = model.encoder(batch.to(model.device)).cpu().numpy()
+        output.flush()
+        del output
+        os.replace(tmp_path, path)
+        self.cache.added(self.key, self.path)
+        return np.load(path, mmap_mode="r")
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key → ディレクトリのバイト数（古い順）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"mel_hits": 0, "mel_misses": 0, "encoder_hits": 0, "encoder_misses": 0, "evictions": 0}
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load_index(self):
+        """起動時に既存のエントリを最終利用時刻（meta.json の mtime）順に読み込む"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                meta_path = os.path.join(prefix_dir, key, META_FILE)
+                if os.path.exists(meta_path):
+                    entries.append((os.stat(meta_path).st_mtime, key, _dir_bytes(os.path.join(prefix_dir, key))))
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def entry(self, audio_hash: str, n_mels: int, vad_settings: Optional[Dict] = None) -> FeatureEntry:
+        key = feature_key(audio_hash, n_mels, vad_settings or get_vad_settings())
+        entry = FeatureEntry(self, key, self._path(key))
+        if entry.exists:
+            self.count("mel_hits")
+            with self._lock:
+                if key in self._index:
+                    self._index.move_to_end(key)
+            try:
+                os.utime(os.path.join(entry.path, META_FILE))  # LRU 順序を再起動後も保つ
+            except OSError:
+                pass
+        else:
+            self.count("mel_misses")
+        return entry
+
+    def count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def added(self, key: str, path: str):
+        """エントリにファイルを書き足したあとで呼ぶ（上限を超えたら古いエントリから消す）"""
+        size = _dir_bytes(path)
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = size
+            self._bytes += size
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._bytes -= old_size
+                self._counters["evictions"] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            # 使用中のエントリは mmap で開いたままでも消してよい（閉じるまで読める）
+            shutil.rmtree(self._path(old_key), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            encoder_lookups = self._counters["encoder_hits"] + self._counters["encoder_misses"]
+            return {
+                **self._counters,
+                "encoder_hit_ratio": self._counters["encoder_hits"] / encoder_lookups if encoder_lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: Optional[FeatureCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> FeatureCache:
+    """プロセス全体で共有する特徴量キャッシュを取得する"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FeatureCache(FEATURE_CACHE_DIR, get_feature_cache_mb() * 1024 * 1024)
+    return _cache
+
+
+# --- キャッシュした特徴量からのデコード ---
+
+def _time_map(regions) -> Optional[TimeMap]:
+    if not regions:
+        return None
+    time_map = TimeMap()
+    joined = 0.0
+    for start, end in regions:
+        time_map.add(joined, SpeechRegion(start, end))
+        joined += (end - start) + JOIN_GAP_SEC
+    return time_map
+
+
+def decode_windows(model, entry: FeatureEntry, features, options: Dict) -> Dict:
+    """窓ごとのエンコーダー出力をデコードし、Whisper と同じ形の結果（text / segments / language）を返す
+
+    タイムスタンプは先頭の無音を除いた波形上の時刻（呼び出し元で entry.meta["offset"] を足す）。
+    ビーム幅・温度・品質の判定基準は model.transcribe と同じ名前のオプションで指定する。
+    model が BudgetedModel ならフォールバックはその計算量の上限で打ち切られる。
+    """
+    import numpy as np
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+
+    meta = entry.meta
+    windows = meta["windows"]
+
+    def window_features(index: int):
+        return torch.from_numpy(np.asarray(features[index:index + 1], dtype=np.float32)).to(model.device)
+
+    language = options.get("language")
+    if language is None:
+        # 言語の自動判定は最初の窓で 1 回だけ行う（エンコーダー出力を渡すのでエンコーダーは通らない）
+        _tokens, probs = model.detect_language(window_features(0))
+        language = max(probs[0], key=probs[0].get)
+        print(f"[Features] 言語を判定しました: {language}")
+    task = options.get("task", "transcribe")
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=getattr(model, "num_languages", 99),
+        language=language,
+        task=task,
+    )
+
+    temperatures = options.get("temperature", DEFAULT_TEMPERATURES)
+    if isinstance(temperatures, (int, float)):
+        temperatures = (float(temperatures),)
+    budget = getattr(model, "budget", None)
+    if budget is not None:
+        budget.start(meta["audio_sec"])
+    initial_tokens = tokenizer.encode(" " + options["initial_prompt"].strip()) if options.get("initial_prompt") else []
+    condition = options.get("condition_on_previous_text", True)
+    max_prompt_tokens = model.dims.n_text_ctx // 2 - 1
+    history = []
+
+    time_map = _time_map(meta["regions"])
+    reporter = current_reporter()
+    segments = []
+    with metrics.stage("inference"):
+        for index in range(windows):
+            audio_features = window_features(index)
+            window_start = index * WINDOW_SEC
+            window_sec = min(WINDOW_SEC, (meta["frames"] - index * WINDOW_FRAMES) / FRAMES_PER_SEC)
+            prompt = (initial_tokens + history)[-max_prompt_tokens:]
+
+            result = None
+            for temperature in temperatures:
+                decode_options = whisper.DecodingOptions(
+                    task=task,
+                    language=language,
+                    temperature=temperature,
+                    # whisper.transcribe と同じく、温度 0 ではビームサーチ、それ以外ではサンプリング数を使う
+                    beam_size=options.get("beam_size") if temperature == 0 else None,
+                    best_of=options.get("best_of") if temperature > 0 else None,
+                    prompt=prompt or None,
+                    fp16=False,
+                )
+                result = model.decode(audio_features, decode_options)[0]
+                # フォールバック・無音の判定は whisper.transcribe と同じ（マイクロバッチと共通）
+                if not needs_fallback(result, options):
+                    break
+
+            if not is_silent(result, options):
+                for segment in split_segments(tokenizer, result.tokens, window_sec):
+                    start = window_start + segment["start"]
+                    end = window_start + segment["end"]
+                    if time_map is not None:
+                        start, end = time_map.to_original(start), time_map.to_original(end)
+                    segments.append({
+                        "id": len(segments),
+                        "start": round(start, 3),
+                        "end": round(end, 3),
+                        "text": segment["text"],
+                        "temperature": result.temperature,
+                        "avg_logprob": result.avg_logprob,
+                        "no_speech_prob": result.no_speech_prob,
+                    })
+                # whisper.transcribe と同じく、高い温度で出した結果は次の窓の前置きにしない
+                if condition and result.temperature <= 0.5:
+                    history.extend(token for token in result.tokens if token < tokenizer.eot)
+                else:
+                    history = []
+
+            if reporter is not None:
+                reporter.report((index + 1) / windows, len(segments))
+
+    result = {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+    }
+    if meta["vad"] is not None:
+        result["vad"] = meta["vad"]
+    return result
+
+
+def transcribe_with_features(
+    model,
+    audio_hash: str,
+    tag: str,
+    options: Dict,
+    load_audio: Callable[[], Tuple[object, float]],
+) -> Tuple[Dict, FeatureEntry]:
+    """特徴量キャッシュを使って文字起こしする
+
+    キャッシュに無ければ load_audio()（→ (先頭の無音を除いた波形, 除いた秒数)）でデコードして作る。
+    tag はエンコーダー出力を区別する名前（モデル名＋dtype）。
+    """
+    cache = get_feature_cache()
+    entry = cache.entry(audio_hash, getattr(model.dims, "n_mels", 80))
+    if entry.exists:
+        print(f"[Features] log-mel キャッシュヒット: {entry.key[:12]}（{entry.meta['windows']}窓）")
+        # 音声はデコードしないので、長さはキャッシュの記録から取る
+        total_sec = entry.meta["audio_sec"] + entry.meta["offset"]
+        metrics.record_audio(total_sec)
+        reporter = current_reporter()
+        if reporter is not None:
+            reporter.total_sec = total_sec
+    else:
+        audio, offset = load_audio()
+        entry.build(audio, offset, getattr(model.dims, "n_mels", 80), get_vad_settings())
+    features = entry.encoder_output(model, tag)
+    return decode_windows(model, entry, features, options), entry
@@ -0,0 +1,166 @@
+import hashlib
+import os
+from typing import BinaryIO, NamedTuple, Optional
+
+from app.config import get_max_upload_mb
+from app.core import metrics
+
+#
+# アップロードのストリーミング取り込み
+#
+# - 1MB ずつ読みながらディスクへ書き出す（ファイル全体をメモリに載せない）
+# - 上限サイズを超えた時点で打ち切る
+# - 拡張子ではなく先頭バイトから音声形式を判定する
+# - 書き込みと同時に SHA-256 を計算する
+#
+
+CHUNK_SIZE = 1024 * 1024
+
+# multipart の境界やヘッダー分の余裕
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class IngestError(Exception):
+    status_code = 400
+
+
+class EmptyUploadError(IngestError):
+    status_code = 400
+
+
+class UploadTooLargeError(IngestError):
+    status_code = 413
+
+
+class UnsupportedFormatError(IngestError):
+    status_code = 415
+
+
+class IngestedFile(NamedTuple):
+    path: str
+    filename: str
+    size: int
+    sha256: str
+    format: str  # 判定した拡張子（".wav" など）
+
+
+def max_upload_bytes() -> int:
+    return get_max_upload_mb() * 1024 * 1024
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """先頭バイトから音声形式を判定する（不明なら None）"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return ".wav"
+    if header[:4] == b"fLaC":
+        return ".flac"
+    if header[:4] == b"OggS":
+        return ".ogg"
+    if header[4:8] == b"ftyp":
+        return ".m4a"
+    if header[:3] == b"ID3":
+        return ".mp3"
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        # MPEG オーディオのフレーム同期
+        return ".mp3"
+    return None
+
+
+async def ingest_upload(upload, dest_dir: str, file_id: str, max_bytes: Optional[int] = None) -> IngestedFile:
+    """UploadFile をチャンク単位で dest_dir/{file_id}{拡張子} に保存する"""
+    with metrics.stage("ingest"):
+        return await _ingest_upload(upload, dest_dir, file_id, max_bytes)
+
+
+class _IngestWriter:
+    """チャンクを受け取りながら形式判定・上限確認・ハッシュ計算をして dest_dir に書き出す"""
+
+    def __init__(self, dest_dir: str, file_id: str, limit: int):
+        os.makedirs(dest_dir, exist_ok=True)
+        self.dest_dir = dest_dir
+        self.file_id = file_id
+        self.limit = limit
+        self.part_path = os.path.join(dest_dir, f"{file_id}.part")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.format: Optional[str] = None
+        self._out = open(self.part_path, "wb")
+
+    def write(self, chunk: bytes):
+        if self.format is None:
+            self.format = sniff_format(chunk[:16])
+            if self.format is None:
+                raise UnsupportedFormatError(
+                    "サポートされていないファイル形式です。サポート形式: .mp3, .wav, .m4a, .flac, .ogg"
+                )
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise UploadTooLargeError(f"ファイルサイズが上限（{self.limit} bytes）を超えています")
+        self.digest.update(chunk)
+        self._out.write(chunk)
+
+    def finish(self, filename: str) -> IngestedFile:
+        self._out.close()
+        if self.size == 0:
+            raise EmptyUploadError("ファイル内容が空です")
+        final_path = os.path.join(self.dest_dir, f"{self.file_id}{self.format}")
+        os.replace(self.part_path, final_path)
+        print(f"[Ingest] 取り込み完了: {final_path} ({self.size} bytes, {self.format}, sha256={self.digest.hexdigest()[:12]})")
+        return IngestedFile(final_path, filename, self.size, self.digest.hexdigest(), self.format)
+
+    def abort(self):
+        self._out.close()
+        if os.path.exists(self.part_path):
+            os.unlink(self.part_path)
+
+
+async def _ingest_upload(upload, dest_dir: str, file_id: str, max_bytes: Optional[int]) -> IngestedFile:
+    limit = max_upload_bytes() if max_bytes is None else max_bytes
+    if upload.size is not None and upload.size > limit:
+        raise UploadTooLargeError(f"ファイルサイズが上限（{limit} bytes）を超えています")
+
+    writer = _IngestWriter(dest_dir, file_id, limit)
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.finish(upload.filename or "")
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def ingest_stream(
+    stream: BinaryIO, filename: str, dest_dir: str, file_id: str, max_bytes: Optional[int] = None,
+) -> IngestedFile:
+    """ファイルオブジェクト（NiceGUI のアップロード等）を同期的に取り込む。ingest_upload と同じ検査をする"""
+    with metrics.stage("ingest"):
+        writer = _IngestWriter(dest_dir, file_id, max_upload_bytes() if max_bytes is None else max_bytes)
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                writer.write(chunk)
+            return writer.finish(filename)
+        except BaseException:
+            writer.abort()
+            raise
+
+
+def file_sha256(path: str) -> str:
+    """保存済みファイルの SHA-256 をチャンク単位で計算する"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_oversized_request(method: str, content_length: Optional[str]) -> bool:
+    """本文を読む前に Content-Length だけで上限超過を判定する"""
+    if method != "POST" or not content_length:
+        return False
+    try:
+        return int(content_length) > max_upload_bytes() + MULTIPART_OVERHEAD
+    except ValueError:
+        return False
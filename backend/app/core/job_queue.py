@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.config import JOB_DB_PATH, OUTPUT_DIR, get_job_mode, get_job_queue_size, get_job_workers
+from app.core.broker import STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, create_broker
+
+#
+# 非同期ジョブキュー
+#
+# - /api/upload で受け付けたファイルを有限個のワーカースレッドで文字起こしする
+# - ジョブの状態は SQLite に永続化し、/api/status・/api/result から参照する
+# - 状態: queued → running → done / failed
+# - ワーカーへの受け渡しはブローカー（app.core.broker）、実行は JobWorker（app.core.worker）が行う
+#
+
+
+class QueueFullError(Exception):
+    """実行待ちジョブが上限に達している"""
+
+
+class JobStore:
+    """ジョブテーブル（SQLite）"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 推論ワーカー（別プロセス）と共有するので、ブローカーからも同じ接続とロックを使う
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # 複数プロセスからの読み書きを並行させる
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    file_id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    audio_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    error TEXT,
+                    text_path TEXT,
+                    json_path TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    sha256 TEXT,
+                    segments_path TEXT,
+                    worker_id TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    options TEXT
+                )
+                """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            # 旧バージョンで作られたテーブルに列を追加する
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            migrations = {
+                "sha256": "TEXT",
+                "segments_path": "TEXT",
+                "worker_id": "TEXT",
+                "lease_expires_at": "REAL",
+                "attempts": "INTEGER NOT NULL DEFAULT 0",
+                "options": "TEXT",
+            }
+            for name, column_type in migrations.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+
+    def create(
+        self, file_id: str, filename: str, audio_path: str, sha256: Optional[str] = None, options: Optional[Dict] = None,
+    ):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (file_id, filename, audio_path, status, created_at, sha256, options) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_id, filename, audio_path, STATUS_QUEUED, time.time(), sha256,
+                 json.dumps(options, ensure_ascii=False) if options else None),
+            )
+
+    def update(self, file_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE jobs SET {columns} WHERE file_id = ?",
+                (*fields.values(), file_id),
+            )
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE file_id = ?", (file_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (STATUS_QUEUED, STATUS_RUNNING),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class JobQueue:
+    """有限個のワーカーと待ち行列の上限を持つジョブキュー
+
+    ジョブはブローカー経由で受け渡す。embedded モードではこのプロセス内の JobWorker が、
+    api モードでは別プロセスの `python -m app.worker` が処理する。
+    """
+
+    def __init__(self, store: JobStore, workers: int, max_pending: int, embedded: bool = True):
+        self.store = store
+        self.broker = create_broker(store)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.embedded = embedded
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe-worker")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._worker = None
+        if embedded:
+            from app.core.worker import JobWorker
+
+            # /api/transcribe の同期処理と同じスレッドプールでジョブを実行する
+            self._worker = JobWorker(self.broker, concurrency=workers, executor=self._executor)
+
+    @property
+    def pending(self) -> int:
+        """実行待ち＋実行中のジョブ数（同期処理分を含む）"""
+        return self._pending + self.broker.pending_count()
+
+    def submit_call(self, fn: Callable, *args, **kwargs) -> Future:
+        """任意の処理をワーカープールで実行する（/api/transcribe の同期応答用）"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("文字起こしキューが満杯です")
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done_slot(None)
+            raise
+        future.add_done_callback(self._done_slot)
+        return future
+
+    def _done_slot(self, _future):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def enqueue(
+        self, file_id: str, filename: str, audio_path: str, sha256: Optional[str] = None, options: Optional[Dict] = None,
+    ):
+        """ジョブを登録する（ワーカーがブローカーから取り出して処理する）"""
+        if self.broker.pending_count() >= self.max_pending:
+            raise QueueFullError("文字起こしキューが満杯です")
+        self.store.create(file_id, filename, audio_path, sha256, options)
+        if self._worker is not None:
+            self._worker.wake()
+
+    def recover(self):
+        """再起動前に終わらなかったジョブのうち、音声が無いものを失敗にしてワーカーを起動する
+
+        実行中のまま残ったジョブはリースが切れた時点でワーカーが確保し直す。
+        """
+        for job in self.store.unfinished():
+            if not os.path.exists(job["audio_path"]):
+                self.store.update(
+                    job["file_id"], status=STATUS_FAILED,
+                    error="再起動時に音声ファイルが見つかりませんでした", finished_at=time.time(),
+                )
+        if self._worker is not None:
+            self._worker.start()
+
+
+def result_paths(file_id: str):
+    """ジョブ結果（.txt / .json）の保存先"""
+    return (
+        os.path.join(OUTPUT_DIR, f"{file_id}_result.txt"),
+        os.path.join(OUTPUT_DIR, f"{file_id}_result.json"),
+    )
+
+
+def write_result_files(file_id: str, result: Dict, paths=None):
+    """文字起こし結果を OUTPUT_DIR（または paths で指定した .txt / .json）に書き出す"""
+    text_path, json_path = paths or result_paths(file_id)
+    os.makedirs(os.path.dirname(text_path), exist_ok=True)
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write(result["text"])
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "file_id": file_id,
+                "text": result["text"],
+                "language": result.get("language"),
+                "segments": [
+                    {
+                        "start": seg["start"],
+                        "end": seg["end"],
+                        "text": seg["text"],
+                        "avg_logprob": seg.get("avg_logprob"),
+                        "no_speech_prob": seg.get("no_speech_prob"),
+                    }
+                    for seg in result.get("segments", [])
+                ],
+            },
+            f,
+            ensure_ascii=False,
+        )
+    return text_path, json_path
+
+
+def job_summary(job: Dict) -> Dict:
+    """/api/status 用にジョブ情報を整形する"""
+    now = time.time()
+    started = job["started_at"]
+    finished = job["finished_at"]
+    return {
+        "file_id": job["file_id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": started,
+        "finished_at": finished,
+        "queue_wait_sec": (started or finished or now) - job["created_at"],
+        "run_sec": (finished or now) - started if started else None,
+    }
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """プロセス全体で共有するジョブキューを取得する"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(
+                    JobStore(JOB_DB_PATH), get_job_workers(), get_job_queue_size(),
+                    embedded=get_job_mode() == "embedded",
+                )
+                _queue.recover()
+    return _queue
@@ -0,0 +1,309 @@
+import collections
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Deque, Dict, List, Optional
+
+from app.config import get_local_queue_size
+from app.core.broker import STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING
+from app.core.ingest import ingest_stream
+from app.core.job_queue import QueueFullError, write_result_files
+from app.core.progress import progress_context
+from app.core.storage import get_audio_store
+
+#
+# デスクトップアプリ（main_local.py）用のローカル推論エンジン
+#
+# - 推論スレッドは 1 本だけ。複数ファイルを一度に渡しても順番に処理し、モデルの読み込みが競合しない
+#   （モデルはモデルプールから借りるので、プールに残っている間は読み込み直さない）
+# - 実行待ちは上限付き（LOCAL_QUEUE_SIZE）。待機中のものはすぐに、実行中のものは次の進捗報告か
+#   段階の区切り（メモリの予約後・文字起こしの後）の時点で取り消せる（キャッシュから返る場合も結果を書き出さない）
+# - 終わったジョブは新しいものから MAX_FINISHED_JOBS 件だけ保持する
+# - 状態の変化は登録したコールバックへ通知する。loop を渡すと loop.call_soon_threadsafe 経由で
+#   そのイベントループ上で呼ぶ（UI の要素は UI のループからしか触らない）
+# - 結果は API のジョブと同じく OUTPUT_DIR の {job_id}_result.txt / .json に書き出す
+#
+
+STATUS_CANCELLED = "cancelled"
+FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+# 状態を問い合わせられるように残しておく、終わったジョブの数
+MAX_FINISHED_JOBS = 100
+
+
+class JobCancelled(Exception):
+    """実行中のジョブが取り消された"""
+
+
+class LocalJob:
+    def __init__(self, job_id: str, filename: str, audio_path: str, sha256: Optional[str]):
+        self.job_id = job_id
+        self.filename = filename
+        self.audio_path = audio_path
+        self.sha256 = sha256
+        self.status = STATUS_QUEUED
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.text_path: Optional[str] = None
+        self.json_path: Optional[str] = None
+        self.created_at = time.time()
+        self.elapsed_sec: Optional[float] = None
+        self._cancel = threading.Event()
+
+    def snapshot(self) -> Dict:
+        """コールバックに渡す状態（別スレッドから書き換えられないようにコピーする）"""
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "text_path": self.text_path,
+            "json_path": self.json_path,
+            "elapsed_sec": self.elapsed_sec,
+        }
+
+
+class LocalEngine:
+    def __init__(self, max_pending: Optional[int] = None):
+        self.max_pending = max_pending or get_local_queue_size()
+        self._cond = threading.Condition()
+        self._pending: Deque[LocalJob] = collections.deque()
+        self._jobs: Dict[str, LocalJob] = {}
+        # 終わったジョブの ID（古いものが先頭）
+        self._finished: Deque[str] = collections.deque()
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._current: Optional[LocalJob] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._warm_up = False
+
+    # --- 通知 ---
+
+    def subscribe(self, callback: Callable[[Dict], None], loop=None) -> Callable[[Dict], None]:
+        """状態の変化を callback(snapshot) で受け取る。loop を渡すとそのループ上で呼ぶ。解除用に登録した関数を返す"""
+        if loop is not None:
+            target = callback
+
+            def callback(state: Dict):
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(target, state)
+
+        with self._cond:
+            self._listeners.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, job: LocalJob):
+        state = job.snapshot()
+        with self._cond:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                print(f"[LocalEngine] 通知に失敗: {e}")
+
+    # --- 投入・取り消し ---
+
+    def submit_stream(self, stream: BinaryIO, filename: str) -> LocalJob:
+        """アップロードされたファイルを取り込んで実行待ちに入れる（ディスクへの書き込みを伴うので UI のループでは呼ばない）"""
+        with self._cond:
+            # 書き込む前に満杯かどうかを確認する（取り込み後にも確認し直す）
+            self._check_room()
+        store = get_audio_store()
+        job_id = str(uuid.uuid4())
+        ingested = ingest_stream(stream, filename, store.incoming_dir, job_id)
+        audio_path = store.store(ingested.path, ingested.sha256, ingested.format, job_id)
+        try:
+            return self._enqueue(LocalJob(job_id, filename, audio_path, ingested.sha256))
+        except QueueFullError:
+            store.release(audio_path)
+            raise
+
+    def submit_path(self, audio_path: str) -> LocalJob:
+        """既に保存されている音声ファイルを実行待ちに入れる（ファイルは移動しない）"""
+        return self._enqueue(LocalJob(str(uuid.uuid4()), os.path.basename(audio_path), audio_path, None))
+
+    def _check_room(self):
+        if len(self._pending) >= self.max_pending:
+            raise QueueFullError(f"実行待ちが上限（{self.max_pending}件）に達しています")
+
+    def _enqueue(self, job: LocalJob) -> LocalJob:
+        with self._cond:
+            self._check_room()
+            self._pending.append(job)
+            self._jobs[job.job_id] = job
+            self._ensure_thread()
+            self._cond.notify_all()
+        print(f"[LocalEngine] 実行待ちに追加: {job.filename}（待ち {len(self._pending)}件）")
+        self._notify(job)
+        return job
+
+    def _finish(self, job: LocalJob):
+        """終わったジョブを記録し、古いものから忘れる（self._cond を持って呼ぶ）"""
+        self._finished.append(job.job_id)
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def cancel(self, job_id: str) -> bool:
+        """待機中なら即座に、実行中なら次の進捗報告か段階の区切りの時点で取り消す。終わっていたら False"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job._cancel.set()
+            if job.status != STATUS_QUEUED:
+                print(f"[LocalEngine] 実行中のジョブの取り消しを要求: {job.filename}")
+                return True
+            self._pending.remove(job)
+            job.status = STATUS_CANCELLED
+            self._finish(job)
+        print(f"[LocalEngine] 取り消し: {job.filename}")
+        if job.sha256:
+            # 取り込んだ音声への参照を外す（保存ファイル自体は容量の整理で消える）
+            get_audio_store().release(job.audio_path)
+        self._notify(job)
+        return True
+
+    def get(self, job_id: str) -> Optional[LocalJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "running": self._current.job_id if self._current else None,
+                "jobs": len(self._jobs),
+            }
+
+    # --- 推論スレッド ---
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="local-engine", daemon=True)
+            self._thread.start()
+
+    def warm_up(self):
+        """推論スレッドを起動し、最初のファイルより先にモデルを読み込ませる"""
+        with self._cond:
+            self._warm_up = True
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def _load_model(self):
+        # 推論スレッドの上で読み込むので、直後に来たファイルの読み込みと競合しない
+        from app.core.backends import get_backend
+        from app.core.profiles import get_profile
+
+        try:
+            with get_backend().lease(get_profile().model_name):
+                pass
+        except Exception as e:
+            print(f"[LocalEngine] モデルの事前読み込みに失敗: {e}")
+
+    def stop(self, wait: bool = True):
+        """待機中のジョブを取り消して推論スレッドを止める（実行中のジョブも取り消す）"""
+        with self._cond:
+            self._stopping = True
+            pending = list(self._pending)
+            current = self._current
+            self._cond.notify_all()
+        for job in pending:
+            self.cancel(job.job_id)
+        if current is not None:
+            self.cancel(current.job_id)
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping and not self._warm_up:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                warm_up, self._warm_up = self._warm_up, False
+                job = None
+                if not warm_up:
+                    job = self._pending.popleft()
+                    job.status = STATUS_RUNNING
+                    self._current = job
+            if job is None:
+                self._load_model()
+                continue
+            self._notify(job)
+            try:
+                self._process(job)
+            finally:
+                with self._cond:
+                    self._current = None
+
+    def _process(self, job: LocalJob):
+        # 循環 import を避けるためここで import する
+        from app.core.transcribe_logic import transcribe_result
+        from app.core.admission import reserve_for_file
+        from app.core.profiles import get_profile
+
+        started = time.perf_counter()
+        print(f"[LocalEngine] 文字起こし開始: {job.filename}")
+
+        def check_cancel():
+            if job._cancel.is_set():
+                raise JobCancelled(job.job_id)
+
+        def on_update(state: Dict):
+            check_cancel()
+            job.progress = state["progress"]
+            self._notify(job)
+
+        try:
+            profile = get_profile()
+            with reserve_for_file(job.audio_path, job.filename, model_name=profile.model_name):
+                # メモリの空きを待っている間に取り消されていれば始めない
+                check_cancel()
+                with progress_context(job.job_id, on_update=on_update):
+                    result = transcribe_result(job.audio_path, audio_hash=job.sha256, profile=profile)
+            # キャッシュから返った場合や、進捗報告の無い経路では、ここで取り消しを反映する
+            check_cancel()
+            job.text_path, job.json_path = write_result_files(job.job_id, result)
+            job.progress = 1.0
+            job.status = STATUS_DONE
+            print(f"[LocalEngine] 文字起こし完了: {job.filename}")
+        except JobCancelled:
+            job.status = STATUS_CANCELLED
+            print(f"[LocalEngine] 実行中に取り消し: {job.filename}")
+        except Exception as e:
+            job.status = STATUS_FAILED
+            job.error = str(e)
+            print(f"[LocalEngine] 文字起こし失敗: {job.filename}: {e}")
+        job.elapsed_sec = round(time.perf_counter() - started, 2)
+        if job.sha256:
+            try:
+                get_audio_store().archive(job.audio_path, job.sha256)
+            except Exception as e:
+                print(f"[LocalEngine] 音声のアーカイブに失敗: {job.filename}: {e}")
+        with self._cond:
+            self._finish(job)
+        self._notify(job)
+
+
+_engine: Optional[LocalEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_local_engine() -> LocalEngine:
+    """プロセス全体で共有するローカル推論エンジンを取得する"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = LocalEngine()
+    return _engine
@@ -0,0 +1,295 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import get_long_audio_chunk_sec, get_long_audio_workers, get_model_idle_timeout
+from app.core.audio_preprocess import detect_silences, load_audio_segment
+from app.core.vad import transcribe_speech
+from app.core.progress import current_reporter
+from app.core.profiles import BudgetedModel, DecodeBudget
+
+#
+# 長時間音声の分割・並列文字起こし
+#
+# 1. ffmpeg の silencedetect で無音区間を調べ、無音の中央で分割する
+# 2. 無音が見つからない区間は固定長で切り、前後に重なり（overlap）を持たせる
+# 3. チャンクをプロセスプールで並列に文字起こしする（ワーカーごとにモデルを 1 つ保持）
+#    ワーカーのモデルもそのプロセスのモデルプールで pin して借りる（読み込みの集計・解放はプールに任せる）。
+#    親プロセスのプールの外にあるぶんのメモリは、アドミッション制御の見積もりにワーカー数として入っている
+# 4. タイムスタンプを元の時間軸に戻し、重なり部分で時間が重複するセグメントを除く
+#
+
+# 無音で切れなかった場合に前後に付ける重なり（秒）
+HARD_CUT_OVERLAP_SEC = 2.0
+# 直前のセグメントと、短い方の長さのこの割合以上重なっていれば同じ発話とみなす
+DUPLICATE_OVERLAP_RATIO = 0.5
+
+
+class Chunk(NamedTuple):
+    # デコードする範囲
+    start: float
+    end: float
+    # このチャンクが担当する範囲（セグメントの中点がこの範囲にあるものを採用する）
+    own_start: float
+    own_end: float
+
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    target_sec: float,
+    overlap_sec: float = HARD_CUT_OVERLAP_SEC,
+) -> List[Chunk]:
+    """無音区間を優先して分割点を決め、チャンクの一覧を返す"""
+    # 無音区間の中央を分割点の候補にする
+    candidates = sorted((s + e) / 2 for s, e in silences if e > s)
+    cuts = []  # (分割点, 無音で切れたか)
+    pos = 0.0
+    while duration - pos > target_sec * 1.5:
+        target = pos + target_sec
+        window = [c for c in candidates if pos + target_sec * 0.5 <= c <= pos + target_sec * 1.5]
+        if window:
+            cut = min(window, key=lambda c: abs(c - target))
+            cuts.append((cut, True))
+        else:
+            cut = target
+            cuts.append((cut, False))
+        pos = cut
+
+    chunks = []
+    bounds = [(0.0, True)] + cuts + [(duration, True)]
+    for (own_start, clean_left), (own_end, clean_right) in zip(bounds, bounds[1:]):
+        start = own_start if clean_left else max(0.0, own_start - overlap_sec)
+        end = own_end if clean_right else min(duration, own_end + overlap_sec)
+        chunks.append(Chunk(start, end, own_start, own_end))
+    return chunks
+
+
+# --- ワーカープロセス側 ---
+
+_worker_model: Optional[Tuple[str, str]] = None
+
+
+def _init_worker(model_name: str, backend_name: str, threads: int):
+    """ワーカー起動時に一度だけモデルを読み込み、プールに pin しておく"""
+    global _worker_model
+    import torch
+    from app.core.backends import get_backend
+
+    torch.set_num_threads(threads)
+    backend = get_backend(backend_name)
+    backend.pin(model_name)
+    with backend.lease(model_name):
+        pass
+    _worker_model = (model_name, backend_name)
+    print(f"[LongAudio] ワーカー準備完了: pid={os.getpid()} model={model_name} backend={backend_name} threads={threads}")
+
+
+def _transcribe_chunk(
+    file_path: str, chunk: Chunk, options: Dict, fallback_budget: Optional[float],
+) -> Tuple[List[Dict], Optional[Dict], Optional[Dict], Optional[str]]:
+    """チャンクを文字起こしし、(元の時間軸に直したセグメント, VAD の集計, フォールバックの集計, 言語) を返す"""
+    from app.core.backends import get_backend
+
+    audio = load_audio_segment(file_path, chunk.start, chunk.end - chunk.start)
+    if audio.size == 0:
+        return [], None, None, None
+    model_name, backend_name = _worker_model
+    budget = None
+    with get_backend(backend_name).lease(model_name) as model:
+        if fallback_budget is not None:
+            # フォールバックの上限はチャンクごとに、チャンクの長さに応じて決める
+            budget = DecodeBudget(fallback_budget)
+            model = BudgetedModel(model, budget)
+        result = transcribe_speech(model, audio, options)
+    segments = [
+        {
+            **segment,
+            "start": segment["start"] + chunk.start,
+            "end": segment["end"] + chunk.start,
+        }
+        for segment in result.get("segments", [])
+    ]
+    return segments, result.get("vad"), budget.summary() if budget is not None else None, result.get("language")
+
+
+def _merge_budgets(summaries: List[Optional[Dict]]) -> Dict:
+    merged = {"fallbacks": 0, "skipped_fallbacks": 0, "budget_sec": 0.0, "spent_sec": 0.0}
+    for summary in summaries:
+        for key in merged:
+            merged[key] += summary[key] if summary else 0
+    return merged
+
+
+def _merge_vad(summaries: List[Optional[Dict]]) -> Optional[Dict]:
+    summaries = [summary for summary in summaries if summary]
+    if not summaries:
+        return None
+    total = sum(summary["total_sec"] for summary in summaries)
+    speech = sum(summary["speech_sec"] for summary in summaries)
+    return {
+        "total_sec": round(total, 3),
+        "speech_sec": round(speech, 3),
+        "skipped_ratio": round(1.0 - speech / total, 4) if total else 0.0,
+        "regions": sum(summary["regions"] for summary in summaries),
+    }
+
+
+# --- 結合 ---
+
+def _duplicates(segment: Dict, previous: Dict) -> bool:
+    """隣のチャンクが重なり部分で同じ発話を書き起こしたものか（文字列は揺れるので時間で判断する）"""
+    overlap = min(segment["end"], previous["end"]) - max(segment["start"], previous["start"])
+    shorter = min(segment["end"] - segment["start"], previous["end"] - previous["start"])
+    return overlap > 0 and overlap >= shorter * DUPLICATE_OVERLAP_RATIO
+
+
+def stitch_segments(chunks: List[Chunk], chunk_segments: List[List[Dict]]) -> List[Dict]:
+    """担当範囲外のセグメントと、重なり部分で時間が重複したセグメントを取り除いて結合する"""
+    stitched = []
+    for index, (chunk, segments) in enumerate(zip(chunks, chunk_segments)):
+        is_last = index == len(chunks) - 1
+        for segment in segments:
+            middle = (segment["start"] + segment["end"]) / 2
+            if middle < chunk.own_start or (middle >= chunk.own_end and not is_last):
+                continue
+            if stitched and _duplicates(segment, stitched[-1]):
+                continue
+            stitched.append(segment)
+    for index, segment in enumerate(stitched):
+        segment["id"] = index
+    return stitched
+
+
+# --- プロセスプール ---
+
+class _Pool:
+    """プロセスプールと、それを使っているリクエストの数"""
+
+    def __init__(self, key, executor: ProcessPoolExecutor):
+        self.key = key
+        self.executor = executor
+        self.users = 0
+
+
+# 新しいリクエストが使うプール（設定が変わったら差し替え、古いプールは使い終わった時点で止める）
+_pool: Optional[_Pool] = None
+_pool_lock = threading.Lock()
+
+
+def _acquire_pool(model_name: str, backend_name: str, workers: int) -> _Pool:
+    global _pool
+    key = (model_name, backend_name, workers)
+    retired = None
+    with _pool_lock:
+        if _pool is not None and _pool.key != key:
+            # 使用中なら最後の利用者が止める
+            if _pool.users == 0:
+                retired = _pool
+            _pool = None
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # torch を読み込んだ親プロセスからの fork は危険なので spawn を使う
+            _pool = _Pool(key, ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, backend_name, threads),
+            ))
+        _pool.users += 1
+        pool = _pool
+    if retired is not None:
+        retired.executor.shutdown(wait=True)
+    return pool
+
+
+def _release_pool(pool: _Pool, keep: bool):
+    """keep=False なら、ほかに使っているリクエストが無い場合にプールを止める"""
+    global _pool
+    with _pool_lock:
+        pool.users -= 1
+        if pool.users > 0:
+            return
+        if pool is _pool:
+            if keep:
+                return
+            _pool = None
+    pool.executor.shutdown(wait=True)
+
+
+def shutdown_long_audio_pool():
+    """ワーカープロセス（とそのモデル）を解放する。使用中なら、そのリクエストが終わった時点で止まる"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+        if pool is None or pool.users > 0:
+            return
+    pool.executor.shutdown(wait=True)
+
+
+def transcribe_long(
+    file_path: str,
+    duration: float,
+    model_name: str,
+    options: Dict,
+    backend_name: str = "whisper",
+    fallback_budget: Optional[float] = None,
+) -> Dict:
+    """長時間音声を無音で分割し、プロセスプールで並列に文字起こしする
+
+    fallback_budget を指定するとフォールバックをチャンクの長さ × fallback_budget 秒までに制限し、
+    その集計を result["budget"] に入れる。
+    """
+    started = time.perf_counter()
+    workers = get_long_audio_workers(model_name)
+    chunks = plan_chunks(duration, detect_silences(file_path), get_long_audio_chunk_sec())
+    print(f"[LongAudio] 分割完了: {duration:.1f}秒 → {len(chunks)}チャンク / {workers}ワーカー")
+
+    reporter = current_reporter()
+    if reporter is not None:
+        reporter.total_sec = duration
+
+    pool = _acquire_pool(model_name, backend_name, workers)
+    futures = {}
+    try:
+        # オプション（言語・タスクなど）はチャンクごとに渡すので、変わってもワーカーを作り直さない
+        futures = {
+            pool.executor.submit(_transcribe_chunk, file_path, chunk, options, fallback_budget): index
+            for index, chunk in enumerate(chunks)
+        }
+        outputs = [None] * len(chunks)
+        done_sec = 0.0
+        done_segments = 0
+        # ワーカーの中の進捗は見えないので、チャンクが終わるたびに進捗を報告する
+        for future in as_completed(futures):
+            index = futures[future]
+            outputs[index] = future.result()
+            done_sec += chunks[index].own_end - chunks[index].own_start
+            done_segments += len(outputs[index][0])
+            if reporter is not None:
+                reporter.report(done_sec / duration, done_segments)
+    except BaseException:
+        # 失敗・キャンセル時はまだ始まっていないチャンクを取り消す
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        # 低メモリ環境ではワーカーのモデルを保持しない（ほかのリクエストが使っていれば、最後の利用者が止める）
+        _release_pool(pool, keep=get_model_idle_timeout() > 0)
+
+    segments = stitch_segments(chunks, [output[0] for output in outputs])
+    # 言語の自動判定ではチャンクごとに判定されるので、先頭のチャンクの判定を使う
+    detected = next((output[3] for output in outputs if output[3]), None)
+    elapsed = time.perf_counter() - started
+    print(f"[LongAudio] 並列文字起こし完了: {elapsed:.1f}秒（実時間比 {duration / max(elapsed, 1e-6):.1f}倍）")
+    return {
+        "text": "".join(segment["text"] for segment in segments).strip(),
+        "segments": segments,
+        "language": options.get("language") or detected,
+        "chunks": len(chunks),
+        "vad": _merge_vad([output[1] for output in outputs]),
+        "budget": _merge_budgets([output[2] for output in outputs]),
+    }
@@ -0,0 +1,298 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_metrics_enabled
+
+#
+# 軽量な計測レイヤー
+#
+# - stage("decode") のようにパイプラインの各段階を計測し、ヒストグラムに集計する
+# - request_scope() の中で計測した段階は、リクエスト終了時に 1 行の JSON ログ（[Metrics] ...）になる
+# - /api/metrics で Prometheus のテキスト形式として出力する
+# - METRICS_ENABLED=0 のときは stage() が何もしない共有オブジェクトを返すだけになる
+#
+
+ENABLED = get_metrics_enabled()
+
+# ステージ所要時間のヒストグラムの境界（秒）
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(STAGE_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self, gauges: List[Tuple[str, str, float, Dict]], counters: List[Tuple[str, str, float, Dict]] = ()) -> str:
+        """
+        Prometheus のテキスト形式（gauges は (名前, 説明, 値, ラベル) の一覧）。
+        counters は他のコンポーネントが数えている累計値（同じ形式、名前は _total で終わる）
+        """
+        lines = []
+        external = counters
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.total, h.count) for key, h in histograms]
+
+        described = set()
+
+        def header(name: str, kind: str, help_text: Optional[str] = None):
+            if name in described:
+                return
+            described.add(name)
+            lines.append(f"# HELP {name} {help_text or self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, help_text, value, labels in external:
+            header(name, "counter", help_text)
+            lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+
+        for (name, labels), counts, total, count in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(STAGE_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, help_text, value, labels in gauges:
+            if value is None:
+                continue
+            header(name, "gauge", help_text)
+            lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+registry.describe("whisper_stage_seconds", "パイプラインの段階ごとの所要時間（秒）")
+registry.describe("whisper_stage_errors_total", "例外で終わった段階の数")
+registry.describe("whisper_requests_total", "文字起こしリクエスト数")
+registry.describe("whisper_audio_seconds_total", "文字起こしした音声の長さの合計（秒）")
+registry.describe("whisper_processing_seconds_total", "文字起こしに要した時間の合計（秒）")
+registry.describe("whisper_request_seconds", "キャッシュを使わなかったリクエストの所要時間（秒、デコードプロファイル別）")
+
+
+# --- リクエスト単位の記録 ---
+
+class RequestRecord:
+    def __init__(self, kind: str, fields: Dict):
+        self.kind = kind
+        self.fields = dict(fields)
+        self.stages: Dict[str, float] = {}
+        self.audio_sec: Optional[float] = None
+        self.started = time.perf_counter()
+
+    def add_stage(self, name: str, elapsed: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+_local = threading.local()
+
+
+def current_request() -> Optional[RequestRecord]:
+    return getattr(_local, "request", None)
+
+
+class _StageTimer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        registry.observe("whisper_stage_seconds", elapsed, stage=self.name)
+        if exc_type is not None:
+            registry.inc("whisper_stage_errors_total", stage=self.name)
+        record = current_request()
+        if record is not None:
+            record.add_stage(self.name, elapsed)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def stage(name: str):
+    """with stage("decode"): ... で段階の所要時間を計測する"""
+    if not ENABLED:
+        return _NOOP
+    return _StageTimer(name)
+
+
+def record_audio(audio_sec: float):
+    """現在のリクエストで処理する音声の長さ（秒）を記録する"""
+    record = current_request()
+    if record is not None:
+        record.audio_sec = audio_sec
+
+
+class _RequestScope:
+    def __init__(self, kind: str, fields: Dict):
+        self.record = RequestRecord(kind, fields)
+        self.previous = None
+
+    def __enter__(self) -> RequestRecord:
+        self.previous = current_request()
+        _local.request = self.record
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.request = self.previous
+        record = self.record
+        wall = time.perf_counter() - record.started
+        status = "error" if exc_type is not None else "ok"
+        registry.inc("whisper_requests_total", kind=record.kind, status=status)
+        cached = bool(record.fields.get("cached"))
+        if record.audio_sec and not cached:
+            registry.inc("whisper_audio_seconds_total", record.audio_sec)
+            registry.inc("whisper_processing_seconds_total", wall)
+        if not cached and status == "ok":
+            registry.observe("whisper_request_seconds", wall, kind=record.kind, profile=record.fields.get("profile", ""))
+        log = {
+            "kind": record.kind,
+            "status": status,
+            **record.fields,
+            "wall_ms": round(wall * 1000, 1),
+            "audio_sec": round(record.audio_sec, 2) if record.audio_sec else None,
+            "rtf": round(wall / record.audio_sec, 4) if record.audio_sec and not cached else None,
+            "stages_ms": {name: round(elapsed * 1000, 1) for name, elapsed in record.stages.items()},
+            "rss_mb": process_memory()["rss_mb"],
+        }
+        if exc is not None:
+            log["error"] = str(exc)
+        print(f"[Metrics] {json.dumps(log, ensure_ascii=False)}")
+        return False
+
+
+def request_scope(kind: str, **fields):
+    """この with ブロックを 1 リクエストとして段階ごとの時間を集め、終了時に構造化ログを出す"""
+    if not ENABLED:
+        return _NOOP
+    return _RequestScope(kind, fields)
+
+
+# --- プロセスの状態 ---
+
+def process_memory() -> Dict:
+    """現在の RSS とピーク RSS（MB）。ピークは現在の値を下回らないようにする"""
+    rss_mb = None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    # ru_maxrss は /proc の値と数え方が異なり（更新のタイミング・共有ページ）、現在の RSS より小さく出ることがある
+    if rss_mb is not None:
+        peak_mb = max(peak_mb, rss_mb)
+    return {
+        "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+def torch_stats() -> Dict:
+    """torch が読み込み済みの場合だけアロケーターの状態を返す（ここで torch を import しない）"""
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return {}
+    stats = {"threads": torch.get_num_threads()}
+    if torch.cuda.is_available():
+        stats.update(
+            cuda_allocated_mb=round(torch.cuda.memory_allocated() / (1024 * 1024), 1),
+            cuda_reserved_mb=round(torch.cuda.memory_reserved() / (1024 * 1024), 1),
+            cuda_peak_allocated_mb=round(torch.cuda.max_memory_allocated() / (1024 * 1024), 1),
+        )
+    return stats
+
+
+def throughput() -> Optional[float]:
+    """処理時間 1 秒あたりに文字起こしした音声の秒数"""
+    processing = registry.counter_value("whisper_processing_seconds_total")
+    if not processing:
+        return None
+    return registry.counter_value("whisper_audio_seconds_total") / processing
@@ -0,0 +1,321 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from app.config import (
+    get_memory_limit,
+    get_model_idle_timeout,
+    get_model_name,
+    get_model_pool_size,
+    get_model_size_mb,
+)
+from app.core import metrics
+
+#
+# プロセス全体で共有する Whisper モデルプール
+#
+# - (モデル名, デバイス, dtype) をキーにウォームなモデルを保持する
+# - 1 インスタンスは同時に 1 リクエストにだけ貸し出す（lease）
+# - LRU / アイドルタイムアウト / メモリ予算（MEMORY_LIMIT_MB）で解放する
+# - pin() している間は、アイドルタイムアウト（0 の場合の返却直後の解放も含む）では解放しない
+#   （逐次文字起こしのように短い推論を繰り返す間、毎回読み込み直さないため）
+#
+
+ModelKey = Tuple[str, str, str]
+
+
+def _load_whisper(model_name: str, device: str, dtype: str):
+    """デフォルトのローダー（dtype に対応する推論バックエンドで読み込む）"""
+    from app.core.backends import load_model
+    return load_model(model_name, device, dtype)
+
+
+class _PooledModel:
+    def __init__(self, key: ModelKey, size_mb: int):
+        self.key = key
+        self.size_mb = size_mb
+        self.model = None
+        self.in_use = True
+        self.last_used = time.monotonic()
+
+
+class ModelPool:
+    def __init__(
+        self,
+        max_instances: int,
+        memory_budget_mb: int,
+        idle_timeout: float,
+        loader: Callable = _load_whisper,
+    ):
+        self.max_instances = max_instances
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout = idle_timeout
+        self._loader = loader
+        self._cond = threading.Condition()
+        self._entries = []
+        # アイドル中のモデル（古いものが先頭）
+        self._idle: "OrderedDict[int, _PooledModel]" = OrderedDict()
+        # キーごとの pin の数
+        self._pins: Dict[ModelKey, int] = {}
+        self._sweeper = None
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_failures": 0,
+            "evictions": 0,
+            "waits": 0,
+            "load_time_total_sec": 0.0,
+            "load_time_last_sec": 0.0,
+        }
+
+    # --- 貸し出し ---
+
+    @contextmanager
+    def lease(
+        self,
+        model_name: Optional[str] = None,
+        device: str = "cpu",
+        dtype: str = "fp32",
+        timeout: Optional[float] = None,
+    ):
+        """モデルを排他的に借りる。with ブロックを抜けるとプールに返却される"""
+        key = (model_name or get_model_name(), device, dtype)
+        entry, needs_load = self._acquire(key, timeout)
+
+        if needs_load:
+            print(f"[ModelPool] モデル読み込み開始: {key}")
+            started = time.perf_counter()
+            try:
+                with metrics.stage("model_load"):
+                    entry.model = self._loader(*key)
+            except Exception:
+                with self._cond:
+                    self._entries.remove(entry)
+                    self._counters["load_failures"] += 1
+                    self._cond.notify_all()
+                raise
+            elapsed = time.perf_counter() - started
+            with self._cond:
+                self._counters["loads"] += 1
+                self._counters["load_time_total_sec"] += elapsed
+                self._counters["load_time_last_sec"] = elapsed
+            print(f"[ModelPool] モデル読み込み完了: {key} ({elapsed:.2f}秒)")
+
+        try:
+            yield entry.model
+        finally:
+            self._release(entry)
+
+    def _acquire(self, key: ModelKey, timeout: Optional[float]):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        size_mb = get_model_size_mb(key[0])
+        evicted = []
+        try:
+            with self._cond:
+                while True:
+                    entry = self._take_idle(key)
+                    if entry is not None:
+                        self._counters["hits"] += 1
+                        return entry, False
+
+                    evicted.extend(self._make_room(size_mb))
+                    if self._has_room(size_mb):
+                        entry = _PooledModel(key, size_mb)
+                        self._entries.append(entry)
+                        self._counters["misses"] += 1
+                        return entry, True
+
+                    # 全インスタンスが貸し出し中なので返却を待つ
+                    self._counters["waits"] += 1
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"モデルの空きを待機中にタイムアウトしました: {key}")
+                    self._cond.wait(remaining)
+        finally:
+            self._dispose(evicted)
+
+    def _take_idle(self, key: ModelKey) -> Optional[_PooledModel]:
+        # 同じキーのうち最近使われたものを優先する
+        for entry_id in reversed(self._idle):
+            entry = self._idle[entry_id]
+            if entry.key == key:
+                del self._idle[entry_id]
+                entry.in_use = True
+                return entry
+        return None
+
+    def _resident_mb(self) -> int:
+        return sum(entry.size_mb for entry in self._entries)
+
+    def _has_room(self, size_mb: int) -> bool:
+        if not self._entries:
+            # 予算を超えるモデルでも 1 つは必ず読み込めるようにする
+            return True
+        if len(self._entries) >= self.max_instances:
+            return False
+        return self._resident_mb() + size_mb <= self.memory_budget_mb
+
+    def _make_room(self, size_mb: int):
+        """アイドル中のモデルを LRU 順に外し、外したエントリを返す"""
+        evicted = []
+        busy = [entry for entry in self._entries if entry.in_use]
+        busy_mb = sum(entry.size_mb for entry in busy)
+        if busy and (len(busy) >= self.max_instances or busy_mb + size_mb > self.memory_budget_mb):
+            # アイドル分を全部外しても入らないなら何も外さない
+            return evicted
+        while self._idle and not self._has_room(size_mb):
+            _, entry = self._idle.popitem(last=False)
+            self._entries.remove(entry)
+            evicted.append(entry)
+        return evicted
+
+    def _release(self, entry: _PooledModel):
+        evicted = []
+        with self._cond:
+            entry.in_use = False
+            entry.last_used = time.monotonic()
+            if self.idle_timeout <= 0 and not self._pins.get(entry.key):
+                # 低メモリ環境向け：使い終わったらすぐに解放する
+                self._entries.remove(entry)
+                evicted.append(entry)
+            else:
+                self._idle[id(entry)] = entry
+                if self.idle_timeout > 0:
+                    self._ensure_sweeper()
+            self._cond.notify_all()
+        self._dispose(evicted)
+
+    def _dispose(self, entries):
+        if not entries:
+            return
+        with self._cond:
+            self._counters["evictions"] += len(entries)
+        for entry in entries:
+            print(f"[ModelPool] モデルを解放します: {entry.key}")
+            entry.model = None
+        gc.collect()
+
+    # --- pin ---
+
+    def pin(self, model_name: Optional[str] = None, device: str = "cpu", dtype: str = "fp32") -> ModelKey:
+        """unpin() されるまで、このキーのモデルを返却後もプールに残す（メモリ予算が足りなければ外す）"""
+        key = (model_name or get_model_name(), device, dtype)
+        with self._cond:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        return key
+
+    def unpin(self, model_name: Optional[str] = None, device: str = "cpu", dtype: str = "fp32"):
+        key = (model_name or get_model_name(), device, dtype)
+        evicted = []
+        with self._cond:
+            remaining = self._pins.get(key, 0) - 1
+            if remaining > 0:
+                self._pins[key] = remaining
+                return
+            self._pins.pop(key, None)
+            if self.idle_timeout <= 0:
+                # pin の間だけ残していたモデルを解放する
+                for entry_id, entry in list(self._idle.items()):
+                    if entry.key == key:
+                        del self._idle[entry_id]
+                        self._entries.remove(entry)
+                        evicted.append(entry)
+            elif self._idle:
+                self._ensure_sweeper()
+        self._dispose(evicted)
+
+    @contextmanager
+    def pinned(self, model_name: Optional[str] = None, device: str = "cpu", dtype: str = "fp32"):
+        self.pin(model_name, device, dtype)
+        try:
+            yield
+        finally:
+            self.unpin(model_name, device, dtype)
+
+    # --- アイドルタイムアウト ---
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="model-pool-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while True:
+            time.sleep(interval)
+            self.sweep()
+            with self._cond:
+                # pin されたモデルしか残っていなければ、unpin() で再び起動する
+                if not any(not self._pins.get(entry.key) for entry in self._idle.values()):
+                    self._sweeper = None
+                    return
+
+    def sweep(self):
+        """アイドルタイムアウトを過ぎたモデルを解放する"""
+        now = time.monotonic()
+        evicted = []
+        with self._cond:
+            for entry_id, entry in list(self._idle.items()):
+                if self._pins.get(entry.key):
+                    continue
+                if now - entry.last_used >= self.idle_timeout:
+                    del self._idle[entry_id]
+                    self._entries.remove(entry)
+                    evicted.append(entry)
+        self._dispose(evicted)
+
+    def clear(self):
+        """アイドル中のモデルをすべて解放する"""
+        with self._cond:
+            evicted = list(self._idle.values())
+            self._idle.clear()
+            for entry in evicted:
+                self._entries.remove(entry)
+        self._dispose(evicted)
+
+    # --- 統計 ---
+
+    def stats(self) -> Dict:
+        with self._cond:
+            counters = dict(self._counters)
+            lookups = counters["hits"] + counters["misses"]
+            return {
+                **counters,
+                "hit_ratio": counters["hits"] / lookups if lookups else 0.0,
+                "instances": len(self._entries),
+                "in_use": sum(1 for entry in self._entries if entry.in_use),
+                "idle": len(self._idle),
+                "resident_mb": self._resident_mb(),
+                "memory_budget_mb": self.memory_budget_mb,
+                "max_instances": self.max_instances,
+                "idle_timeout_sec": self.idle_timeout,
+                "pinned": [{"model": k[0], "device": k[1], "dtype": k[2], "count": n} for k, n in self._pins.items()],
+                "models": [
+                    {"model": e.key[0], "device": e.key[1], "dtype": e.key[2], "in_use": e.in_use}
+                    for e in self._entries
+                ],
+            }
+
+
+_pool: Optional[ModelPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """プロセス全体で共有するモデルプールを取得する"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ModelPool(
+                    max_instances=get_model_pool_size(),
+                    memory_budget_mb=get_memory_limit(),
+                    idle_timeout=get_model_idle_timeout(),
+                )
+    return _pool
@@ -0,0 +1,163 @@
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.config import get_default_profile, get_profile_models
+from app.core import metrics
+from app.core.audio_preprocess import SAMPLE_RATE
+
+#
+# デコードプロファイル（品質／レイテンシの段階）
+#
+# - fast / balanced / accurate の 3 段階で、モデル・ビーム幅・フォールバックの温度・
+#   品質の判定基準（圧縮率・平均対数尤度・無音確率）と、フォールバックに使える計算量を決める
+# - Whisper は品質の基準を満たさない窓を温度を上げて最大 6 回デコードし直すので、
+#   ノイズの多い音声ほど処理時間が読めなくなる。ここでは再デコードできる量を
+#   「音声の長さ × fallback_budget」秒（最低でも 1 窓分）に制限し、超えたらそれまでの結果を使う
+# - 使ったプロファイルとフォールバック回数はリクエストのログ・/api/metrics に残す（段階ごとの p99 用）
+# - プロファイルは呼ぶたびに環境変数から作る（import した後に設定を変えても反映される）
+#
+
+# 1 回のデコードで扱う音声（Whisper の 1 窓）
+WINDOW_SEC = 30.0
+ALL_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+metrics.registry.describe("whisper_decode_fallbacks_total", "温度を上げてデコードし直した回数")
+metrics.registry.describe("whisper_decode_fallbacks_skipped_total", "計算量の上限に達して行わなかったフォールバックの回数")
+
+
+class DecodingProfile(NamedTuple):
+    name: str
+    model_name: str
+    beam_size: Optional[int]
+    best_of: Optional[int]
+    temperatures: Tuple[float, ...]
+    compression_ratio_threshold: float
+    logprob_threshold: float
+    no_speech_threshold: float
+    # フォールバックで再デコードしてよい量（音声の長さに対する割合）
+    fallback_budget: float
+
+    def transcribe_options(self) -> Dict:
+        """model.transcribe（と固定窓のデコード）に渡すオプション"""
+        return {
+            "beam_size": self.beam_size,
+            "best_of": self.best_of,
+            "temperature": self.temperatures,
+            "compression_ratio_threshold": self.compression_ratio_threshold,
+            "logprob_threshold": self.logprob_threshold,
+            "no_speech_threshold": self.no_speech_threshold,
+        }
+
+    def info(self) -> Dict:
+        return {**self._asdict(), "temperatures": list(self.temperatures)}
+
+
+def get_profiles() -> Dict[str, DecodingProfile]:
+    """すべてのプロファイル（PROFILE_*_MODEL などの環境変数をこの時点で読む）"""
+    models = get_profile_models()
+    return {
+        # グリーディ 1 回だけ（フォールバックなし）
+        "fast": DecodingProfile("fast", models["fast"], None, None, (0.0,), 2.4, -1.0, 0.6, 0.0),
+        # Whisper の既定の設定。ただしフォールバックは音声の半分の長さまで
+        "balanced": DecodingProfile("balanced", models["balanced"], None, None, ALL_TEMPERATURES, 2.4, -1.0, 0.6, 0.5),
+        # 一回り大きいモデル＋ビームサーチ。フォールバックは音声の 2 倍の長さまで
+        "accurate": DecodingProfile("accurate", models["accurate"], 5, 5, ALL_TEMPERATURES, 2.4, -1.0, 0.6, 2.0),
+    }
+
+
+
+def get_profile(name: Optional[str] = None) -> DecodingProfile:
+    """プロファイルを名前で取得する（省略時は TRANSCRIBE_PROFILE）。不明な名前は ValueError"""
+    name = (name or get_default_profile()).strip().lower()
+    profiles = get_profiles()
+    if name not in profiles:
+        raise ValueError(f"profile は {' / '.join(profiles)} のいずれかです: {name}")
+    return profiles[name]
+
+
+class DecodeBudget:
+    """1 リクエストでフォールバックに使える計算量（再デコードする音声の秒数）"""
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self.limit_sec = 0.0
+        self.spent_sec = 0.0
+        self.fallbacks = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def start(self, audio_sec: float):
+        """これから処理する音声の長さで上限を決める（少なくとも 1 窓分はやり直せる）"""
+        with self._lock:
+            self.limit_sec += max(WINDOW_SEC, audio_sec * self.ratio) if self.ratio > 0 else 0.0
+
+    def allow_fallback(self, cost_sec: float = WINDOW_SEC) -> bool:
+        with self._lock:
+            if self.spent_sec + cost_sec > self.limit_sec:
+                self.skipped += 1
+                return False
+            self.spent_sec += cost_sec
+            self.fallbacks += 1
+            return True
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "fallbacks": self.fallbacks,
+                "skipped_fallbacks": self.skipped,
+                "budget_sec": round(self.limit_sec, 1),
+                "spent_sec": round(self.spent_sec, 1),
+            }
+
+
+class BudgetedModel:
+    """Whisper モデルの代わりに渡し、フォールバックのデコードを計算量の上限で打ち切る
+
+    whisper.transcribe は窓ごとに温度 0 から model.decode を呼び、品質の基準を満たすまで温度を上げる。
+    上限に達した後のフォールバックは、デコードせずに直前の（同じ窓の）結果を返す。
+    基準を満たさないままなので whisper は残りの温度も試すが、その窓ではもう予算に問い合わせず
+    （打ち切りは窓ごとに 1 回と数える）直前の結果をそのまま返す。
+    """
+
+    def __init__(self, model, budget: DecodeBudget):
+        self.model = model
+        self.budget = budget
+        self._last = None
+        # この窓のフォールバックを打ち切ったか
+        self._denied = False
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def decode(self, mel, options):
+        if options.temperature > 0 and self._last is not None:
+            if self._denied:
+                return self._last
+            if not self.budget.allow_fallback():
+                self._denied = True
+                return self._last
+        elif options.temperature == 0:
+            # 温度 0 のデコードは新しい窓の始まり
+            self._denied = False
+        result = self.model.decode(mel, options)
+        self._last = result
+        return result
+
+    def transcribe(self, audio, **kwargs):
+        import importlib
+
+        # whisper パッケージの属性 transcribe は関数なので、モジュールは sys.modules から取る
+        whisper_transcribe = importlib.import_module("whisper.transcribe")
+        self.budget.start(len(audio) / SAMPLE_RATE)
+        return whisper_transcribe.transcribe(self, audio, **kwargs)
+
+
+def record_decoding(profile: DecodingProfile, budget_summary: Dict) -> Dict:
+    """使ったプロファイルとフォールバック回数をリクエストのログとカウンターに残す"""
+    decoding = {"profile": profile.name, "model": profile.model_name, **budget_summary}
+    metrics.registry.inc("whisper_decode_fallbacks_total", budget_summary["fallbacks"], profile=profile.name)
+    metrics.registry.inc("whisper_decode_fallbacks_skipped_total", budget_summary["skipped_fallbacks"], profile=profile.name)
+    record = metrics.current_request()
+    if record is not None:
+        record.fields.update(fallbacks=budget_summary["fallbacks"], skipped_fallbacks=budget_summary["skipped_fallbacks"])
+    return decoding
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+#
+# 文字起こしの進捗通知
+#
+# - Whisper の transcribe ループ内の tqdm を差し替え、処理済みフレーム数を拾う
+#   （tqdm の n / total だけを使う。model.transcribe の途中のセグメント数は公開されていないので送らない）
+# - 進捗は file_id ごとに ProgressHub へ publish され、SSE（/api/progress/{file_id}）で配信する
+# - どのジョブの進捗かはスレッドローカルの ProgressReporter で判別する
+#
+
+# 同じ file_id の通知を間引く間隔（秒）
+PUBLISH_INTERVAL_SEC = 0.5
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class ProgressHub:
+    """file_id ごとの最新の進捗と、その購読者（asyncio.Queue）を管理する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Dict] = {}
+        self._subscribers: Dict[str, list] = {}
+
+    def publish(self, key: str, state: Dict):
+        """任意のスレッドから呼べる"""
+        state = {"file_id": key, **state}
+        with self._lock:
+            self._latest[key] = state
+            subscribers = list(self._subscribers.get(key, []))
+            if state.get("status") in TERMINAL_STATUSES:
+                # 終了済みの進捗は購読者に渡したら保持しない
+                self._latest.pop(key, None)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, state)
+
+    def latest(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._latest.get(key)
+
+    def subscribe(self, key: str):
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(key, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, key: str, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(key, [])
+            self._subscribers[key] = [item for item in subscribers if item[1] is not queue]
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+
+progress_hub = ProgressHub()
+
+
+class ProgressReporter:
+    def __init__(self, key: str, total_sec: Optional[float] = None, on_update: Optional[Callable] = None):
+        self.key = key
+        self.total_sec = total_sec
+        self.on_update = on_update
+        self.fraction = 0.0
+        self.segments = 0
+        self._last_publish = 0.0
+
+    def report(self, fraction: float, segments: Optional[int] = None, force: bool = False):
+        self.fraction = min(1.0, max(self.fraction, fraction))
+        if segments is not None:
+            self.segments = segments
+        now = time.monotonic()
+        if not force and now - self._last_publish < PUBLISH_INTERVAL_SEC:
+            return
+        self._last_publish = now
+        state = {
+            "status": "running",
+            "progress": round(self.fraction, 4),
+            "decoded_sec": round(self.fraction * self.total_sec, 2) if self.total_sec else None,
+            "total_sec": round(self.total_sec, 2) if self.total_sec else None,
+            "segments": self.segments,
+        }
+        progress_hub.publish(self.key, state)
+        if self.on_update is not None:
+            self.on_update(state)
+
+
+_local = threading.local()
+
+
+def current_reporter() -> Optional[ProgressReporter]:
+    return getattr(_local, "reporter", None)
+
+
+@contextmanager
+def progress_context(key: str, total_sec: Optional[float] = None, on_update: Optional[Callable] = None):
+    """このスレッドで行う文字起こしの進捗を key（file_id）宛てに通知する"""
+    install_whisper_progress_hook()
+    reporter = ProgressReporter(key, total_sec, on_update)
+    previous = current_reporter()
+    _local.reporter = reporter
+    try:
+        yield reporter
+    finally:
+        _local.reporter = previous
+
+
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def install_whisper_progress_hook():
+    """whisper.transcribe が使う tqdm を、進捗を報告するサブクラスに差し替える"""
+    global _hook_installed
+    if _hook_installed:
+        return
+    with _hook_lock:
+        if _hook_installed:
+            return
+        try:
+            import importlib
+            import tqdm as tqdm_module
+
+            # `import whisper.transcribe as ...` だとパッケージの属性（transcribe 関数）が返るのでモジュールを直接取る
+            whisper_transcribe = importlib.import_module("whisper.transcribe")
+        except ImportError:
+            return
+
+        class _ProgressTqdm(tqdm_module.tqdm):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                # disable=True の場合 tqdm 自体は数えないので自前で数える
+                self._frames_done = 0
+
+            def update(self, n=1):
+                value = super().update(n)
+                self._frames_done += n
+                reporter = current_reporter()
+                if reporter is not None and self.total:
+                    reporter.report(self._frames_done / self.total)
+                return value
+
+        whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=_ProgressTqdm)
+        _hook_installed = True
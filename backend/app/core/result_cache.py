@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.config import RESULT_CACHE_DIR, get_result_cache_mb
+
+#
+# 文字起こし結果のディスクキャッシュ
+#
+# - キー: (音声の SHA-256, モデル名, 言語, デコード設定)
+# - 値: Whisper の結果（text / segments / language）を JSON で保存
+# - 合計サイズが上限を超えたら最後に使われたのが古い順（LRU）に削除する
+# - 別プロセス（JOB_MODE=api のワーカー）が書いたエントリも使えるよう、索引に無いキーはディスクを確認する
+#
+
+
+def make_cache_key(audio_hash: str, model_name: str, language: Optional[str], options: Dict) -> str:
+    payload = json.dumps(
+        {"audio": audio_hash, "model": model_name, "language": language, "options": options},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key → バイト数（古い順）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """起動時に既存のキャッシュを最終利用時刻（mtime）順に読み込む"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        evicted = []
+        with self._lock:
+            if key not in self._index:
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    self._counters["misses"] += 1
+                    return None
+                # 別プロセスが書いたエントリを索引に加える
+                self._index[key] = size
+                self._bytes += size
+                evicted = self._trim()
+            self._index.move_to_end(key)
+            self._counters["hits"] += 1
+        self._unlink(evicted)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # LRU 順序を再起動後も保つ
+            return result
+        except (OSError, ValueError):
+            # 壊れた・消えたエントリは無かったことにする
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+                self._counters["hits"] -= 1
+                self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: Dict):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            self._counters["writes"] += 1
+            evicted = self._trim()
+        self._unlink(evicted)
+
+    def _trim(self):
+        """上限を超えた分を古い順に索引から外し、外したキーを返す（ロックを持って呼ぶ）"""
+        evicted = []
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            old_key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self._counters["evictions"] += 1
+            evicted.append(old_key)
+        return evicted
+
+    def _unlink(self, keys):
+        for old_key in keys:
+            try:
+                os.unlink(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": self._counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """プロセス全体で共有する結果キャッシュを取得する"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(RESULT_CACHE_DIR, get_result_cache_mb() * 1024 * 1024)
+    return _cache
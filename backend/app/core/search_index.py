@@ -0,0 +1,319 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import JOB_DB_PATH, SEARCH_DB_PATH
+
+#
+# 文字起こし結果の全文検索索引
+#
+# - 完了したジョブのセグメントを SQLite FTS5 に登録する（1 セグメント = 1 行、開始・終了はミリ秒）
+# - 日本語は分かち書きせずに引けるよう trigram トークナイザ（文字 3-gram）を使う
+# - trigram では 3 文字未満の語を引けない。日本語は 2 文字の語が多いので、セグメントの文字 2-gram を
+#   別の表（segment_bigrams）に持ち、2 文字以上の語はそこから候補を引いてから LIKE で確かめる
+#   （索引の大きさはおおよそ本文 1 文字につき 1 行。FTS5 / trigram が使えない古い SQLite でも使う）
+# - 1 文字の語だけは索引で引けないので、ほかの語で絞った候補に LIKE をかける。
+#   1 文字の語だけの検索は全セグメントを走査する（セグメント数に比例して遅くなる）
+#
+
+# trigram で引ける最短の語の長さ（文字）
+MIN_TRIGRAM_CHARS = 3
+# 2-gram で引ける最短の語の長さ（文字）
+MIN_BIGRAM_CHARS = 2
+# ハイライトの前後に付ける印
+HIGHLIGHT_OPEN = "["
+HIGHLIGHT_CLOSE = "]"
+
+
+def _split_terms(query: str) -> List[str]:
+    """空白（全角を含む）区切りの語に分ける。語はすべて含むもの（AND）を探す"""
+    return [term for term in query.replace("　", " ").split() if term]
+
+
+def _fts_phrase(term: str) -> str:
+    # FTS5 のクエリ構文として解釈させないよう、語をフレーズとして引用する
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _bigrams(text: str) -> List[str]:
+    """文字 2-gram（小文字にそろえる。空白を含むものは語の中に現れないので除く）"""
+    text = text.lower()
+    return sorted({text[i:i + 2] for i in range(len(text) - 1) if not any(c.isspace() for c in text[i:i + 2])})
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class SearchIndex:
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    file_id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    language TEXT,
+                    duration_ms INTEGER,
+                    segment_count INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    seg_index INTEGER NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id, seg_index);
+                """
+            )
+            self._create_bigrams()
+            self.fts_enabled = self._create_fts()
+        if not self.fts_enabled:
+            print(f"[Search] FTS5 trigram が使えません（SQLite {sqlite3.sqlite_version}）。LIKE で検索します")
+
+    def _create_bigrams(self):
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'segment_bigrams'"
+        ).fetchone()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segment_bigrams (
+                gram TEXT NOT NULL,
+                segment_id INTEGER NOT NULL,
+                PRIMARY KEY (gram, segment_id)
+            ) WITHOUT ROWID
+            """
+        )
+        if not exists:
+            # 2-gram の表が無かった頃に登録したセグメントの分を作る
+            rows = self._conn.execute("SELECT id, text FROM segments").fetchall()
+            self._insert_bigrams((row["id"], row["text"]) for row in rows)
+            if rows:
+                print(f"[Search] 既存の {len(rows)} セグメントの 2-gram 索引を作成しました")
+
+    def _insert_bigrams(self, segments):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO segment_bigrams (gram, segment_id) VALUES (?, ?)",
+            ((gram, segment_id) for segment_id, text in segments for gram in _bigrams(text)),
+        )
+
+    def _create_fts(self) -> bool:
+        try:
+            # 本文は segments に持ち、FTS 側は索引だけ（external content）
+            self._conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts
+                USING fts5(text, content='segments', content_rowid='id', tokenize='trigram')
+                """
+            )
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    # --- 登録 ---
+
+    def index_transcript(self, file_id: str, store, filename: Optional[str] = None):
+        """セグメントストアの内容で file_id の索引を作り直す"""
+        rows = [
+            (file_id, index, int(round(store.starts[index] * 1000)), int(round(store.ends[index] * 1000)),
+             store.text_at(index).strip())
+            for index in range(len(store))
+        ]
+        rows = [row for row in rows if row[4]]
+        duration_ms = max((row[3] for row in rows), default=0)
+        with self._lock, self._conn:
+            self._delete(file_id)
+            self._conn.executemany(
+                "INSERT INTO segments (file_id, seg_index, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?)", rows,
+            )
+            if self.fts_enabled:
+                self._conn.execute(
+                    "INSERT INTO segments_fts (rowid, text) SELECT id, text FROM segments WHERE file_id = ?",
+                    (file_id,),
+                )
+            self._insert_bigrams(
+                (row["id"], row["text"])
+                for row in self._conn.execute("SELECT id, text FROM segments WHERE file_id = ?", (file_id,))
+            )
+            self._conn.execute(
+                """
+                INSERT INTO transcripts (file_id, filename, language, duration_ms, segment_count, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (file_id, filename, store.language, duration_ms, len(rows), time.time()),
+            )
+
+    def remove(self, file_id: str):
+        with self._lock, self._conn:
+            self._delete(file_id)
+
+    def _delete(self, file_id: str):
+        if self.fts_enabled:
+            # external content の FTS は、消す行の本文を渡して索引から外す
+            self._conn.execute(
+                """
+                INSERT INTO segments_fts (segments_fts, rowid, text)
+                SELECT 'delete', id, text FROM segments WHERE file_id = ?
+                """,
+                (file_id,),
+            )
+        self._conn.execute(
+            "DELETE FROM segment_bigrams WHERE segment_id IN (SELECT id FROM segments WHERE file_id = ?)", (file_id,),
+        )
+        self._conn.execute("DELETE FROM segments WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM transcripts WHERE file_id = ?", (file_id,))
+
+    def has(self, file_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM transcripts WHERE file_id = ?", (file_id,)).fetchone()
+        return row is not None
+
+    # --- 検索 ---
+
+    def search(self, query: str, limit: int = 50, offset: int = 0, file_id: Optional[str] = None) -> Dict:
+        """query の語をすべて含むセグメントを返す（FTS が使えれば関連度順、LIKE のみなら新しいものから）"""
+        terms = _split_terms(query)
+        if not terms:
+            return {"query": query, "mode": None, "results": []}
+        long_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_CHARS] if self.fts_enabled else []
+        short_terms = [term for term in terms if term not in long_terms]
+        bigram_terms = [term for term in short_terms if len(term) >= MIN_BIGRAM_CHARS]
+
+        where, params = [], []
+        for term in bigram_terms:
+            # 2-gram の索引で候補を絞る（語の 2-gram をすべて含むセグメント）
+            for gram in _bigrams(term):
+                where.append("s.id IN (SELECT segment_id FROM segment_bigrams WHERE gram = ?)")
+                params.append(gram)
+        for term in short_terms:
+            # 2-gram で絞った候補も、語として連続しているかを LIKE で確かめる
+            where.append("s.text LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(term))
+        if file_id is not None:
+            where.append("s.file_id = ?")
+            params.append(file_id)
+
+        mode = "+".join(
+            name for name, used in (
+                ("fts", long_terms),
+                ("bigram", bigram_terms),
+                ("like", [term for term in short_terms if term not in bigram_terms]),
+            ) if used
+        )
+        if long_terms:
+            sql = f"""
+                SELECT s.file_id, s.seg_index, s.start_ms, s.end_ms, s.text, t.filename,
+                       highlight(segments_fts, 0, ?, ?) AS highlight
+                FROM segments_fts
+                JOIN segments s ON s.id = segments_fts.rowid
+                JOIN transcripts t ON t.file_id = s.file_id
+                WHERE segments_fts MATCH ? {"".join(" AND " + clause for clause in where)}
+                ORDER BY segments_fts.rank
+                LIMIT ? OFFSET ?
+            """
+            params = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, " AND ".join(map(_fts_phrase, long_terms)), *params]
+        else:
+            sql = f"""
+                SELECT s.file_id, s.seg_index, s.start_ms, s.end_ms, s.text, t.filename, NULL AS highlight
+                FROM segments s
+                JOIN transcripts t ON t.file_id = s.file_id
+                WHERE {" AND ".join(where)}
+                ORDER BY s.id DESC
+                LIMIT ? OFFSET ?
+            """
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit, offset)).fetchall()
+
+        results = []
+        for row in rows:
+            # LIKE で絞り込んだ語は FTS のハイライトに含まれないので自前で印を付ける
+            # （検索と同じく ASCII の大文字・小文字は区別せず、本文の表記のまま囲む）
+            highlight = row["highlight"] or row["text"]
+            for term in short_terms:
+                highlight = re.sub(
+                    re.escape(term),
+                    lambda match: f"{HIGHLIGHT_OPEN}{match.group(0)}{HIGHLIGHT_CLOSE}",
+                    highlight,
+                    flags=re.IGNORECASE,
+                )
+            results.append({
+                "file_id": row["file_id"],
+                "filename": row["filename"],
+                "segment": row["seg_index"],
+                "start_ms": row["start_ms"],
+                "end_ms": row["end_ms"],
+                "text": row["text"],
+                "highlight": highlight,
+            })
+        return {"query": query, "mode": mode, "results": results}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS transcripts, COALESCE(SUM(segment_count), 0) AS segments, "
+                "COALESCE(SUM(duration_ms), 0) AS duration_ms FROM transcripts"
+            ).fetchone()
+        return {**dict(row), "fts": self.fts_enabled, "sqlite_version": sqlite3.sqlite_version}
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """プロセス全体で共有する検索索引を取得する"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(SEARCH_DB_PATH)
+    return _index
+
+
+def index_job(file_id: str, segments_path: str, filename: Optional[str] = None):
+    """完了したジョブのセグメントストアを索引に登録する"""
+    from app.core.segment_store import SegmentStore
+
+    get_search_index().index_transcript(file_id, SegmentStore.load(segments_path), filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こし結果の全文検索索引を管理する")
+    parser.add_argument("--rebuild", action="store_true", help="完了済みジョブをすべて登録し直す（既定は未登録分のみ）")
+    args = parser.parse_args()
+
+    from app.core.broker import STATUS_DONE
+    from app.core.job_queue import JobStore
+
+    index = get_search_index()
+    jobs = JobStore(JOB_DB_PATH)
+    with jobs.lock:
+        rows = jobs.conn.execute(
+            "SELECT file_id, filename, segments_path FROM jobs WHERE status = ? AND segments_path IS NOT NULL",
+            (STATUS_DONE,),
+        ).fetchall()
+    indexed = 0
+    for row in rows:
+        if not os.path.exists(row["segments_path"]) or (not args.rebuild and index.has(row["file_id"])):
+            continue
+        index_job(row["file_id"], row["segments_path"], row["filename"])
+        indexed += 1
+    print(f"[Search] 登録: {indexed}件 / 完了済みジョブ {len(rows)}件")
+    print(f"[Search] {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
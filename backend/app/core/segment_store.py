@@ -0,0 +1,200 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from app.config import OUTPUT_DIR
+
+#
+# セグメント単位の文字起こし結果をコンパクトに保存するストア
+#
+# - start / end / avg_logprob / no_speech_prob を数値配列（array）で、
+#   テキストは 1 つの UTF-8 バイト列＋オフセット配列で持つ（セグメントごとの dict を作らない）
+# - 1 ジョブ = 1 ファイル（OUTPUT_DIR/{file_id}.segments）
+# - TXT / JSON / SRT / VTT はここから必要なときにストリーミングで生成する
+#
+
+MAGIC = b"WSEG1\n"
+# 1 回の yield でまとめて出力するセグメント数
+RENDER_BATCH = 256
+
+_NUMERIC_FIELDS = (("starts", "d"), ("ends", "d"), ("avg_logprob", "f"), ("no_speech_prob", "f"))
+
+
+def segments_path(file_id: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{file_id}.segments")
+
+
+class SegmentStore:
+    def __init__(self, language: Optional[str] = None):
+        self.language = language
+        self.starts = array("d")
+        self.ends = array("d")
+        self.avg_logprob = array("f")
+        self.no_speech_prob = array("f")
+        self.text_offsets = array("Q", [0])
+        self._text = bytearray()
+
+    @classmethod
+    def from_result(cls, result: Dict) -> "SegmentStore":
+        store = cls(result.get("language"))
+        for segment in result.get("segments", []):
+            store.append(
+                segment["start"], segment["end"], segment["text"],
+                segment.get("avg_logprob", 0.0), segment.get("no_speech_prob", 0.0),
+            )
+        return store
+
+    def append(self, start: float, end: float, text: str, avg_logprob: float = 0.0, no_speech_prob: float = 0.0):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.avg_logprob.append(avg_logprob)
+        self.no_speech_prob.append(no_speech_prob)
+        self._text += text.encode("utf-8")
+        self.text_offsets.append(len(self._text))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text_at(self, index: int) -> str:
+        return bytes(self._text[self.text_offsets[index]:self.text_offsets[index + 1]]).decode("utf-8")
+
+    def segment(self, index: int) -> Dict:
+        return {
+            "id": index,
+            "start": round(self.starts[index], 3),
+            "end": round(self.ends[index], 3),
+            "text": self.text_at(index),
+            "avg_logprob": round(self.avg_logprob[index], 4),
+            "no_speech_prob": round(self.no_speech_prob[index], 4),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self.segment(index)
+
+    @property
+    def text(self) -> str:
+        return self._text.decode("utf-8").strip()
+
+    # --- 保存・読み込み ---
+
+    def save(self, path: str):
+        header = json.dumps({
+            "count": len(self),
+            "language": self.language,
+            "byteorder": sys.byteorder,
+            "text_bytes": len(self._text),
+        }).encode("utf-8")
+        tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for name, _typecode in _NUMERIC_FIELDS:
+                getattr(self, name).tofile(f)
+            self.text_offsets.tofile(f)
+            f.write(self._text)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SegmentStore":
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"セグメントファイルの形式が不正です: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+            store = cls(header["language"])
+            count = header["count"]
+            swap = header["byteorder"] != sys.byteorder
+            for name, typecode in _NUMERIC_FIELDS:
+                values = array(typecode)
+                values.fromfile(f, count)
+                if swap:
+                    values.byteswap()
+                setattr(store, name, values)
+            offsets = array("Q")
+            offsets.fromfile(f, count + 1)
+            if swap:
+                offsets.byteswap()
+            store.text_offsets = offsets
+            store._text = bytearray(f.read(header["text_bytes"]))
+        return store
+
+
+def save_segments(file_id: str, result: Dict) -> str:
+    """文字起こし結果をセグメントストアとして保存し、そのパスを返す"""
+    path = segments_path(file_id)
+    SegmentStore.from_result(result).save(path)
+    return path
+
+
+# --- 出力形式ごとのレンダリング（ストリーミング） ---
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _batched(store: SegmentStore, render_one) -> Iterator[str]:
+    lines: List[str] = []
+    for index in range(len(store)):
+        lines.append(render_one(index))
+        if len(lines) >= RENDER_BATCH:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def render_txt(store: SegmentStore, file_id: Optional[str] = None) -> Iterator[str]:
+    yield store.text
+
+
+def render_json(store: SegmentStore, file_id: Optional[str] = None) -> Iterator[str]:
+    head = {"file_id": file_id, "language": store.language, "text": store.text}
+    yield json.dumps(head, ensure_ascii=False)[:-1] + ', "segments": ['
+    yield from _batched(
+        store,
+        lambda i: ("," if i else "") + json.dumps(store.segment(i), ensure_ascii=False),
+    )
+    yield "]}"
+
+
+def render_srt(store: SegmentStore, file_id: Optional[str] = None) -> Iterator[str]:
+    yield from _batched(
+        store,
+        lambda i: f"{i + 1}\n{_timestamp(store.starts[i], ',')} --> {_timestamp(store.ends[i], ',')}\n"
+                  f"{store.text_at(i).strip()}\n\n",
+    )
+
+
+def render_vtt(store: SegmentStore, file_id: Optional[str] = None) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    yield from _batched(
+        store,
+        lambda i: f"{_timestamp(store.starts[i], '.')} --> {_timestamp(store.ends[i], '.')}\n"
+                  f"{store.text_at(i).strip()}\n\n",
+    )
+
+
+def render_result(store: SegmentStore, file_id: Optional[str] = None) -> Iterator[str]:
+    """/api/result の応答 {"text": ..., "json": {...}}"""
+    yield '{"text": ' + json.dumps(store.text, ensure_ascii=False) + ', "json": '
+    yield from render_json(store, file_id)
+    yield "}"
+
+
+# 形式 → (レンダラー, media_type, 拡張子)
+RENDERERS = {
+    "txt": (render_txt, "text/plain; charset=utf-8", "txt"),
+    "json": (render_json, "application/json", "json"),
+    "srt": (render_srt, "application/x-subrip; charset=utf-8", "srt"),
+    "vtt": (render_vtt, "text/vtt; charset=utf-8", "vtt"),
+}
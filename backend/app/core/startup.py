@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import get_model_name, get_warmup_mode
+
+#
+# 起動フェーズの計測とバックグラウンドウォームアップ
+#
+# - torch / whisper は最初の推論まで import しない（/health が起動直後から応答できるように）
+# - main.py の各段階で mark() し、/api/health/startup で経過時間を確認できる
+# - WHISPER_WARMUP を指定すると、起動完了後に別スレッドで重い import やモデル読み込みを済ませる
+#
+
+HEAVY_MODULES = ("torch", "whisper", "numpy")
+
+
+class StartupTimer:
+    def __init__(self):
+        # このモジュールが最初に import された時刻を起点にする
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: List[Dict] = []
+        self.ready_at_ms: Optional[float] = None
+        self.warmup_status = "disabled"
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._origin) * 1000, 1)
+
+    def mark(self, phase: str):
+        elapsed = self._elapsed_ms()
+        with self._lock:
+            previous = self._phases[-1]["at_ms"] if self._phases else 0.0
+            self._phases.append({"phase": phase, "at_ms": elapsed, "took_ms": round(elapsed - previous, 1)})
+        print(f"[Startup] {phase}: {elapsed:.1f}ms")
+
+    def mark_ready(self):
+        self.mark("ready")
+        self.ready_at_ms = self._elapsed_ms()
+
+    def report(self) -> Dict:
+        with self._lock:
+            phases = list(self._phases)
+        return {
+            "ready": self.ready_at_ms is not None,
+            "ready_at_ms": self.ready_at_ms,
+            "uptime_ms": self._elapsed_ms(),
+            "phases": phases,
+            "warmup": self.warmup_status,
+            # 起動直後にここが True なら、どこかで重い import が先行している
+            "loaded_modules": {name: name in sys.modules for name in HEAVY_MODULES},
+        }
+
+
+startup_timer = StartupTimer()
+
+
+def _warmup(mode: str):
+    startup_timer.warmup_status = "running"
+    try:
+        import whisper  # noqa: F401  torch もここで読み込まれる
+        from app.core.progress import install_whisper_progress_hook
+
+        install_whisper_progress_hook()
+        startup_timer.mark("warmup_import")
+        if mode == "model":
+            from app.core.backends import get_backend
+
+            with get_backend().lease(get_model_name()):
+                pass
+            startup_timer.mark("warmup_model")
+        startup_timer.warmup_status = "done"
+    except Exception as e:
+        print(f"[Startup] ウォームアップ失敗: {e}")
+        startup_timer.warmup_status = f"failed: {e}"
+
+
+def start_background_warmup():
+    """WHISPER_WARMUP の設定に応じてウォームアップスレッドを起動する"""
+    mode = get_warmup_mode()
+    if mode not in ("import", "model"):
+        return
+    print(f"[Startup] バックグラウンドウォームアップ開始: {mode}")
+    threading.Thread(target=_warmup, args=(mode,), name="warmup", daemon=True).start()
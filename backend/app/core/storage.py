@@ -0,0 +1,305 @@
+import gzip
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import ARCHIVE_DIR, AUDIO_DIR, get_storage_settings
+
+#
+# 音声ファイルのストレージ
+#
+# - アップロードは AUDIO_DIR/.incoming に取り込み、内容のハッシュ（SHA-256）ごとに
+#   AUDIO_DIR/.blobs/ab/abcd….wav として 1 つだけ保存する
+# - ジョブからは AUDIO_DIR/uploads/{file_id}.wav というハードリンクで参照する（同じ内容は何度来ても 1 つ分）
+# - 処理が終わった音声は ARCHIVE_DIR/.store へ移す（WAV などの非圧縮形式は gzip で圧縮）
+# - 参照が無くなった保存ファイルも保持期間の間は残し、後から同じ内容が来たら再利用する
+#   （更新時刻を最後に使われた時刻として扱う）
+# - バックグラウンドで保持期間を過ぎたアーカイブ・保存ファイルと、容量上限を超えた分を古い順に消す
+# - 16kHz モノラル 16bit の WAV は ffmpeg を通さず、mmap でそのまま波形として読む
+#
+
+# 圧縮すると小さくなる（もともと圧縮されていない）形式
+COMPRESSIBLE_FORMATS = (".wav",)
+# 取り込み途中で残った一時ファイルを消すまでの時間（秒）
+INCOMING_STALE_SEC = 24 * 3600
+
+
+class WavInfo(NamedTuple):
+    sample_rate: int
+    channels: int
+    bits: int
+    data_offset: int
+    data_size: int
+
+
+def read_wav_info(path: str) -> Optional[WavInfo]:
+    """PCM の WAV ならヘッダーを解析して返す（それ以外は None）"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+                if chunk_id == b"fmt ":
+                    body = f.read(size)
+                    audio_format, channels, sample_rate = struct.unpack("<HHI", body[:8])
+                    bits = struct.unpack("<H", body[14:16])[0]
+                    if audio_format != 1:  # PCM 以外
+                        return None
+                    fmt = (sample_rate, channels, bits)
+                    if size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b"data":
+                    if fmt is None:
+                        return None
+                    offset = f.tell()
+                    available = os.fstat(f.fileno()).st_size - offset
+                    return WavInfo(*fmt, offset, min(size, available))
+                else:
+                    f.seek(size + size % 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def read_wav_mmap(path: str, sample_rate: int):
+    """
+    16bit モノラルで sample_rate の WAV を mmap で読み、float32 波形を返す。
+    変換できない形式なら None（呼び出し元は ffmpeg でデコードする）。
+    """
+    import numpy as np
+
+    info = read_wav_info(path)
+    if info is None or (info.sample_rate, info.channels, info.bits) != (sample_rate, 1, 16):
+        return None
+    if info.data_size < 2:
+        return np.zeros(0, dtype=np.float32)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pcm = np.frombuffer(mapped, dtype="<i2", count=info.data_size // 2, offset=info.data_offset)
+            audio = pcm.astype(np.float32) / 32768.0
+            del pcm  # mmap を閉じる前にビューを解放する
+    return audio
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _unreferenced(blob: str) -> bool:
+    try:
+        return os.stat(blob).st_nlink <= 1
+    except FileNotFoundError:
+        return False
+
+
+class AudioStore:
+    def __init__(self, root: str = AUDIO_DIR, archive_root: str = ARCHIVE_DIR):
+        self.incoming_dir = os.path.join(root, ".incoming")
+        self.blob_dir = os.path.join(root, ".blobs")
+        self.upload_dir = os.path.join(root, "uploads")
+        self.archive_dir = os.path.join(archive_root, ".store")
+        for directory in (self.incoming_dir, self.blob_dir, self.upload_dir, self.archive_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._counters = {"stored": 0, "deduplicated": 0, "archived": 0, "deleted": 0, "deleted_bytes": 0}
+
+    # --- 保存 ---
+
+    def blob_path(self, sha256: str, extension: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}{extension}")
+
+    def owns(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.upload_dir)
+
+    def store(self, ingested_path: str, sha256: str, extension: str, file_id: str) -> str:
+        """
+        取り込んだファイルをハッシュ別の保存先へ移し、file_id 用のハードリンクを作ってそのパスを返す。
+        同じ内容がすでにあれば、取り込んだファイルは捨てて既存のものにリンクする。
+        """
+        blob = self.blob_path(sha256, extension)
+        reference = os.path.join(self.upload_dir, f"{file_id}{extension}")
+        with self._lock:
+            if os.path.exists(blob):
+                os.unlink(ingested_path)
+                self._counters["deduplicated"] += 1
+                print(f"[Storage] 同じ内容の音声を再利用: {sha256[:12]}")
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.move(ingested_path, blob)
+                self._counters["stored"] += 1
+            try:
+                os.link(blob, reference)
+            except FileExistsError:
+                pass
+            except OSError:
+                # ハードリンクが使えないファイルシステムではコピーする
+                shutil.copyfile(blob, reference)
+        return reference
+
+    def release(self, reference: str):
+        """参照を外す。ほかに参照が無くなった保存ファイルはそのまま残し、保持期間・容量の整理で消す"""
+        if self.owns(reference) and os.path.exists(reference):
+            os.unlink(reference)
+
+    def archive(self, reference: str, sha256: Optional[str]) -> Optional[str]:
+        """処理済みの音声をアーカイブへ移し（必要なら圧縮）、参照を外す。アーカイブのパスを返す"""
+        if not self.owns(reference) or not os.path.exists(reference):
+            return None
+        extension = os.path.splitext(reference)[1]
+        compress = get_storage_settings()["compress"] and extension in COMPRESSIBLE_FORMATS
+        name = f"{sha256 or os.path.basename(reference)}{extension}{'.gz' if compress else ''}"
+        destination = os.path.join(self.archive_dir, name[:2], name)
+        with self._lock:
+            if not os.path.exists(destination):
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                tmp_path = f"{destination}.tmp"
+                if compress:
+                    with open(reference, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                else:
+                    shutil.copyfile(reference, tmp_path)
+                os.replace(tmp_path, destination)
+                self._counters["archived"] += 1
+            else:
+                # 同じ内容のアーカイブがあれば保持期間を延ばすだけ
+                os.utime(destination)
+            os.unlink(reference)
+            if sha256:
+                # 保存ファイルは残しておき、保持期間はここから数える
+                try:
+                    os.utime(self.blob_path(sha256, extension))
+                except FileNotFoundError:
+                    pass
+        return destination
+
+    # --- 保持期間・容量 ---
+
+    def _delete(self, path: str, mtime: float, blob: bool = False) -> bool:
+        """候補に選んだ後で使われた（更新時刻が変わった・参照された）ファイルは消さない"""
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime != mtime or (blob and stat.st_nlink > 1):
+                return False
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._counters["deleted"] += 1
+            self._counters["deleted_bytes"] += stat.st_size
+        return True
+
+    def _walk(self, directory: str) -> List[Tuple[float, int, str]]:
+        """(更新時刻, サイズ, パス) の一覧"""
+        entries = []
+        for root, _dirs, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def sweep(self) -> Dict:
+        """保持期間を過ぎたアーカイブ・保存ファイル・古い一時ファイルを消し、容量上限を超えていれば古い順に消す"""
+        settings = get_storage_settings()
+        now = time.time()
+        # 消す候補はロックを持って決め、時間のかかる削除はロックの外で行う（取り込みを待たせない）
+        with self._lock:
+            expired = [(mtime, path, False) for mtime, _size_bytes, path in self._walk(self.incoming_dir)
+                       if now - mtime > INCOMING_STALE_SEC]
+            archives = self._walk(self.archive_dir)
+            # どのジョブからも参照されていない保存ファイルだけが消してよい対象
+            all_blobs = self._walk(self.blob_dir)
+            blobs = [entry for entry in all_blobs if _unreferenced(entry[2])]
+            in_use = sum(size for _, size, _ in all_blobs) - sum(size for _, size, _ in blobs)
+            if settings["retention_days"] > 0:
+                cutoff = now - settings["retention_days"] * 86400
+                expired += [(mtime, path, False) for mtime, _size_bytes, path in archives if mtime < cutoff]
+                expired += [(mtime, path, True) for mtime, _size_bytes, path in blobs if mtime < cutoff]
+                archives = [entry for entry in archives if entry[0] >= cutoff]
+                blobs = [entry for entry in blobs if entry[0] >= cutoff]
+
+            quota = settings["quota_mb"] * 1024 * 1024
+            evicted = []
+            if quota > 0:
+                usage = in_use + sum(size for _, size, _ in archives + blobs)
+                # 内容がアーカイブにも残っている保存ファイルから先に、それぞれ古い順に消す
+                candidates = [entry + (True,) for entry in sorted(blobs)] + [entry + (False,) for entry in sorted(archives)]
+                for mtime, size_bytes, path, blob in candidates:
+                    if usage <= quota:
+                        break
+                    evicted.append((mtime, path, blob))
+                    usage -= size_bytes
+                if usage > quota:
+                    print(f"[Storage] 処理中の音声だけで容量上限を超えています: {usage / 1024 / 1024:.0f}MB")
+
+        deleted = sum(self._delete(path, mtime, blob) for mtime, path, blob in expired + evicted)
+        if deleted:
+            print(f"[Storage] 保持期間・容量の整理で {deleted} 件削除しました")
+        return self.stats()
+
+    def start_sweeper(self):
+        interval = get_storage_settings()["sweep_sec"]
+        if interval <= 0 or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="storage-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self, interval: float):
+        # 循環 import を避けるためここで import する
+        from app.core import delivery
+
+        while True:
+            try:
+                self.sweep()
+                # 結果の配信用ファイルも同じ保持期間で整理する
+                delivery.sweep(get_storage_settings()["retention_days"])
+            except Exception as e:
+                print(f"[Storage] 整理に失敗しました: {e}")
+            time.sleep(interval)
+
+    def stats(self) -> Dict:
+        blobs = self._walk(self.blob_dir)
+        archives = self._walk(self.archive_dir)
+        settings = get_storage_settings()
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "blobs": len(blobs),
+            "blob_bytes": sum(size for _, size, _ in blobs),
+            "references": len(os.listdir(self.upload_dir)),
+            "archives": len(archives),
+            "archive_bytes": sum(size for _, size, _ in archives),
+            "quota_mb": settings["quota_mb"],
+            "retention_days": settings["retention_days"],
+        }
+
+
+_store: Optional[AudioStore] = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store() -> AudioStore:
+    """プロセス全体で共有する音声ストレージ"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AudioStore()
+    return _store
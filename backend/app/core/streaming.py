@@ -0,0 +1,136 @@
+import threading
+from typing import Dict, List
+
+from app.core.audio_preprocess import SAMPLE_RATE
+
+#
+# 逐次（ストリーミング）文字起こし
+#
+# - 録音中の音声フレームを受け取りながら、直近の音声（ローリングウィンドウ）を
+#   一定間隔でウォームなモデルに通す
+# - ウィンドウ末尾のセグメントはまだ変わり得るので partial として返し、
+#   十分前に終わったセグメントだけを final として確定する
+# - 確定した分はバッファから捨てるので、ウィンドウは常に 30 秒未満に保たれる
+#
+
+# 新しい音声がこれだけ溜まったら推論する（秒）
+STEP_SEC = 1.0
+# バッファ末尾からこれより前に終わったセグメントを確定する（秒）
+COMMIT_MARGIN_SEC = 2.0
+# ウィンドウがこれを超えたら、末尾以外のセグメントを強制的に確定する（Whisper の 30 秒窓未満）
+MAX_WINDOW_SEC = 25.0
+# 次のウィンドウに前置きとして渡す確定済みテキストの長さ（文字）
+PROMPT_CHARS = 200
+
+STREAM_OPTIONS = {
+    "language": "ja",
+    "fp16": False,
+    "verbose": None,  # 逐次処理では進捗表示も不要
+    "task": "transcribe",
+    "condition_on_previous_text": False,
+}
+
+
+def pcm_to_float(data: bytes, sample_format: str = "s16le"):
+    """受信した PCM（16kHz モノラル）を float32 の波形に変換する（data はサンプルの大きさの倍数）"""
+    import numpy as np
+
+    if sample_format == "f32le":
+        return np.frombuffer(data, "<f4").astype(np.float32)
+    return np.frombuffer(data, "<i2").astype(np.float32) / 32768.0
+
+
+class PcmDecoder:
+    """フレームの区切りがサンプルの途中でもよいように、端数のバイトを次のフレームに回す"""
+
+    def __init__(self, sample_format: str = "s16le"):
+        self.sample_format = sample_format
+        self.sample_bytes = 4 if sample_format == "f32le" else 2
+        self._rest = b""
+
+    def decode(self, data: bytes):
+        data = self._rest + data
+        usable = len(data) - len(data) % self.sample_bytes
+        self._rest = data[usable:]
+        return pcm_to_float(data[:usable], self.sample_format)
+
+
+class StreamingSession:
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        import numpy as np
+
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # バッファ先頭のストリーム上の時刻（秒）
+        self._offset = 0.0
+        self._pending_samples = 0
+        self._committed_text = ""
+        self.closed = False
+
+    @property
+    def buffered_sec(self) -> float:
+        return len(self._buffer) / self.sample_rate
+
+    def feed(self, audio):
+        import numpy as np
+
+        with self._lock:
+            self._buffer = np.concatenate((self._buffer, audio))
+            self._pending_samples += len(audio)
+
+    def ready(self) -> bool:
+        """前回の推論以降、STEP_SEC 以上の音声が溜まったか"""
+        return self._pending_samples >= STEP_SEC * self.sample_rate
+
+    def close(self):
+        self.closed = True
+
+    def step(self, model, final: bool = False) -> List[Dict]:
+        """現在のウィンドウを推論し、partial / final イベントを返す"""
+        with self._lock:
+            window = self._buffer.copy()
+            offset = self._offset
+            prompt = self._committed_text[-PROMPT_CHARS:] or None
+            self._pending_samples = 0
+        if window.size == 0:
+            return []
+
+        result = model.transcribe(window, initial_prompt=prompt, **STREAM_OPTIONS)
+        segments = [segment for segment in result.get("segments", []) if segment["text"].strip()]
+        window_sec = len(window) / self.sample_rate
+
+        if final:
+            commit_count = len(segments)
+        else:
+            commit_count = sum(1 for segment in segments if segment["end"] < window_sec - COMMIT_MARGIN_SEC)
+            if commit_count == 0 and window_sec > MAX_WINDOW_SEC:
+                # 確定できないままウィンドウが伸び続けるのを防ぐ
+                commit_count = max(1, len(segments) - 1)
+            # セグメントは時刻順なので、先頭から連続する分だけを確定する
+            commit_count = min(commit_count, len(segments))
+
+        events = []
+        for index, segment in enumerate(segments):
+            events.append({
+                "type": "final" if index < commit_count else "partial",
+                "start": round(offset + segment["start"], 3),
+                "end": round(offset + segment["end"], 3),
+                "text": segment["text"].strip(),
+            })
+
+        with self._lock:
+            if final:
+                trim_sec = window_sec
+            elif commit_count:
+                trim_sec = segments[commit_count - 1]["end"]
+            elif window_sec > MAX_WINDOW_SEC:
+                # 何も話されていない（無音が続いている）ので古い部分を捨てる
+                trim_sec = window_sec - COMMIT_MARGIN_SEC
+            else:
+                trim_sec = 0.0
+            trim = min(int(trim_sec * self.sample_rate), len(self._buffer))
+            self._buffer = self._buffer[trim:]
+            self._offset = offset + trim / self.sample_rate
+            self._committed_text += "".join(event["text"] for event in events if event["type"] == "final")
+        return events
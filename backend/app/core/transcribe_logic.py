@@ -1,27 +1,160 @@
-from pathlib import Path
-import whisper
-import gc
 import os
 import tempfile
+from app.config import AUDIO_DIR, get_model_name, get_backend_name, get_long_audio_min_sec, get_long_audio_workers, get_vad_settings
+from app.core.backends import get_backend
+from app.core.audio_preprocess import probe_duration, decode_audio, trim_leading_silence, SAMPLE_RATE
+from app.core.ingest import file_sha256
+from app.core.result_cache import get_result_cache, make_cache_key
+from app.core.vad import transcribe_speech
+from app.core.batching import get_micro_batcher
+from app.core.feature_cache import get_feature_cache, transcribe_with_features
+from app.core.profiles import BudgetedModel, DecodeBudget, DecodingProfile, get_profile, record_decoding
+from app.core.audio_index import get_audio_index
+from app.core.progress import current_reporter
+from app.core import metrics
 
 #
 # 変更点：
-# 1. グローバル変数 'model = None' を削除
-# 2. 'get_model()' 関数を削除
-# 3. 'cleanup_model()' 関数を削除
-# 4. 'transcribe_file()' 関数内でモデルのロードとアンロードを行うよう修正
+# 1. リクエストごとのモデルロード／アンロードを廃止
+# 2. プロセス全体で共有するモデルプール（app.core.model_pool）からモデルを借りる
+# 3. 低メモリ環境では WHISPER_MODEL_IDLE_SEC=0 相当で従来通り使用後に解放される
 #
 
-MODEL_NAME = "tiny"  # 最小サイズのモデル
+MODEL_NAME = get_model_name()  # デフォルトは最小サイズの tiny
+BACKEND_NAME = get_backend_name()  # whisper（fp32） / whisper-int8
 
-def transcribe_file(file_path: str) -> str:
+# model.transcribe に渡すオプション（長時間音声モードのワーカーでも共通）
+TRANSCRIBE_OPTIONS = {
+    "language": "ja",
+    "fp16": False,  # CPUではFalse推奨
+    "verbose": False,  # ログ出力を削減
+    "task": "transcribe",  # 明示的にタスクを指定
+}
+
+# リクエストで指定できるタスク
+TASKS = ("transcribe", "translate")
+# 前置き（プロンプト）の最大文字数
+MAX_PROMPT_CHARS = 1000
+
+def make_options(language: str = None, task: str = None, prompt: str = None, temperature: float = None) -> dict:
     """
-    リクエストごとにモデルをロードし、処理後にアンロードする。
-    無料枠のメモリ制限に対応するための戦略。
+    リクエストで指定された言語・タスク・前置き・温度を TRANSCRIBE_OPTIONS への上書きにする。
+    指定の無いものは含めない（既定の設定のままならキャッシュのキーも変わらない）。
+    不正な値は ValueError。
     """
-    print(f"[Logic] transcribe_file 呼び出し: {file_path}")
-    
-    model = None  # モデル変数をローカルで初期化
+    options = {}
+    if language:
+        language = language.strip().lower()
+        if len(language) > 16:
+            raise ValueError(f"不正な言語です: {language}")
+        # "auto" は Whisper の自動判定
+        options["language"] = None if language == "auto" else language
+    if task:
+        if task not in TASKS:
+            raise ValueError(f"task は {' / '.join(TASKS)} のいずれかです: {task}")
+        options["task"] = task
+    if prompt and prompt.strip():
+        if len(prompt) > MAX_PROMPT_CHARS:
+            raise ValueError(f"prompt は {MAX_PROMPT_CHARS} 文字以内です")
+        options["initial_prompt"] = prompt.strip()
+    if temperature is not None:
+        if not 0.0 <= temperature <= 1.0:
+            raise ValueError("temperature は 0〜1 の範囲です")
+        options["temperature"] = float(temperature)
+    # 既定値と同じ指定は上書きしない
+    return {k: v for k, v in options.items() if k not in TRANSCRIBE_OPTIONS or TRANSCRIBE_OPTIONS[k] != v}
+
+def _use_long_audio_mode(file_path: str, model_name: str = MODEL_NAME) -> float:
+    """長時間音声モードで処理すべきなら音声の長さ（秒）を、そうでなければ 0 を返す"""
+    min_sec = get_long_audio_min_sec()
+    if min_sec <= 0 or get_long_audio_workers(model_name) < 2:
+        return 0.0
+    try:
+        duration = probe_duration(file_path)
+    except Exception as e:
+        print(f"[Logic] 音声長の取得に失敗したため通常モードで処理します: {e}")
+        return 0.0
+    return duration if duration >= min_sec else 0.0
+
+def _shift_segments(result: dict, offset: float):
+    """除去した先頭の無音の分だけタイムスタンプを元の時間軸に戻す"""
+    if not offset:
+        return
+    for segment in result.get("segments", []):
+        segment["start"] += offset
+        segment["end"] += offset
+
+def _transcribe_options(profile: DecodingProfile, options: dict = None) -> dict:
+    """既定の設定 ← プロファイル ← リクエストの指定 の順に重ねたオプション"""
+    return {**TRANSCRIBE_OPTIONS, **profile.transcribe_options(), **(options or {})}
+
+def _cache_key(audio_hash: str, transcribe_options: dict, profile: DecodingProfile) -> str:
+    options = {k: v for k, v in transcribe_options.items() if k not in ("verbose", "language")}
+    options["vad"] = get_vad_settings()
+    # フォールバックの上限で結果が変わり得るのでプロファイルごとに別のキャッシュにする
+    options["profile"] = profile.name
+    if get_feature_cache().enabled:
+        # 特徴量キャッシュの 30 秒固定窓は model.transcribe のシーク処理と結果が変わるので別のキャッシュにする
+        options["features"] = "fixed_windows"
+    if BACKEND_NAME != "whisper":
+        # 量子化モデルは結果が変わり得るので別のキャッシュにする（従来のキーはそのまま）
+        options["backend"] = BACKEND_NAME
+    return make_cache_key(audio_hash, profile.model_name, transcribe_options["language"], options)
+
+def lookup_cached_result(audio_hash: str, options: dict = None, profile: DecodingProfile = None):
+    """推論キューに入れる前にキャッシュだけを確認する（ヒットしなければ None）"""
+    cache = get_result_cache()
+    if not cache.enabled:
+        return None
+    profile = profile or get_profile()
+    return _without_decoding(cache.get(_cache_key(audio_hash, _transcribe_options(profile, options), profile)))
+
+def _without_decoding(result):
+    """キャッシュした結果から、元の実行のフォールバック回数を外す（ヒット時は何もデコードしていない）"""
+    if result is not None:
+        result.pop("decoding", None)
+    return result
+
+def _feature_tag(model_name: str) -> str:
+    """エンコーダー出力のキャッシュを区別する名前（モデル名＋dtype）"""
+    return f"{model_name}_{get_backend(BACKEND_NAME).dtype}"
+
+def _decode(file_path: str):
+    """1 回だけデコードし、先頭の無音を配列上で除去する → (波形, 除いた秒数)"""
+    with metrics.stage("decode"):
+        audio = decode_audio(file_path)
+    metrics.record_audio(len(audio) / SAMPLE_RATE)
+    with metrics.stage("silence"):
+        audio, offset = trim_leading_silence(audio)
+    print(f"[Logic] デコード完了: {len(audio) / SAMPLE_RATE:.1f}秒")
+    reporter = current_reporter()
+    if reporter is not None:
+        reporter.total_sec = len(audio) / SAMPLE_RATE + offset
+    if audio.size == 0:
+        raise ValueError("音声が無音のみです")
+    return audio, offset
+
+def transcribe_result(
+    file_path: str, audio_hash: str = None, options: dict = None, profile: DecodingProfile = None,
+) -> dict:
+    """
+    モデルプールからウォームなモデルを借りて文字起こしを行い、
+    Whisper の結果（text / segments / language）をそのまま返す。
+    モデルの保持／解放はプール側がメモリ予算に応じて判断する。
+    同じ音声・同じ設定の結果がキャッシュにあれば推論せずにそれを返す。
+    options は make_options() で作った言語・タスク・前置き・温度の上書き。
+    profile はデコードプロファイル（省略時は TRANSCRIBE_PROFILE）。使ったプロファイルと
+    フォールバック回数は result["decoding"] に入る（キャッシュから返した結果には入らない）。
+    """
+    profile = profile or get_profile()
+    with metrics.request_scope(
+        "transcribe", file=os.path.basename(file_path), model=profile.model_name, backend=BACKEND_NAME,
+        profile=profile.name,
+    ):
+        return _transcribe_result(file_path, audio_hash, options, profile)
+
+def _transcribe_result(file_path: str, audio_hash: str, options: dict, profile: DecodingProfile) -> dict:
+    print(f"[Logic] transcribe_result 呼び出し: {file_path}")
     
     try:
         # ファイルの存在確認
@@ -35,81 +168,113 @@ def transcribe_file(file_path: str) -> str:
         if file_size == 0:
             raise ValueError("ファイルが空です")
         
-        # --- ここでモデルをロード ---
-        print(f"[Logic] Whisperモデル読み込み開始: {MODEL_NAME}")
-        # CPU使用を強制
-        model = whisper.load_model(MODEL_NAME, device="cpu")
-        print(f"[Logic] Whisperモデル読み込み完了: {MODEL_NAME}")
+        model_name = profile.model_name
+        transcribe_options = _transcribe_options(profile, options)
+        print(f"[Logic] プロファイル: {profile.name}（モデル {model_name}）")
+        if options:
+            print(f"[Logic] オプション指定: {options}")
+
+        # --- 結果キャッシュを確認 ---
+        cache = get_result_cache()
+        cache_key = None
+        if cache.enabled:
+            with metrics.stage("cache_lookup"):
+                audio_hash = audio_hash or file_sha256(file_path)
+                cache_key = _cache_key(audio_hash, transcribe_options, profile)
+                cached = _without_decoding(cache.get(cache_key))
+            if cached is not None:
+                print(f"[Logic] キャッシュヒット: {cache_key[:12]}")
+                cached["cached"] = True
+                record = metrics.current_request()
+                if record is not None:
+                    record.fields["cached"] = True
+                return cached
+        
+        budget = DecodeBudget(profile.fallback_budget)
+        long_duration = _use_long_audio_mode(file_path, model_name)
+        if long_duration:
+            # --- 長時間音声：無音で分割してプロセスプールで並列処理 ---
+            from app.core.long_audio import transcribe_long
+            print(f"[Logic] 長時間音声モードで文字起こし開始: {long_duration:.1f}秒")
+            metrics.record_audio(long_duration)
+            with metrics.stage("long_audio"):
+                result = transcribe_long(
+                    file_path, long_duration, model_name, transcribe_options, BACKEND_NAME, profile.fallback_budget,
+                )
+            budget_summary = result.pop("budget")
+        else:
+            decoded = None
+            # マイクロバッチはプロファイルごとにまとめる（リクエストで設定を上書きしたものはまとめない）
+            batcher = get_micro_batcher(profile, transcribe_options) if not options else None
+            if batcher is not None:
+                decoded = _decode(file_path)
+
+            if decoded is not None and batcher.accepts(decoded[0]):
+                # --- 30 秒以下の短い音声は、同時に来た他の音声とまとめて 1 回で推論する ---
+                print(f"[Logic] マイクロバッチで文字起こし開始")
+                with metrics.stage("batch_wait"):
+                    result = batcher.transcribe(decoded[0], budget)
+                _shift_segments(result, decoded[1])
+                budget_summary = budget.summary()
+            elif get_feature_cache().enabled:
+                # --- 30 秒窓ごとの log-mel・エンコーダー出力をキャッシュし、再実行ではエンコーダーを省く ---
+                # （キャッシュに無い場合のデコードはモデルを借りてから行う：n_mels はモデルで決まる）
+                with get_backend(BACKEND_NAME).lease(model_name) as model:
+                    print(f"[Logic] Whisperで文字起こし開始（特徴量キャッシュ使用）")
+                    result, entry = transcribe_with_features(
+                        BudgetedModel(model, budget), audio_hash or file_sha256(file_path), _feature_tag(model_name),
+                        transcribe_options, lambda: decoded or _decode(file_path),
+                    )
+                _shift_segments(result, entry.meta["offset"])
+                budget_summary = budget.summary()
+            else:
+                audio, offset = decoded or _decode(file_path)
+                # --- 推論バックエンド経由でモデルプールからモデルを借りる（CPU使用を強制） ---
+                with get_backend(BACKEND_NAME).lease(model_name) as model:
+                    # Whisperで文字起こし（波形を直接渡すので再デコードは発生しない）
+                    # VAD で非音声区間を省いてから推論する（フォールバックはプロファイルの上限まで）
+                    print(f"[Logic] Whisperで文字起こし開始")
+                    result = transcribe_speech(BudgetedModel(model, budget), audio, transcribe_options)
+                _shift_segments(result, offset)
+                budget_summary = budget.summary()
         
-        # Whisperで文字起こし（メモリ効率化）
-        print(f"[Logic] Whisperで文字起こし開始")
-        result = model.transcribe(
-            file_path, 
-            language="ja",
-            fp16=False,  # CPUではFalse推奨
-            verbose=False,  # ログ出力を削減
-            task="transcribe"  # 明示的にタスクを指定
-        )
+        result["decoding"] = record_decoding(profile, budget_summary)
+        if budget_summary["skipped_fallbacks"]:
+            print(f"[Logic] フォールバックの上限に達しました: {result['decoding']}")
         
         if not result or 'text' not in result:
             raise ValueError("Whisperの結果が不正です")
         
-        text = result['text'].strip()
-        if not text:
+        result['text'] = result['text'].strip()
+        if not result['text']:
             raise ValueError("文字起こし結果が空です")
         
-        print(f"[Logic] Whisper文字起こし完了（先頭100文字）: {text[:100]}")
-        return text
+        print(f"[Logic] Whisper文字起こし完了（先頭100文字）: {result['text'][:100]}")
+        if cache_key is not None:
+            with metrics.stage("cache_write"):
+                cache.put(cache_key, _without_decoding(dict(result)))
+        return result
         
     except Exception as e:
         print(f"[Logic] 文字起こしエラー: {e}")
         raise e  # エラーを呼び出し元に投げる
-        
-    finally:
-        # --- 成功しても失敗しても、必ずモデルをメモリから解放 ---
-        if model is not None:
-            del model
-            gc.collect()
-            print("[Logic] モデルメモリをクリアしました")
+
+def transcribe_file(
+    file_path: str, audio_hash: str = None, options: dict = None, profile: DecodingProfile = None,
+) -> str:
+    """文字起こし結果のテキストのみを返す"""
+    return transcribe_result(file_path, audio_hash, options, profile)['text']
 
 def transcribe_latest_file() -> str:
     """
-    データディレクトリから最新の音声ファイルを検索し、文字起こしを実行する。
-    （この関数は変更なし）
+    AUDIO_DIR の索引から最新の音声ファイルを取り出し、文字起こしを実行する。
+    （ディレクトリ全体の走査・ソートは行わない）
     """
     print("[Logic] transcribe_latest_file 呼び出し")
-    
-    # 複数のパスを試行
-    possible_paths = [
-        Path("app/data"),
-        Path("data"),
-        Path("../data"),
-        Path("./data")
-    ]
-    
-    data_dir = None
-    for path in possible_paths:
-        if path.exists():
-            data_dir = path
-            break
-    
-    if data_dir is None:
-        raise FileNotFoundError(f"データディレクトリが見つかりません。試行したパス: {possible_paths}")
-    
-    print(f"[Logic] データディレクトリ使用: {data_dir}")
-    
-    audio_files = sorted(
-        data_dir.glob("*"),
-        key=lambda f: f.stat().st_mtime,
-        reverse=True
-    )
-    
-    # 音声ファイルのみをフィルタリング
-    audio_extensions = {'.mp3', '.wav', '.m4a', '.flac', '.ogg'}
-    audio_files = [f for f in audio_files if f.suffix.lower() in audio_extensions]
-    
-    if not audio_files:
-        raise FileNotFoundError("音声ファイルが見つかりません。")
 
-    print(f"[Logic] 最新ファイル選択: {audio_files[0]}")
-    return transcribe_file(str(audio_files[0]))
\ No newline at end of file
+    latest = get_audio_index().latest()
+    if latest is None:
+        raise FileNotFoundError(f"音声ファイルが見つかりません: {AUDIO_DIR}")
+
+    print(f"[Logic] 最新ファイル選択: {latest.path}")
+    return transcribe_file(latest.path)
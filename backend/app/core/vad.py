@@ -0,0 +1,177 @@
+import bisect
+from typing import Dict, List, NamedTuple, Optional
+
+from app.config import get_vad_settings
+from app.core.audio_preprocess import SAMPLE_RATE
+from app.core import metrics
+
+#
+# 音声区間検出（VAD）
+#
+# - 30ms フレームごとのエネルギーとスペクトル平坦度で音声／非音声を判定する（NumPy でベクトル化）
+# - 音声区間だけをつないだ波形を Whisper に渡し、結果のタイムスタンプを元の時間軸に戻す
+#
+
+FRAME_MS = 30
+# フレームをまとめて FFT する単位（メモリ使用量を一定に保つため）
+FFT_BLOCK_FRAMES = 2048
+# つないだ区間の間に挟む無音（Whisper が区間の境目で単語をつなげないようにする）
+JOIN_GAP_SEC = 0.2
+# 省ける割合がこれ未満なら区間をつながずに元の波形をそのまま使う
+MIN_SKIP_RATIO = 0.05
+
+
+class SpeechRegion(NamedTuple):
+    start: float
+    end: float
+
+
+class VadResult(NamedTuple):
+    regions: List[SpeechRegion]
+    total_sec: float
+    speech_sec: float
+
+    @property
+    def skipped_ratio(self) -> float:
+        return 1.0 - self.speech_sec / self.total_sec if self.total_sec else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            "total_sec": round(self.total_sec, 3),
+            "speech_sec": round(self.speech_sec, 3),
+            "skipped_ratio": round(self.skipped_ratio, 4),
+            "regions": len(self.regions),
+        }
+
+
+def _frame_features(frames):
+    """フレームごとのエネルギー（dBFS）とスペクトル平坦度を返す"""
+    import numpy as np
+
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    window = np.hanning(frames.shape[1]).astype(np.float32)
+    flatness = np.empty(len(frames), dtype=np.float32)
+    for begin in range(0, len(frames), FFT_BLOCK_FRAMES):
+        block = frames[begin:begin + FFT_BLOCK_FRAMES] * window
+        power = np.abs(np.fft.rfft(block, axis=1)) ** 2 + 1e-10
+        flatness[begin:begin + len(block)] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, flatness
+
+
+def _runs(mask):
+    """真偽配列の True が連続する区間 [(開始, 終了), ...] を返す"""
+    import numpy as np
+
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def detect_speech(audio, sample_rate: int = SAMPLE_RATE, settings: Optional[Dict] = None) -> VadResult:
+    """波形から音声区間を検出する"""
+    import numpy as np
+
+    settings = settings or get_vad_settings()
+    total_sec = len(audio) / sample_rate
+    frame = sample_rate * FRAME_MS // 1000
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return VadResult([], total_sec, 0.0)
+
+    energy_db, flatness = _frame_features(audio[: n_frames * frame].reshape(n_frames, frame))
+
+    # 下位 10% のフレームを雑音レベルとみなし、しきい値を録音ごとに合わせる
+    noise_floor = float(np.percentile(energy_db, 10))
+    threshold = max(settings["threshold_db"], noise_floor + settings["margin_db"])
+    voiced = (energy_db > threshold) & (flatness < settings["flatness"])
+
+    # 短い無音は埋め、短すぎる音声区間は捨てる
+    min_silence = settings["min_silence_ms"] // FRAME_MS
+    for start, end in _runs(~voiced):
+        if start > 0 and end < n_frames and end - start < min_silence:
+            voiced[start:end] = True
+    min_speech = settings["min_speech_ms"] // FRAME_MS
+    pad = settings["pad_ms"] / 1000
+
+    regions: List[SpeechRegion] = []
+    for start, end in _runs(voiced):
+        if end - start < min_speech:
+            continue
+        region_start = max(0.0, start * FRAME_MS / 1000 - pad)
+        region_end = min(total_sec, end * FRAME_MS / 1000 + pad)
+        if regions and region_start <= regions[-1].end:
+            regions[-1] = SpeechRegion(regions[-1].start, region_end)
+        else:
+            regions.append(SpeechRegion(region_start, region_end))
+
+    speech_sec = sum(region.end - region.start for region in regions)
+    return VadResult(regions, total_sec, speech_sec)
+
+
+class TimeMap:
+    """つないだ波形上の時刻 → 元の波形上の時刻 の対応表"""
+
+    def __init__(self):
+        self._joined_starts: List[float] = []
+        self._regions: List[SpeechRegion] = []
+
+    def add(self, joined_start: float, region: SpeechRegion):
+        self._joined_starts.append(joined_start)
+        self._regions.append(region)
+
+    def to_original(self, t: float) -> float:
+        index = max(0, bisect.bisect_right(self._joined_starts, t) - 1)
+        region = self._regions[index]
+        # 区間の間に挟んだ無音の中の時刻は直前の区間の終わりに寄せる
+        return min(region.start + (t - self._joined_starts[index]), region.end)
+
+
+def join_regions(audio, regions: List[SpeechRegion], sample_rate: int = SAMPLE_RATE):
+    """音声区間だけをつないだ波形と、その時刻対応表を返す"""
+    import numpy as np
+
+    gap = np.zeros(int(JOIN_GAP_SEC * sample_rate), dtype=audio.dtype)
+    pieces = []
+    time_map = TimeMap()
+    joined = 0.0
+    for region in regions:
+        piece = audio[int(region.start * sample_rate):int(region.end * sample_rate)]
+        time_map.add(joined, region)
+        pieces.extend((piece, gap))
+        joined += len(piece) / sample_rate + JOIN_GAP_SEC
+    return np.concatenate(pieces[:-1]), time_map
+
+
+def transcribe_speech(model, audio, options: Dict, sample_rate: int = SAMPLE_RATE) -> Dict:
+    """
+    VAD で音声区間だけを Whisper に渡して文字起こしする。
+    結果には元の時間軸のタイムスタンプと、省いた割合（result["vad"]）が入る。
+    """
+    settings = get_vad_settings()
+    if not settings["enabled"]:
+        with metrics.stage("inference"):
+            return model.transcribe(audio, **options)
+
+    with metrics.stage("vad"):
+        vad = detect_speech(audio, sample_rate, settings)
+    summary = vad.summary()
+    print(f"[VAD] 音声区間 {summary['regions']}個 / 省略率 {summary['skipped_ratio']:.1%}"
+          f"（{summary['speech_sec']:.1f}秒 / {summary['total_sec']:.1f}秒）")
+
+    if not vad.regions or vad.skipped_ratio < MIN_SKIP_RATIO:
+        # 音声が見つからない（小さな声の取りこぼし防止）か、省ける部分がほとんどない
+        with metrics.stage("inference"):
+            result = model.transcribe(audio, **options)
+        summary.update(speech_sec=summary["total_sec"], skipped_ratio=0.0)
+        result["vad"] = summary
+        return result
+
+    joined, time_map = join_regions(audio, vad.regions, sample_rate)
+    with metrics.stage("inference"):
+        result = model.transcribe(joined, **options)
+    for segment in result.get("segments", []):
+        segment["start"] = time_map.to_original(segment["start"])
+        segment["end"] = time_map.to_original(segment["end"])
+    result["vad"] = summary
+    return result
+
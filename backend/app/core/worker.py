@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.config import get_job_lease_sec, get_job_poll_sec
+from app.core import metrics
+from app.core.broker import STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, JobBroker
+from app.core.delivery import prepare_rendered
+from app.core.progress import progress_context, progress_hub
+from app.core.search_index import index_job
+from app.core.segment_store import save_segments
+from app.core.storage import get_audio_store
+
+#
+# 推論ワーカー
+#
+# - ブローカーからジョブをリースで確保し、文字起こしして結果を記録する
+# - 実行中のジョブはハートビートでリースを延長する（止まったワーカーのジョブは他のワーカーが再実行する）
+# - API プロセス内（embedded モード）でも、別プロセス（`python -m app.worker`）でも同じものを使う
+#   別プロセスの場合、音声ファイル（AUDIO_DIR）と結果（OUTPUT_DIR）は API と共有されている必要がある
+#
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def run_job(broker: JobBroker, worker_id: str, job: Dict):
+    """確保したジョブを 1 件文字起こしし、結果をブローカーに記録する"""
+    # 循環 import を避けるためここで import する
+    from app.core.transcribe_logic import transcribe_result
+    from app.core.admission import reserve_for_file
+    from app.core.profiles import get_profile
+
+    file_id = job["file_id"]
+    print(f"[Job] 文字起こし開始: {file_id}（worker={worker_id}、{job['attempts']}回目）")
+    progress_hub.publish(file_id, {"status": STATUS_RUNNING, "progress": 0.0})
+
+    def on_update(state):
+        broker.progress(file_id, worker_id, state["progress"])
+
+    try:
+        options = json.loads(job["options"]) if job.get("options") else {}
+        # 同期エンドポイント（JOB_MODE=api）から登録されたジョブはプロファイルも指定している
+        profile = get_profile(options.pop("profile", None))
+        # メモリ予算に空きが出るまでここで待つ（ジョブは既に受け付け済みなので 503 にはしない）
+        with reserve_for_file(job["audio_path"], label=file_id, model_name=profile.model_name), \
+                progress_context(file_id, on_update=on_update) as reporter:
+            result = transcribe_result(job["audio_path"], job["sha256"], options or None, profile)
+        # TXT / JSON / SRT / VTT はダウンロード時にセグメントストアから生成する
+        with metrics.stage("serialize"):
+            stored_path = save_segments(file_id, result)
+    except Exception as e:
+        print(f"[Job] 文字起こし失敗: {file_id}: {e}")
+        if broker.fail(file_id, worker_id, str(e)):
+            progress_hub.publish(file_id, {"status": STATUS_FAILED, "error": str(e)})
+            _archive_audio(job)
+        return
+
+    if not broker.complete(file_id, worker_id, segments_path=stored_path):
+        # リースが切れて他のワーカーに移っている（結果はそちらが記録する）
+        print(f"[Job] リースを失ったため結果を破棄: {file_id}")
+        return
+    progress_hub.publish(file_id, {
+        "status": STATUS_DONE,
+        "progress": 1.0,
+        "decoded_sec": reporter.total_sec,
+        "total_sec": reporter.total_sec,
+        "segments": len(result.get("segments", [])),
+    })
+    print(f"[Job] 文字起こし完了: {file_id}")
+    try:
+        index_job(file_id, stored_path, job["filename"])
+    except Exception as e:
+        # 検索索引は後から `python -m app.core.search_index` で作り直せるのでジョブは失敗にしない
+        print(f"[Job] 検索索引への登録に失敗: {file_id}: {e}")
+    try:
+        # 最初の /api/result を待たせないように配信用ファイル（圧縮した版）を作っておく
+        prepare_rendered(file_id, "result")
+    except Exception as e:
+        print(f"[Job] 配信用ファイルの作成に失敗: {file_id}: {e}")
+    _archive_audio(job)
+
+
+def _archive_audio(job: Dict):
+    """終わったジョブの音声をアーカイブへ移す（音声ストレージ管理外のファイルはそのまま）"""
+    try:
+        get_audio_store().archive(job["audio_path"], job["sha256"])
+    except Exception as e:
+        print(f"[Job] 音声のアーカイブに失敗: {job['file_id']}: {e}")
+
+
+class JobWorker:
+    def __init__(
+        self,
+        broker: JobBroker,
+        concurrency: int,
+        worker_id: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        lease_sec: Optional[float] = None,
+        poll_sec: Optional[float] = None,
+    ):
+        self.broker = broker
+        self.concurrency = concurrency
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_sec = lease_sec or get_job_lease_sec()
+        self.poll_sec = poll_sec or get_job_poll_sec()
+        self._executor = executor or ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job-worker")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # 確保中のジョブ（file_id の集合）
+        self._inflight = set()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        print(f"[Worker] 開始: {self.worker_id}（並列 {self.concurrency}、リース {self.lease_sec:.0f}秒）")
+        for target, name in ((self._dispatch_loop, "job-dispatcher"), (self._heartbeat_loop, "job-heartbeat")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        """新しいジョブが登録されたことを知らせる（ポーリング間隔を待たずに確保しに行く）"""
+        self._wake.set()
+
+    def stop(self, wait: bool = True):
+        """新しいジョブの確保をやめる。wait=True なら実行中のジョブが終わるまで待つ"""
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            while self.inflight:
+                time.sleep(0.1)
+
+    @property
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            job = None
+            if self.inflight < self.concurrency:
+                try:
+                    job = self.broker.claim(self.worker_id, self.lease_sec)
+                except Exception as e:
+                    print(f"[Worker] ジョブの確保に失敗: {e}")
+            if job is None:
+                self._wake.wait(self.poll_sec)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._inflight.add(job["file_id"])
+            self._executor.submit(self._run, job)
+
+    def _run(self, job: Dict):
+        try:
+            run_job(self.broker, self.worker_id, job)
+        except Exception as e:
+            print(f"[Worker] ジョブの実行で予期しないエラー: {job['file_id']}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(job["file_id"])
+            self._wake.set()
+
+    def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_sec / 3)
+        while not (self._stop.is_set() and not self.inflight):
+            time.sleep(interval)
+            with self._lock:
+                file_ids = list(self._inflight)
+            for file_id in file_ids:
+                try:
+                    if not self.broker.heartbeat(file_id, self.worker_id, self.lease_sec):
+                        print(f"[Worker] リースを失いました: {file_id}")
+                except Exception as e:
+                    print(f"[Worker] ハートビートに失敗: {file_id}: {e}")
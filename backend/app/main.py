@@ -1,12 +1,22 @@
 import os
+from app.core.startup import startup_timer, start_background_warmup  # 起動フェーズ計測の起点（最初に読み込む）
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
+startup_timer.mark("import_fastapi")
+
 # --- APIルーターのインポート ---
 # app/api/transcribe_api.py などが存在することを前提
-from app.api import transcribe_api, upload_api, health_api, result_api, status_api, download_api
+# torch / whisper は最初の推論まで読み込まれないので、ここは軽量に保つ
+from app.api import transcribe_api, upload_api, health_api, result_api, status_api, download_api, batch_api, stream_api, progress_api, metrics_api, audio_api, search_api
+from app.core.ingest import is_oversized_request
+from app.core.storage import get_audio_store
+from app.core.job_queue import get_job_queue
+from starlette.concurrency import run_in_threadpool
+startup_timer.mark("import_routers")
 
 app = FastAPI(title="Whisper Transcribe API", version="1.0.0")
 
@@ -27,6 +37,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- アップロードサイズの事前チェック ---
+# 本文を読み込む前に Content-Length で上限超過を 413 で弾く
+@app.middleware("http")
+async def reject_oversized_upload(request: Request, call_next):
+    if is_oversized_request(request.method, request.headers.get("content-length")):
+        return JSONResponse(status_code=413, content={"detail": "ファイルサイズが上限を超えています"})
+    return await call_next(request)
+
 # --- 2. APIルーターの登録 ---
 # APIは "/api" という接頭辞（prefix）でグループ化
 app.include_router(transcribe_api.router, prefix="/api", tags=["transcribe"])
@@ -35,6 +53,12 @@ app.include_router(health_api.router, prefix="/api", tags=["health"])
 app.include_router(result_api.router, prefix="/api", tags=["result"])
 app.include_router(status_api.router, prefix="/api", tags=["status"])
 app.include_router(download_api.router, prefix="/api", tags=["download"])
+app.include_router(batch_api.router, prefix="/api", tags=["batch"])
+app.include_router(stream_api.router, prefix="/api", tags=["stream"])
+app.include_router(progress_api.router, prefix="/api", tags=["progress"])
+app.include_router(metrics_api.router, prefix="/api", tags=["metrics"])
+app.include_router(audio_api.router, prefix="/api", tags=["audio"])
+app.include_router(search_api.router, prefix="/api", tags=["search"])
 
 
 # --- 3. 静的ファイル（Reactアプリ）の配信設定 ---
@@ -65,6 +89,19 @@ else:
             "path_checked": str(frontend_build_path.resolve())
         }
 
+startup_timer.mark("mount_static")
+
+# --- 起動完了：/health が応答可能になった時点を記録し、必要ならウォームアップを開始 ---
+@app.on_event("startup")
+async def on_startup():
+    startup_timer.mark_ready()
+    start_background_warmup()
+    # 音声ストレージの保持期間・容量の整理をバックグラウンドで始める
+    get_audio_store().start_sweeper()
+    # 再起動前に残ったジョブを確認し、embedded モードならワーカーを起動する
+    # （最初のリクエストを待たずに、保存されていた実行待ちのジョブを再開するため）
+    await run_in_threadpool(get_job_queue)
+
 # --- 4. 開発用サーバー起動設定 ---
 if __name__ == "__main__":
     import uvicorn
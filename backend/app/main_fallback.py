@@ -1,10 +1,14 @@
-from fastapi import FastAPI
+from app.core.startup import startup_timer, start_background_warmup
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from pathlib import Path
 
 # APIルーターをインポート
-from app.api import transcribe_api, upload_api, health_api, result_api, status_api, download_api
+from app.api import transcribe_api, upload_api, health_api, result_api, status_api, download_api, batch_api, stream_api, progress_api, metrics_api, audio_api, search_api
+from app.core.ingest import is_oversized_request
+from app.core.storage import get_audio_store
 
 app = FastAPI(title="Whisper Transcribe API", version="1.0.0")
 
@@ -17,6 +21,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 本文を読み込む前に Content-Length で上限超過を 413 で弾く
+@app.middleware("http")
+async def reject_oversized_upload(request: Request, call_next):
+    if is_oversized_request(request.method, request.headers.get("content-length")):
+        return JSONResponse(status_code=413, content={"detail": "ファイルサイズが上限を超えています"})
+    return await call_next(request)
+
 # APIルーターを追加
 app.include_router(transcribe_api.router, prefix="/api", tags=["transcribe"])
 app.include_router(upload_api.router, prefix="/api", tags=["upload"])
@@ -24,6 +35,19 @@ app.include_router(health_api.router, prefix="/api", tags=["health"])
 app.include_router(result_api.router, prefix="/api", tags=["result"])
 app.include_router(status_api.router, prefix="/api", tags=["status"])
 app.include_router(download_api.router, prefix="/api", tags=["download"])
+app.include_router(batch_api.router, prefix="/api", tags=["batch"])
+app.include_router(stream_api.router, prefix="/api", tags=["stream"])
+app.include_router(progress_api.router, prefix="/api", tags=["progress"])
+app.include_router(metrics_api.router, prefix="/api", tags=["metrics"])
+app.include_router(audio_api.router, prefix="/api", tags=["audio"])
+app.include_router(search_api.router, prefix="/api", tags=["search"])
+
+@app.on_event("startup")
+async def on_startup():
+    startup_timer.mark_ready()
+    start_background_warmup()
+    # 音声ストレージの保持期間・容量の整理をバックグラウンドで始める
+    get_audio_store().start_sweeper()
 
 @app.get("/")
 async def root():
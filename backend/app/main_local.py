@@ -1,146 +1,156 @@
-from nicegui import ui, app
+import asyncio
 import os
+import sys
 from os.path import basename
-from backend.app.config import AUDIO_DIR
-from backend.app.core.transcriber import run_transcription_basic
-import threading
-
-uploaded_file = None
-status_label = None
-progress = None
-progress_label = None
-result_box = None
-file_name_label = None
-download_txt_button = None
-download_json_button = None
-
-def transcribe_direct():
-    global uploaded_file, status_label, result_box, progress, progress_label
-    global download_txt_button, download_json_button
-
-    if not uploaded_file:
-        status_label.text = 'ファイルが未選択です'
-        return
-
-    file_path = os.path.join(AUDIO_DIR, uploaded_file.name)
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'wb') as f:
-        f.write(uploaded_file.content.read())
-
-    progress.value = 0.2
-    progress_label.text = '進捗: 20%'
-    status_label.text = '文字起こし中...'
-
-    result = run_transcription_basic(audio_file_path=file_path)
-
-    if isinstance(result, str):
-        status_label.text = f'エラー: {result}'
-        return
-
-    if not isinstance(result, dict) or result.get("status") == "error":
-        status_label.text = result.get("message", "エラーが発生しました")
-        return
-
-    progress.value = 1.0
-    progress_label.text = '進捗: 100%'
-    status_label.text = '完了しました'
-
-    if os.path.exists(result["text_path"]):
-        with open(result["text_path"], "r", encoding="utf-8") as f:
-            result_box.value = f.read()
-
-    download_txt_button.visible = True
-    download_txt_button.on(
-        'click',
-        lambda: ui.download(result["text_path"], filename=basename(result["text_path"]))
-    )
-
-    download_json_button.visible = True
-    download_json_button.on(
-        'click',
-        lambda: ui.download(result["json_path"], filename=basename(result["json_path"]))
-    )
 
-def transcribe_nicegui_ui():
-    global uploaded_file, status_label, progress, progress_label, file_name_label
-    global download_txt_button, download_json_button, result_box
-
-    app.add_static_files('/static', os.path.abspath(os.path.join(os.path.dirname(__file__), '../static')))
+if __package__ in (None, ""):
+    # `python app/main_local.py` で起動した場合も app パッケージを import できるようにする
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# デスクトップアプリは推論スレッド 1 本でモデルを使い回すので、ファイルの合間にモデルを解放しない
+os.environ.setdefault("WHISPER_MODEL_IDLE_SEC", "3600")
+
+from nicegui import Client, app, background_tasks, run, ui
+
+from app.core.ingest import IngestError
+from app.core.job_queue import QueueFullError
+from app.core.local_engine import FINISHED, STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, get_local_engine
+
+#
+# ローカル UI（NiceGUI）
+#
+# - アップロードの保存はスレッドプール（run.io_bound）で行い、UI のイベントループを止めない
+# - 文字起こしは共有のローカル推論エンジン（app.core.local_engine）に順番に任せる
+# - エンジンからの通知は loop.call_soon_threadsafe で UI のループに戻してから画面を書き換える
+#
+
+STATUS_LABELS = {
+    "queued": "待機中",
+    "running": "文字起こし中",
+    STATUS_DONE: "完了",
+    STATUS_FAILED: "エラー",
+    STATUS_CANCELLED: "取り消し",
+}
+
+
+class JobRow:
+    """1 ファイル分の表示（UI のループからだけ触る）"""
+
+    def __init__(self, filename: str, on_cancel, on_show):
+        # job_id はファイルを保存し終わってから決まる
+        self.job_id = None
+        self.state = {}
+        self._on_cancel = on_cancel
+        self._on_show = on_show
+        with ui.card().classes('w-full'):
+            with ui.row().classes('w-full items-center justify-between'):
+                ui.label(filename).classes('font-bold')
+                self.status_label = ui.label('アップロード中...')
+            self.progress = ui.linear_progress(value=0, show_value=False).classes('w-full')
+            with ui.row():
+                self.cancel_button = ui.button('取り消し', on_click=self._cancel).props('flat color=negative')
+                self.show_button = ui.button('結果を表示', on_click=self._show).props('flat')
+                self.txt_button = ui.button('.TXT', on_click=lambda: self._download("text_path")).props('color=primary')
+                self.json_button = ui.button('.JSON', on_click=lambda: self._download("json_path")).props('color=primary')
+        for button in (self.show_button, self.txt_button, self.json_button):
+            button.visible = False
+
+    def _cancel(self):
+        if self.job_id:
+            self._on_cancel(self.job_id)
+
+    async def _show(self):
+        if self.job_id:
+            await self._on_show(self.job_id)
+
+    def _download(self, key: str):
+        path = self.state.get(key)
+        if path:
+            ui.download(path, filename=basename(path))
+
+    def update(self, state: dict):
+        self.state = state
+        status = state["status"]
+        text = STATUS_LABELS.get(status, status)
+        if status == "running":
+            text = f'{text} {state["progress"] * 100:.0f}%'
+        elif status == STATUS_FAILED:
+            text = f'{text}: {state["error"]}'
+        elif status == STATUS_DONE and state.get("elapsed_sec") is not None:
+            text = f'{text}（{state["elapsed_sec"]}秒）'
+        self.status_label.text = text
+        self.progress.value = 1.0 if status == STATUS_DONE else state["progress"]
+        self.cancel_button.visible = status not in FINISHED
+        for button in (self.show_button, self.txt_button, self.json_button):
+            button.visible = status == STATUS_DONE
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@ui.page('/')
+async def index(client: Client):
+    engine = get_local_engine()
+    rows = {}
+
+    async def show_result(job_id: str):
+        path = rows[job_id].state.get("text_path")
+        if path and os.path.exists(path):
+            result_box.value = await run.io_bound(_read_text, path)
+
+    def on_state(state: dict):
+        # UI のループ上で呼ばれる
+        row = rows.get(state["job_id"])
+        if row is None:
+            return
+        row.update(state)
+        if state["status"] == STATUS_DONE:
+            background_tasks.create(show_result(state["job_id"]))
+
+    listener = engine.subscribe(on_state, loop=asyncio.get_running_loop())
+    client.on_disconnect(lambda: engine.unsubscribe(listener))
+
+    async def handle_upload(e):
+        with jobs_column:
+            row = JobRow(e.name, on_cancel=engine.cancel, on_show=show_result)
+        try:
+            # ファイルの保存（と形式の判定）はスレッドプールで行う
+            job = await run.io_bound(engine.submit_stream, e.content, e.name)
+        except (IngestError, QueueFullError) as error:
+            row.status_label.text = f'エラー: {error}'
+            row.cancel_button.visible = False
+            return
+        row.job_id = job.job_id
+        rows[job.job_id] = row
+        # 登録前に届いた通知の分を反映する
+        row.update(job.snapshot())
 
     with ui.column().classes('items-center').style('gap: 20px; max-width: 700px; margin: auto'):
         ui.label('Whisper 文字起こしアプリ').classes('text-2xl font-bold')
         ui.label('① 音声ファイルをアップロードしてください').classes('text-lg font-bold')
-        ui.label('ファイルを選ぶだけでアップロードされます').style('color: gray')
-
-        def handle_upload(e):
-            global uploaded_file
-            uploaded_file = e
-            file_name_label.text = f'選択中のファイル: {uploaded_file.name}'
-            progress.value = 0.0
-            progress_label.text = '進捗: 0%'
-            status_label.text = 'アップロード済み。文字起こし実行を押してください。'
-
-            # Save the uploaded file to AUDIO_DIR
-            file_path = os.path.join(AUDIO_DIR, uploaded_file.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'wb') as f:
-                f.write(uploaded_file.content.read())
-
-            def run_in_background():
-                result = run_transcription_basic(audio_file_path=file_path)
-
-                if isinstance(result, str):
-                    status_label.text = f'エラー: {result}'
-                    return
-
-                if not isinstance(result, dict) or result.get("status") == "error":
-                    status_label.text = result.get("message", "エラーが発生しました")
-                    return
-
-                progress.value = 1.0
-                progress_label.text = '進捗: 100%'
-                status_label.text = '完了しました'
-
-                if os.path.exists(result["text_path"]):
-                    with open(result["text_path"], "r", encoding="utf-8") as f:
-                        result_box.value = f.read()
-
-                download_txt_button.visible = True
-                download_txt_button.on(
-                    'click',
-                    lambda: ui.download(result["text_path"], filename=basename(result["text_path"]))
-                )
-
-                download_json_button.visible = True
-                download_json_button.on(
-                    'click',
-                    lambda: ui.download(result["json_path"], filename=basename(result["json_path"]))
-                )
-
-            threading.Thread(target=run_in_background).start()
+        ui.label('複数のファイルをまとめて選ぶと、順番に文字起こしします').style('color: gray')
 
         ui.upload(
             label='ここをクリックしてファイルを選択',
             on_upload=handle_upload,
             auto_upload=True,
+            multiple=True,
         ).props('color=primary').classes('w-full')
 
-        file_name_label = ui.label('選択中のファイル: なし').classes('text-sm')
-        # ui.button('文字起こしを実行', on_click=transcribe_direct)  # 処理二重化防止のためボタンをコメントアウト
-
-        status_label = ui.label('ステータス: 未実行')
-        progress_label = ui.label('進捗: 0%')
-        progress = ui.linear_progress().props('value=0').style('width: 100%; max-width: 600px')
-
-        download_txt_button = ui.button('文字起こし（.TXT）をダウンロード').props('color=primary')
-        download_txt_button.visible = False
-
-        download_json_button = ui.button('文字起こし（.JSON）をダウンロード').props('color=primary')
-        download_json_button.visible = False
-
+        jobs_column = ui.column().classes('w-full')
         result_box = ui.textarea().style('border: none; box-shadow: none; width: 100%; height: 300px')
 
+
+def transcribe_nicegui_ui():
+    app.add_static_files('/static', os.path.abspath(os.path.join(os.path.dirname(__file__), '../static')))
+    engine = get_local_engine()
+    # 最初のファイルを待たせないように、起動時にモデルを読み込んでおく
+    app.on_startup(engine.warm_up)
+    app.on_shutdown(lambda: engine.stop(wait=False))
     ui.run()
 
+
 if __name__ in {'__main__', '__mp_main__'}:
-    transcribe_nicegui_ui()
\ No newline at end of file
+    transcribe_nicegui_ui()
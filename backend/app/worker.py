@@ -0,0 +1,47 @@
+import argparse
+import signal
+import threading
+
+from app.config import JOB_DB_PATH, get_job_lease_sec, get_job_workers
+from app.core.broker import create_broker
+from app.core.job_queue import JobStore
+from app.core.worker import JobWorker
+
+#
+# 推論ワーカー（単体プロセス）
+#
+# - JOB_MODE=api で起動した API サーバーが登録したジョブを処理する
+# - 複数台で動かす場合、JOB_DB_PATH・AUDIO_DIR・OUTPUT_DIR は API と共有する（同一ホストか共有ボリューム）
+#
+# 使い方: python -m app.worker --concurrency 2
+#
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こしジョブを処理する推論ワーカー")
+    parser.add_argument("--concurrency", type=int, default=None, help="同時に処理するジョブ数（デフォルト: JOB_WORKERS）")
+    parser.add_argument("--worker-id", default=None, help="ワーカー ID（デフォルト: ホスト名:PID:乱数）")
+    parser.add_argument("--lease", type=float, default=None, help="ジョブのリース期間（秒、デフォルト: JOB_LEASE_SEC）")
+    args = parser.parse_args()
+
+    store = JobStore(JOB_DB_PATH)
+    worker = JobWorker(
+        create_broker(store),
+        concurrency=args.concurrency or get_job_workers(),
+        worker_id=args.worker_id,
+        lease_sec=args.lease or get_job_lease_sec(),
+    )
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+
+    worker.start()
+    stopped.wait()
+    print(f"[Worker] 停止中: 実行中のジョブ {worker.inflight}件の完了を待ちます")
+    worker.stop(wait=True)
+    print("[Worker] 停止しました")
+
+
+if __name__ == "__main__":
+    main()
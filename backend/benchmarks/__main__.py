@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict
+
+from app.config import get_backend_name, get_model_name
+from benchmarks.fixtures import describe, ensure_fixtures
+from benchmarks.load import LocalServer, run_load
+from benchmarks.stages import run_stages
+
+#
+# ベンチマークの実行と比較
+#
+#   cd backend
+#   python -m benchmarks run --fixtures speech_10s,speech_60s --output bench/HEAD.json
+#   python -m benchmarks run --fixtures speech_10s --no-stages --load --concurrency 1,2,4
+#   python -m benchmarks compare bench/base.json bench/HEAD.json --threshold 0.1
+#
+# 結果 JSON の "metrics" は "stage.<fixture>.<段階>.median_sec" のような平坦なキーにしてあり、
+# コミット間でそのまま diff / compare できる
+#
+
+DEFAULT_FIXTURES = "speech_10s,speech_60s,noise_10s"
+# 性能ではなく入力の性質を表す指標（比較では悪化と判定しない）
+INFORMATIONAL_METRICS = ("segments", "speech_ratio")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def flatten_metrics(stages: Dict, loads) -> Dict[str, float]:
+    metrics = {}
+    for fixture_name, fixture_stages in stages.items():
+        for stage, values in fixture_stages.items():
+            for name, value in values.items():
+                if isinstance(value, (int, float)) and name != "runs":
+                    metrics[f"stage.{fixture_name}.{stage}.{name}"] = value
+    for load in loads:
+        prefix = f"load.{load['endpoint']}.{load['fixture']}.c{load['concurrency']}"
+        for name in ("p50_sec", "p95_sec", "p99_sec", "requests_per_sec", "audio_sec_per_sec", "errors"):
+            if name in load:
+                metrics[f"{prefix}.{name}"] = load[name]
+    return dict(sorted(metrics.items()))
+
+
+def command_run(args):
+    fixtures = ensure_fixtures([name.strip() for name in args.fixtures.split(",") if name.strip()])
+    stages = {}
+    if not args.no_stages:
+        stages = run_stages(
+            fixtures, repeat=args.repeat, with_model=not args.no_model, backend_name=args.backend, model_name=args.model
+        )
+
+    loads = []
+    if args.load:
+        concurrencies = [int(value) for value in args.concurrency.split(",")]
+        if args.url:
+            loads = [
+                run_load(fixture, c, args.requests or c * 2, args.url, args.endpoint, not args.no_unique)
+                for fixture in fixtures for c in concurrencies
+            ]
+        else:
+            env = {"WHISPER_BACKEND": args.backend or get_backend_name(), "WHISPER_MODEL": args.model or get_model_name()}
+            with LocalServer(env) as server:
+                loads = [
+                    run_load(fixture, c, args.requests or c * 2, server.url, args.endpoint, not args.no_unique)
+                    for fixture in fixtures for c in concurrencies
+                ]
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model or get_model_name(),
+            "backend": args.backend or get_backend_name(),
+            "memory_limit_mb": os.getenv("MEMORY_LIMIT_MB", "256"),
+        },
+        "fixtures": describe(fixtures),
+        "stages": stages,
+        "load": loads,
+        "metrics": flatten_metrics(stages, loads),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[Bench] 結果を保存しました: {args.output}")
+    else:
+        print(text)
+
+
+def _higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec")
+
+
+def command_compare(args):
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)["metrics"]
+    with open(args.head, "r", encoding="utf-8") as f:
+        head = json.load(f)["metrics"]
+
+    regressions = []
+    print(f"{'metric':<60}{'base':>12}{'head':>12}{'change':>9}")
+    for metric in sorted(set(base) & set(head)):
+        before, after = base[metric], head[metric]
+        if not before:
+            continue
+        change = (after - before) / abs(before)
+        worse = -change if _higher_is_better(metric) else change
+        flag = ""
+        if worse > args.threshold and metric.split(".")[-1] not in INFORMATIONAL_METRICS:
+            flag = "  ← 悪化"
+            regressions.append(metric)
+        print(f"{metric:<60}{before:>12.4g}{after:>12.4g}{change:>+8.1%}{flag}")
+    for metric in sorted(set(base) ^ set(head)):
+        print(f"{metric:<60}（片方の結果にのみ存在）")
+
+    if regressions:
+        print(f"\n[Bench] {len(regressions)} 件の指標が {args.threshold:.0%} 以上悪化しました")
+        sys.exit(1)
+    print("\n[Bench] 悪化した指標はありません")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="文字起こしパイプラインのベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="ベンチマークを実行して JSON を出力する")
+    run.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="種類_長さ（例: speech_10s,tone_10m,noise_60m）")
+    run.add_argument("--repeat", type=int, default=3, help="段階ごとの繰り返し回数（中央値を使う）")
+    run.add_argument("--no-stages", action="store_true", help="段階別の計測を行わない")
+    run.add_argument("--no-model", action="store_true", help="モデル読み込みと推論を計測しない")
+    run.add_argument("--backend", default=None, help="推論バックエンド（デフォルト: WHISPER_BACKEND）")
+    run.add_argument("--model", default=None, help="モデル名（デフォルト: WHISPER_MODEL）")
+    run.add_argument("--load", action="store_true", help="HTTP 経由の負荷試験を行う")
+    run.add_argument("--url", default=None, help="負荷試験の対象 URL（省略時は app.main:app を起動する）")
+    run.add_argument("--endpoint", choices=("transcribe", "upload"), default="transcribe")
+    run.add_argument("--concurrency", default="1,2", help="同時実行数（カンマ区切り）")
+    run.add_argument("--requests", type=int, default=None, help="同時実行数ごとのリクエスト数（デフォルト: 同時実行数×2）")
+    run.add_argument("--no-unique", action="store_true", help="同じ内容を送る（結果キャッシュの効果を測る）")
+    run.add_argument("--output", default=None, help="結果を書き出す JSON ファイル")
+    run.set_defaults(func=command_run)
+
+    compare = sub.add_parser("compare", help="2 つの結果 JSON を比較し、悪化があれば終了コード 1")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--threshold", type=float, default=0.1, help="悪化とみなす変化率（デフォルト: 0.1）")
+    compare.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Optional, Sequence
+
+from app.config import AUDIO_EXTENSIONS, get_model_name
+from app.core.audio_preprocess import SAMPLE_RATE, decode_audio
+from app.core.backends import BACKENDS, get_backend
+from app.core.transcribe_logic import TRANSCRIBE_OPTIONS
+
+#
+# 推論バックエンドの精度・速度比較
+#
+#   cd backend && python -m benchmarks.compare_backends data/bench --backends whisper,whisper-int8
+#
+# - 音声と同じ名前の .txt があれば正解テキストとして CER / WER を計算する
+#   （無ければ最初のバックエンドの出力を基準にした一致率になる）
+# - 音声は 1 回だけデコードし、各バックエンドに同じ波形を渡す（VAD は使わない）
+# - 処理時間は --repeat 回の中央値、実時間比（RTF）は 処理時間 / 音声長
+#
+
+
+def edit_distance(reference: Sequence, hypothesis: Sequence) -> int:
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_item in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_item in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_item != hyp_item),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def error_rate(reference: Sequence, hypothesis: Sequence) -> float:
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return edit_distance(reference, hypothesis) / len(reference)
+
+
+def cer(reference: str, hypothesis: str) -> float:
+    """文字誤り率（日本語向けに空白を除いて比較する）"""
+    return error_rate("".join(reference.split()), "".join(hypothesis.split()))
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    """単語誤り率（空白区切り。日本語では参考値）"""
+    return error_rate(reference.split(), hypothesis.split())
+
+
+def collect_inputs(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def read_reference(audio_path: str) -> Optional[str]:
+    reference_path = os.path.splitext(audio_path)[0] + ".txt"
+    if not os.path.exists(reference_path):
+        return None
+    with open(reference_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def run_backend(name: str, model_name: str, samples: List[Dict], repeat: int) -> Dict:
+    backend = get_backend(name)
+    print(f"[Bench] {name}: モデル読み込み中（{model_name}）")
+    started = time.perf_counter()
+    model = backend.load(model_name, device="cpu")
+    load_sec = time.perf_counter() - started
+
+    files = []
+    for sample in samples:
+        timings = []
+        text = ""
+        for _ in range(repeat):
+            started = time.perf_counter()
+            text = model.transcribe(sample["audio"], **TRANSCRIBE_OPTIONS)["text"].strip()
+            timings.append(time.perf_counter() - started)
+        elapsed = statistics.median(timings)
+        files.append({
+            "file": sample["name"],
+            "audio_sec": round(sample["duration"], 2),
+            "elapsed_sec": round(elapsed, 3),
+            "rtf": round(elapsed / sample["duration"], 4) if sample["duration"] else None,
+            "text": text,
+        })
+        print(f"[Bench] {name}: {sample['name']} {elapsed:.2f}秒")
+
+    del model
+    gc.collect()
+    total_audio = sum(item["audio_sec"] for item in files)
+    total_elapsed = sum(item["elapsed_sec"] for item in files)
+    return {
+        "backend": name,
+        "load_sec": round(load_sec, 3),
+        "audio_sec": round(total_audio, 2),
+        "elapsed_sec": round(total_elapsed, 3),
+        "rtf": round(total_elapsed / total_audio, 4) if total_audio else None,
+        "files": files,
+    }
+
+
+def score(runs: List[Dict], samples: List[Dict]):
+    """正解テキスト（無ければ最初のバックエンドの出力）に対する CER / WER を付ける"""
+    baseline = runs[0]["files"]
+    for run in runs:
+        cers, wers = [], []
+        for index, item in enumerate(run["files"]):
+            reference = samples[index]["reference"]
+            item["reference"] = "file" if reference is not None else f"backend:{runs[0]['backend']}"
+            if reference is None:
+                reference = baseline[index]["text"]
+            item["cer"] = round(cer(reference, item["text"]), 4)
+            item["wer"] = round(wer(reference, item["text"]), 4)
+            cers.append(item["cer"])
+            wers.append(item["wer"])
+        run["cer"] = round(statistics.mean(cers), 4) if cers else None
+        run["wer"] = round(statistics.mean(wers), 4) if wers else None
+
+
+def print_table(runs: List[Dict]):
+    baseline_elapsed = runs[0]["elapsed_sec"]
+    print(f"{'backend':<16}{'load(s)':>9}{'infer(s)':>10}{'RTF':>8}{'speedup':>9}{'CER':>8}{'WER':>8}")
+    for run in runs:
+        speedup = baseline_elapsed / run["elapsed_sec"] if run["elapsed_sec"] else 0.0
+        print(
+            f"{run['backend']:<16}{run['load_sec']:>9.2f}{run['elapsed_sec']:>10.2f}"
+            f"{run['rtf'] or 0:>8.3f}{speedup:>8.2f}x{run['cer']:>8.3f}{run['wer']:>8.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推論バックエンドごとの精度（CER/WER）と速度を比較する")
+    parser.add_argument("inputs", nargs="+", help="音声ファイルまたはディレクトリ（同名の .txt を正解として使う）")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="比較するバックエンド（カンマ区切り）")
+    parser.add_argument("--model", default=None, help="モデル名（デフォルト: WHISPER_MODEL）")
+    parser.add_argument("--repeat", type=int, default=1, help="ファイルごとの繰り返し回数（中央値を使う）")
+    parser.add_argument("--threads", type=int, default=None, help="torch のスレッド数")
+    parser.add_argument("--output", default=None, help="結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    model_name = args.model or get_model_name()
+    files = collect_inputs(args.inputs)
+    if not files:
+        raise SystemExit("音声ファイルが見つかりません")
+
+    samples = []
+    for path in files:
+        audio = decode_audio(path)
+        samples.append({
+            "name": os.path.basename(path),
+            "audio": audio,
+            "duration": len(audio) / SAMPLE_RATE,
+            "reference": read_reference(path),
+        })
+
+    runs = [run_backend(name.strip(), model_name, samples, max(1, args.repeat)) for name in args.backends.split(",")]
+    score(runs, samples)
+    print_table(runs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": model_name, "runs": runs}, f, ensure_ascii=False, indent=2)
+        print(f"[Bench] 結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import wave
+from typing import Dict, List, NamedTuple
+
+from app.config import BASE_DIR
+
+#
+# ベンチマーク用の合成音声
+#
+# - 16kHz / モノラル / 16bit の WAV を乱数シード固定で生成する（同じ名前なら毎回同じ内容）
+# - tone: 正弦波 / noise: 白色雑音 / speech: 音声に似た信号（基本周波数が揺れる倍音＋音節ごとの包絡＋無音の間）
+# - 60 分などの長い音声もメモリを使い切らないよう 10 秒ずつ書き出す
+#
+
+SAMPLE_RATE = 16000
+FIXTURE_DIR = os.path.join(BASE_DIR, "data/bench/fixtures")
+_BLOCK_SEC = 10
+
+KINDS = ("tone", "noise", "speech")
+
+# 名前 → 秒数
+DURATIONS = {
+    "10s": 10,
+    "60s": 60,
+    "10m": 600,
+    "60m": 3600,
+}
+
+
+class Fixture(NamedTuple):
+    name: str
+    kind: str
+    duration: float
+    path: str
+
+
+def _tone(np, rng, t):
+    return 0.3 * np.sin(2 * np.pi * 440.0 * t)
+
+
+def _noise(np, rng, t):
+    return 0.1 * rng.standard_normal(len(t))
+
+
+def _speech(np, rng, t):
+    # 0.15〜0.35 秒の「音節」を並べ、ときどき 0.3〜1.2 秒の間を入れる
+    signal = np.zeros(len(t))
+    pos = 0
+    while pos < len(t):
+        if rng.random() < 0.15:
+            pos += int(rng.uniform(0.3, 1.2) * SAMPLE_RATE)
+            continue
+        length = min(int(rng.uniform(0.15, 0.35) * SAMPLE_RATE), len(t) - pos)
+        local = t[pos:pos + length]
+        f0 = rng.uniform(110, 240) * (1 + 0.05 * np.sin(2 * np.pi * 3 * (local - local[0])))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+        envelope = np.hanning(length)
+        signal[pos:pos + length] = 0.25 * voiced * envelope
+        pos += length
+    return signal + 0.003 * rng.standard_normal(len(t))
+
+
+_GENERATORS = {"tone": _tone, "noise": _noise, "speech": _speech}
+
+
+def fixture_name(kind: str, duration_name: str) -> str:
+    return f"{kind}_{duration_name}"
+
+
+def generate(kind: str, duration: float, path: str, seed: int = 0):
+    """合成音声を WAV として書き出す"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    generator = _GENERATORS[kind]
+    total = int(duration * SAMPLE_RATE)
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(tmp_path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        for start in range(0, total, _BLOCK_SEC * SAMPLE_RATE):
+            count = min(_BLOCK_SEC * SAMPLE_RATE, total - start)
+            t = (start + np.arange(count)) / SAMPLE_RATE
+            block = np.clip(generator(np, rng, t), -1.0, 1.0)
+            wav.writeframes((block * 32767).astype("<i2").tobytes())
+    os.replace(tmp_path, path)
+
+
+def ensure_fixtures(names: List[str], fixture_dir: str = FIXTURE_DIR) -> List[Fixture]:
+    """"speech_60s" のような名前の一覧から、無ければ生成してフィクスチャを返す"""
+    fixtures = []
+    for name in names:
+        kind, _, duration_name = name.partition("_")
+        if kind not in _GENERATORS or duration_name not in DURATIONS:
+            raise ValueError(f"不明なフィクスチャです: {name}（例: speech_60s / tone_10m / noise_10s）")
+        duration = DURATIONS[duration_name]
+        path = os.path.join(fixture_dir, f"{name}.wav")
+        if not os.path.exists(path):
+            print(f"[Bench] フィクスチャ生成: {name}")
+            generate(kind, duration, path, seed=KINDS.index(kind) * 1000 + duration)
+        fixtures.append(Fixture(name, kind, float(duration), path))
+    return fixtures
+
+
+def describe(fixtures: List[Fixture]) -> Dict:
+    return {fixture.name: {"kind": fixture.kind, "duration_sec": fixture.duration} for fixture in fixtures}
@@ -0,0 +1,170 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from benchmarks.fixtures import Fixture
+
+#
+# HTTP 経由のエンドツーエンド負荷試験
+#
+# - --url を指定しなければ app.main:app を uvicorn で別プロセスとして起動して計測する
+# - endpoint=transcribe: POST /api/transcribe の応答までの時間
+#   endpoint=upload    : POST /api/upload → /api/status が done になるまでの時間
+# - 結果キャッシュに当たらないよう、リクエストごとに WAV の末尾へ異なるバイト列を付ける（--no-unique で無効）
+#
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POLL_INTERVAL_SEC = 0.2
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(url: str, timeout: float = 10.0) -> Dict:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class LocalServer:
+    """計測用に uvicorn を起動し、/api/health が応答するまで待つ"""
+
+    def __init__(self, env: Optional[Dict] = None):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._env = {**os.environ, **(env or {})}
+        self._process = None
+
+    def __enter__(self) -> "LocalServer":
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port)],
+            cwd=BACKEND_DIR,
+            env=self._env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("uvicorn が起動直後に終了しました")
+            try:
+                _get_json(f"{self.url}/api/health", timeout=1.0)
+                return self
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("uvicorn の起動待ちがタイムアウトしました")
+
+    def __exit__(self, *exc):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+
+def _multipart(filename: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _post_file(url: str, filename: str, data: bytes, timeout: float) -> Dict:
+    body, content_type = _multipart(filename, data)
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _one_request(base_url: str, endpoint: str, fixture: Fixture, data: bytes, timeout: float) -> Dict:
+    started = time.perf_counter()
+    try:
+        if endpoint == "upload":
+            file_id = _post_file(f"{base_url}/api/upload", os.path.basename(fixture.path), data, timeout)["file_id"]
+            deadline = time.monotonic() + timeout
+            while True:
+                status = _get_json(f"{base_url}/api/status/{file_id}")
+                if status["status"] in ("done", "failed"):
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError("ジョブの完了待ちがタイムアウトしました")
+                time.sleep(POLL_INTERVAL_SEC)
+            ok = status["status"] == "done"
+            error = status.get("error")
+        else:
+            _post_file(f"{base_url}/api/transcribe", os.path.basename(fixture.path), data, timeout)
+            ok, error = True, None
+    except urllib.error.HTTPError as e:
+        ok, error = False, f"HTTP {e.code}"
+    except Exception as e:
+        ok, error = False, str(e)
+    return {"ok": ok, "elapsed_sec": time.perf_counter() - started, "error": error}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_load(
+    fixture: Fixture,
+    concurrency: int,
+    requests: int,
+    base_url: str,
+    endpoint: str = "transcribe",
+    unique: bool = True,
+    timeout: float = 600.0,
+) -> Dict:
+    """同時実行数 concurrency で requests 件のリクエストを投げ、レイテンシとスループットを返す"""
+    with open(fixture.path, "rb") as f:
+        payload = f.read()
+    bodies = [payload + (uuid.uuid4().bytes if unique else b"") for _ in range(requests)]
+    print(f"[Bench] 負荷試験: {fixture.name} × {requests}件 / 同時 {concurrency}（{endpoint}）")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda body: _one_request(base_url, endpoint, fixture, body, timeout), bodies))
+    wall = time.perf_counter() - started
+
+    latencies = [outcome["elapsed_sec"] for outcome in outcomes if outcome["ok"]]
+    errors = [outcome["error"] for outcome in outcomes if not outcome["ok"]]
+    summary = {
+        "fixture": fixture.name,
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "wall_sec": round(wall, 3),
+        "requests_per_sec": round(len(latencies) / wall, 4) if wall else 0.0,
+        # 壁時計 1 秒あたりに処理できた音声の秒数
+        "audio_sec_per_sec": round(len(latencies) * fixture.duration / wall, 4) if wall else 0.0,
+    }
+    if latencies:
+        summary.update(
+            p50_sec=round(_percentile(latencies, 0.5), 3),
+            p95_sec=round(_percentile(latencies, 0.95), 3),
+            p99_sec=round(_percentile(latencies, 0.99), 3),
+            mean_sec=round(statistics.mean(latencies), 3),
+        )
+    if errors:
+        summary["error_samples"] = sorted(set(errors))[:5]
+    return summary
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.config import get_model_name, get_vad_settings
+from app.core.audio_preprocess import decode_audio, trim_leading_silence
+from app.core.ingest import ingest_upload
+from app.core.segment_store import RENDERERS, SegmentStore
+from benchmarks.fixtures import Fixture
+
+#
+# パイプラインの段階ごとの計測
+#
+#   ingest    : アップロードの取り込み（ハッシュ計算・形式判定・一時ファイルへの書き出し）
+#   decode    : ffmpeg による 16kHz PCM へのデコード
+#   silence   : 先頭の無音除去＋VAD による音声区間検出
+#   model_load: バックエンドによるモデルのコールドロード（プールを通さない）
+#   inference : VAD 付きの推論
+#   serialize : セグメントストアの保存と TXT / JSON / SRT / VTT の生成
+#
+
+
+class _FileUpload:
+    """ingest_upload に渡すための UploadFile 相当（ディスク上のファイルを読むだけ）"""
+
+    def __init__(self, path: str):
+        self.filename = os.path.basename(path)
+        self.size = os.path.getsize(path)
+        self._file = open(path, "rb")
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+def _measure(fn: Callable, repeat: int) -> Dict:
+    timings = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_sec": round(statistics.median(timings), 4),
+        "min_sec": round(min(timings), 4),
+        "runs": len(timings),
+    }, value
+
+
+def _ingest(path: str, work_dir: str):
+    upload = _FileUpload(path)
+    try:
+        return asyncio.run(ingest_upload(upload, work_dir, "bench"))
+    finally:
+        upload.close()
+
+
+def _remove_silence(audio, settings: Dict):
+    from app.core.vad import detect_speech
+
+    trimmed, _offset = trim_leading_silence(audio)
+    return trimmed, detect_speech(trimmed, settings=settings)
+
+
+def _serialize(result: Dict, work_dir: str):
+    store = SegmentStore.from_result(result)
+    store.save(os.path.join(work_dir, "bench.segments"))
+    for renderer, _media_type, _ext in RENDERERS.values():
+        for _chunk in renderer(store, "bench"):
+            pass
+
+
+def run_stages(
+    fixtures: List[Fixture],
+    repeat: int = 3,
+    with_model: bool = True,
+    backend_name: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> Dict:
+    """フィクスチャごとに各段階の所要時間を測り、{フィクスチャ名: {段階: 計測値}} を返す"""
+    from app.core.vad import transcribe_speech
+    from app.core.transcribe_logic import TRANSCRIBE_OPTIONS
+
+    model_name = model_name or get_model_name()
+    work_dir = tempfile.mkdtemp(prefix="whisper-bench-")
+    results: Dict[str, Dict] = {}
+    model = None
+    try:
+        if with_model:
+            from app.core.backends import get_backend
+
+            backend = get_backend(backend_name)
+            load_stats, model = _measure(lambda: backend.load(model_name, device="cpu"), 1)
+            results["_model"] = {"model_load": {**load_stats, "model": model_name, "backend": backend.name}}
+
+        for fixture in fixtures:
+            print(f"[Bench] 段階別計測: {fixture.name}")
+            stages = {}
+            stages["ingest"], _ = _measure(lambda: _ingest(fixture.path, work_dir), repeat)
+            stages["decode"], audio = _measure(lambda: decode_audio(fixture.path), repeat)
+            stages["silence"], (trimmed, vad) = _measure(lambda: _remove_silence(audio, get_vad_settings()), repeat)
+            stages["silence"]["speech_ratio"] = round(1.0 - vad.skipped_ratio, 4)
+
+            if model is not None:
+                # 推論は重いので 1 回だけ
+                stages["inference"], result = _measure(lambda: transcribe_speech(model, trimmed, TRANSCRIBE_OPTIONS), 1)
+                stages["inference"]["rtf"] = round(stages["inference"]["median_sec"] / fixture.duration, 4)
+            else:
+                # モデル無しでもシリアライズは測れるよう、VAD の区間からダミーのセグメントを作る
+                result = {
+                    "language": "ja",
+                    "segments": [
+                        {"start": region.start, "end": region.end, "text": "合成音声のセグメント"}
+                        for region in vad.regions
+                    ],
+                }
+            stages["serialize"], _ = _measure(lambda: _serialize(result, work_dir), repeat)
+            stages["serialize"]["segments"] = len(result.get("segments", []))
+            results[fixture.name] = stages
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
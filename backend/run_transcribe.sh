@@ -3,11 +3,12 @@
 # 仮想環境を有効化
 source /Users/yg/projects/whisper_diarization/whisper_env/bin/activate
 
-# プロジェクトディレクトリに移動
-cd /Users/yg/projects/whisper_transcribe
+# バックエンドディレクトリに移動
+cd /Users/yg/projects/whisper_transcribe/backend
 
-# スクリプトを実行
-python3 app/whisper_transcribe.py
+# AUDIO_DIR（引数で上書き可）の音声をバッチで文字起こし
+# 途中で止めても同じコマンドでチェックポイントから再開できる
+python3 -m app.core.batch "${1:-data/audio}" "${@:2}"
 
 # 仮想環境を無効化
-deactivate
\ No newline at end of file
+deactivate
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejectedError, DEFAULT_RETRY_AFTER_SEC
+
+
+def _acquire_in_thread(controller, memory_mb, label, results):
+    def run():
+        try:
+            results.append(controller.acquire(memory_mb, label, timeout=5))
+        except AdmissionRejectedError as e:
+            results.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for_waiting(controller, count):
+    deadline = time.monotonic() + 5
+    while len(controller.snapshot()["waiting"]) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_requests_within_budget_are_admitted_together():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    first = controller.acquire(40, "a")
+    second = controller.acquire(60, "b")
+
+    snapshot = controller.snapshot()
+    assert snapshot["reserved_mb"] == 100
+    assert [item["label"] for item in snapshot["active"]] == ["a", "b"]
+    first.release()
+    second.release()
+    assert controller.snapshot()["reserved_mb"] == 0
+
+
+def test_oversized_request_is_admitted_when_idle():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    with controller.acquire(500, "large"):
+        assert controller.snapshot()["reserved_mb"] == 500
+
+
+def test_waiting_request_is_admitted_on_release():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    first = controller.acquire(80, "a")
+    results = []
+    thread = _acquire_in_thread(controller, 50, "b", results)
+    _wait_for_waiting(controller, 1)
+
+    first.release()
+    thread.join(5)
+    assert results[0].label == "b"
+    assert controller.snapshot()["queued"] == 1
+    results[0].release()
+
+
+def test_waiters_are_admitted_in_order():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    first = controller.acquire(90, "a")
+    results = []
+    threads = [_acquire_in_thread(controller, 80, "b", results)]
+    _wait_for_waiting(controller, 1)
+    # 後から来た小さなリクエストも、先に待っているものを追い越さない
+    threads.append(_acquire_in_thread(controller, 5, "c", results))
+    _wait_for_waiting(controller, 2)
+
+    first.release()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(reservation.label for reservation in results) == ["b", "c"]
+    assert controller.snapshot()["reserved_mb"] == 85
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(budget_mb=100, max_waiting=1)
+    first = controller.acquire(100, "a")
+    results = []
+    thread = _acquire_in_thread(controller, 50, "b", results)
+    _wait_for_waiting(controller, 1)
+
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire(50, "c", timeout=5)
+    assert error.value.retry_after == DEFAULT_RETRY_AFTER_SEC
+    with pytest.raises(AdmissionRejectedError):
+        controller.check_capacity()
+    assert controller.snapshot()["rejected"] == 2
+
+    first.release()
+    thread.join(5)
+    results[0].release()
+
+
+def test_wait_timeout_withdraws_the_request():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    first = controller.acquire(100, "a")
+    with pytest.raises(AdmissionRejectedError):
+        controller.acquire(50, "b", timeout=0.05)
+
+    snapshot = controller.snapshot()
+    assert (snapshot["waiting"], snapshot["timeouts"]) == ([], 1)
+    first.release()
+    assert controller.snapshot()["active"] == []
+
+
+def test_release_is_idempotent():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    reservation = controller.acquire(60, "a")
+    reservation.release()
+    reservation.release()
+    other = controller.acquire(100, "b")
+
+    assert controller.snapshot()["reserved_mb"] == 100
+    other.release()
+
+
+def test_try_acquire_does_not_queue():
+    controller = AdmissionController(budget_mb=100, max_waiting=2)
+    first = controller.try_acquire(80, "stream")
+    with pytest.raises(AdmissionRejectedError):
+        controller.try_acquire(50, "stream")
+
+    assert controller.snapshot()["waiting"] == []
+    first.release()
+    controller.try_acquire(50, "stream").release()
+
+
+def test_reservation_uses_the_profile_model(monkeypatch):
+    from app.core import admission
+
+    controller = AdmissionController(budget_mb=100000, max_waiting=2)
+    monkeypatch.setattr(admission, "get_admission_controller", lambda: controller)
+    monkeypatch.setattr(admission, "estimate_duration", lambda path: 10.0)
+
+    with admission.reserve_for_file("a.wav", model_name="tiny") as small, \
+            admission.reserve_for_file("a.wav", model_name="medium") as large:
+        assert small.memory_mb == pytest.approx(admission.estimate_memory_mb(10.0, "tiny"))
+        assert large.memory_mb == pytest.approx(admission.estimate_memory_mb(10.0, "medium"))
+        assert large.memory_mb > small.memory_mb
@@ -0,0 +1,104 @@
+import os
+import time
+
+from app.core import audio_index
+from app.core.audio_index import AudioIndex
+
+
+def _write(path, body=b"audio", age_sec=0.0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+    if age_sec:
+        past = time.time() - age_sec
+        os.utime(path, (past, past))
+
+
+def _pin_dir_mtime(path):
+    # ファイルを書いてもディレクトリの mtime が変わらない（その場での上書きと同じ）状態にする
+    os.utime(path, (1000000000, 1000000000))
+
+
+def test_unchanged_directories_are_not_rescanned(tmp_path):
+    _write(str(tmp_path / "a.wav"), age_sec=3600)
+    _write(str(tmp_path / "sub" / "b.wav"), age_sec=1800)
+    index = AudioIndex(str(tmp_path), refresh_sec=0)
+
+    assert os.path.basename(index.latest().path) == "b.wav"
+    scans = index.scans
+    index.refresh(force=True)
+    assert index.scans == scans
+
+    _write(str(tmp_path / "sub" / "c.wav"))
+    assert os.path.basename(index.latest().path) == "c.wav"
+    assert index.scans == scans + 1
+
+
+def test_old_files_are_not_restatted_on_refresh(tmp_path, monkeypatch):
+    path = str(tmp_path / "a.wav")
+    _write(path, age_sec=3600)
+    index = AudioIndex(str(tmp_path), refresh_sec=0)
+    index.refresh()
+
+    statted = []
+    real_stat = os.stat
+    monkeypatch.setattr(audio_index.os, "stat", lambda p, *a, **k: statted.append(p) or real_stat(p, *a, **k))
+    index.refresh(force=True)
+
+    assert path not in statted
+
+
+def test_recent_overwrite_is_picked_up(tmp_path):
+    path = str(tmp_path / "a.wav")
+    _write(path, age_sec=5)
+    _pin_dir_mtime(str(tmp_path))
+    index = AudioIndex(str(tmp_path), refresh_sec=0)
+    index.refresh()
+
+    # その場で上書き（ディレクトリの mtime は変わらない）
+    _write(path, b"longer audio")
+    _pin_dir_mtime(str(tmp_path))
+
+    assert index.latest().size == len(b"longer audio")
+
+
+def test_invalidate_picks_up_an_old_overwrite(tmp_path):
+    path = str(tmp_path / "a.wav")
+    _write(path, age_sec=3600)
+    _pin_dir_mtime(str(tmp_path))
+    index = AudioIndex(str(tmp_path), refresh_sec=0)
+    index.refresh()
+
+    _write(path, b"longer audio", age_sec=1800)
+    _pin_dir_mtime(str(tmp_path))
+    assert index.latest().size == len(b"audio")
+
+    index.invalidate(path)
+    assert index.latest().size == len(b"longer audio")
+
+
+def test_invalidate_rescans_the_directory_of_a_new_file(tmp_path):
+    _write(str(tmp_path / "a.wav"), age_sec=3600)
+    _pin_dir_mtime(str(tmp_path))
+    index = AudioIndex(str(tmp_path), refresh_sec=3600)
+    index.refresh(force=True)
+
+    new = str(tmp_path / "b.wav")
+    _write(new, age_sec=30)
+    _pin_dir_mtime(str(tmp_path))
+    index.invalidate(new)
+
+    assert index.latest().path == new
+
+
+def test_collect_files_skips_storage_dot_dirs(tmp_path):
+    from app.core.batch import collect_files
+
+    _write(str(tmp_path / "a.wav"))
+    _write(str(tmp_path / "sub" / "b.mp3"))
+    _write(str(tmp_path / ".store" / "ab" / "c.wav"))
+    _write(str(tmp_path / ".blobs" / "ab" / "d.wav"))
+
+    files = sorted(os.path.relpath(path, str(tmp_path)) for path in collect_files(str(tmp_path)))
+
+    assert files == ["a.wav", os.path.join("sub", "b.mp3")]
@@ -0,0 +1,73 @@
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core.audio_preprocess import SAMPLE_RATE, decode_audio, trim_leading_silence
+
+
+def _write_wav(path, samples, sample_rate=SAMPLE_RATE, channels=1):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+
+def test_trim_leading_silence_drops_only_the_head():
+    tone = 0.5 * np.sin(np.linspace(0, 200 * np.pi, SAMPLE_RATE)).astype(np.float32)
+    audio = np.concatenate([np.zeros(SAMPLE_RATE // 2, dtype=np.float32), tone, np.zeros(800, dtype=np.float32)])
+
+    trimmed, offset = trim_leading_silence(audio)
+
+    assert offset == pytest.approx(0.5, abs=0.01)
+    assert len(trimmed) == len(audio) - int(offset * SAMPLE_RATE)
+    # 末尾の無音は残す
+    assert not trimmed[-800:].any()
+
+
+def test_trim_leading_silence_keeps_audio_that_starts_loud():
+    audio = np.full(SAMPLE_RATE, 0.2, dtype=np.float32)
+
+    trimmed, offset = trim_leading_silence(audio)
+
+    assert offset == 0.0
+    assert trimmed is audio
+
+
+def test_trim_leading_silence_of_pure_silence_is_empty():
+    trimmed, offset = trim_leading_silence(np.zeros(SAMPLE_RATE, dtype=np.float32))
+
+    assert trimmed.size == 0
+    assert offset == pytest.approx(1.0)
+
+
+def test_decode_audio_reads_16k_mono_wav_without_ffmpeg(tmp_path, monkeypatch):
+    from app.core import audio_preprocess
+
+    def no_ffmpeg(cmd):
+        raise AssertionError("ffmpeg を起動しないはず")
+
+    monkeypatch.setattr(audio_preprocess, "_decode_pcm", no_ffmpeg)
+    path = str(tmp_path / "a.wav")
+    _write_wav(path, [0, 16384, -32768, 32767])
+
+    audio = decode_audio(path)
+
+    assert audio.dtype == np.float32
+    assert np.allclose(audio, [0.0, 0.5, -1.0, 32767 / 32768])
+
+
+def test_decode_audio_uses_ffmpeg_for_other_layouts(tmp_path, monkeypatch):
+    from app.core import audio_preprocess
+
+    commands = []
+    monkeypatch.setattr(audio_preprocess, "_decode_pcm", lambda cmd: commands.append(cmd) or np.zeros(4, np.float32))
+    path = str(tmp_path / "stereo.wav")
+    _write_wav(path, [0, 0, 100, 100], sample_rate=44100, channels=2)
+
+    decode_audio(path)
+
+    assert commands and commands[0][0] == "ffmpeg"
+    assert commands[0][commands[0].index("-ar") + 1] == str(SAMPLE_RATE)
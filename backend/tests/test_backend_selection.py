@@ -0,0 +1,56 @@
+import pytest
+
+from app.core import backends
+from app.core.backends import BACKENDS, WhisperBackend, WhisperInt8Backend, get_backend, load_model
+
+
+def test_backend_follows_env(monkeypatch):
+    monkeypatch.setenv("WHISPER_BACKEND", "whisper-int8")
+    assert get_backend().name == "whisper-int8"
+
+    monkeypatch.setenv("WHISPER_BACKEND", "whisper")
+    assert get_backend().name == "whisper"
+    assert get_backend("whisper-int8") is BACKENDS["whisper-int8"]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_backend("onnx")
+
+
+def test_load_model_picks_the_backend_by_dtype(monkeypatch):
+    loads = []
+    monkeypatch.setattr(WhisperBackend, "load", lambda self, name, device="cpu": loads.append((self.name, name)) or "fp32-model")
+    monkeypatch.setattr(WhisperInt8Backend, "load", lambda self, name, device="cpu": loads.append((self.name, name)) or "int8-model")
+
+    assert load_model("tiny", dtype="fp32") == "fp32-model"
+    assert load_model("base", dtype="int8") == "int8-model"
+    assert loads == [("whisper", "tiny"), ("whisper-int8", "base")]
+
+    with pytest.raises(ValueError):
+        load_model("tiny", dtype="fp16")
+
+
+def test_int8_backend_is_cpu_only():
+    with pytest.raises(ValueError):
+        backends.WhisperInt8Backend().load("tiny", device="cuda")
+
+
+def test_backends_lease_from_the_pool_by_dtype(monkeypatch):
+    from contextlib import contextmanager
+
+    from app.core import model_pool
+
+    leases = []
+
+    class FakePool:
+        @contextmanager
+        def lease(self, model_name=None, device="cpu", dtype="fp32", timeout=None):
+            leases.append((model_name, dtype))
+            yield "model"
+
+    monkeypatch.setattr(model_pool, "get_model_pool", lambda: FakePool())
+    with get_backend("whisper-int8").lease("tiny") as model:
+        assert model == "model"
+
+    assert leases == [("tiny", "int8")]
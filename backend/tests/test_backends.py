@@ -0,0 +1,42 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+whisper_model = pytest.importorskip("whisper.model")
+
+from app.core.backends import quantize_model
+
+
+def _tiny_whisper():
+    dims = whisper_model.ModelDimensions(
+        n_mels=80, n_audio_ctx=8, n_audio_state=16, n_audio_head=2, n_audio_layer=1,
+        n_vocab=64, n_text_ctx=8, n_text_state=16, n_text_head=2, n_text_layer=1,
+    )
+    torch.manual_seed(0)
+    model = whisper_model.Whisper(dims).eval()
+    # 位置埋め込みは torch.empty のままなので初期化しておく（重みを読み込む場合は上書きされる）
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.02)
+    return model
+
+
+def test_quantize_model_converts_whisper_linears():
+    model = _tiny_whisper()
+    count = sum(isinstance(module, whisper_model.Linear) for module in model.modules())
+    model = quantize_model(model)
+
+    linears = [module for module in model.modules() if isinstance(module, torch.nn.Linear)]
+    quantized = [module for module in model.modules() if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)]
+    assert not linears
+    assert count > 0 and len(quantized) == count
+
+
+def test_quantized_model_forward_matches_fp32():
+    model = _tiny_whisper()
+    mel = torch.randn(1, 80, 16)
+    tokens = torch.tensor([[1, 2, 3]])
+    with torch.no_grad():
+        expected = model(mel, tokens)
+        actual = quantize_model(model)(mel, tokens)
+
+    assert actual.shape == (1, 3, 64)
+    assert torch.isfinite(actual).all()
+    assert (actual - expected).abs().max() < 0.5
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from app.core import admission, batch, transcribe_logic
+from app.core.batch import BatchRun, collect_files
+
+
+def _write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\x00" * size)
+    return path
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    @contextmanager
+    def fake_reserve(path, label="", timeout=None, model_name=None):
+        yield
+
+    def fake_transcribe(path, audio_hash=None, options=None, profile=None):
+        with lock:
+            calls.append(path)
+        if "broken" in path:
+            raise ValueError("壊れた音声")
+        return {"text": os.path.basename(path), "segments": []}
+
+    monkeypatch.setattr(admission, "reserve_for_file", fake_reserve)
+    monkeypatch.setattr(transcribe_logic, "transcribe_result", fake_transcribe)
+    monkeypatch.setattr(batch, "write_result_files", lambda stem, result, paths=None: paths)
+    return calls
+
+
+def _records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_processes_largest_first_and_records_failures(tmp_path, fake_pipeline):
+    source = tmp_path / "audio"
+    small = _write(str(source / "small.wav"), 10)
+    large = _write(str(source / "sub" / "large.wav"), 1000)
+    broken = _write(str(source / "broken.wav"), 100)
+    checkpoint = str(tmp_path / "batch.jsonl")
+
+    run = BatchRun(str(source), workers=1, checkpoint_path=checkpoint, archive=False)
+    run.run()
+
+    assert fake_pipeline == [large, broken, small]
+    summary = run.summary()
+    assert (summary["status"], summary["total"], summary["done"], summary["failed"], summary["remaining"]) == ("done", 3, 2, 1, 0)
+    statuses = {record["path"]: record["status"] for record in _records(checkpoint)}
+    assert statuses == {large: "done", broken: "failed", small: "done"}
+
+
+def test_batch_resumes_from_checkpoint(tmp_path, fake_pipeline):
+    source = tmp_path / "audio"
+    first = _write(str(source / "a.wav"), 10)
+    second = _write(str(source / "b.wav"), 20)
+    checkpoint = str(tmp_path / "batch.jsonl")
+    with open(checkpoint, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"path": second, "status": "done"}) + "\n")
+        # 書き込み途中で止まった行
+        f.write('{"path": "' + first)
+
+    run = BatchRun(str(source), workers=2, checkpoint_path=checkpoint, archive=False)
+    run.run()
+
+    assert fake_pipeline == [first]
+    assert run.summary()["skipped"] == 1
+
+
+def test_collect_files_reads_a_manifest(tmp_path):
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("# コメント\na.wav\n\nsub/b.mp3\n", encoding="utf-8")
+
+    assert collect_files(str(manifest)) == [str(tmp_path / "a.wav"), os.path.join(str(tmp_path), "sub", "b.mp3")]
+
+
+def test_api_caps_workers_and_rejects_outside_sources(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+
+    from app.api import batch_api
+
+    started = []
+
+    class FakeRun:
+        def __init__(self, source, workers, archive=True):
+            self.batch_id = "b1"
+            self.workers = workers
+            started.append(self)
+
+        def start(self):
+            pass
+
+        def summary(self):
+            return {"batch_id": self.batch_id, "workers": self.workers}
+
+    monkeypatch.setattr(batch_api, "BatchRun", FakeRun)
+    monkeypatch.setattr(batch_api, "get_job_workers", lambda: 2)
+    monkeypatch.setattr(batch_api, "AUDIO_DIR", str(tmp_path))
+
+    asyncio.run(batch_api.start_batch(batch_api.BatchRequest(workers=64)))
+    assert started[0].workers == 2
+    with pytest.raises(ValueError):
+        batch_api.BatchRequest(workers=0)
+
+    with pytest.raises(HTTPException) as error:
+        batch_api._resolve_source("../../etc")
+    assert error.value.status_code == 400
@@ -0,0 +1,217 @@
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core import backends, batching
+from app.core.batching import MicroBatcher, is_silent, needs_fallback
+
+SAMPLE_RATE = 16000
+OPTIONS = {"language": "ja", "task": "transcribe", "temperature": (0.0, 0.2, 0.4)}
+GREEDY_OPTIONS = {**OPTIONS, "temperature": (0.0,)}
+
+
+class FakeTokenizer:
+    timestamp_begin = 1000
+    eot = 999
+
+    def decode(self, tokens):
+        return "".join(chr(ord("a") + token) for token in tokens)
+
+
+def _result(tokens, compression_ratio=1.0, avg_logprob=-0.2, no_speech_prob=0.1):
+    return SimpleNamespace(
+        tokens=tokens, compression_ratio=compression_ratio, avg_logprob=avg_logprob,
+        no_speech_prob=no_speech_prob, language="ja",
+    )
+
+
+class FakeModel:
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.fallbacks = []
+
+    def transcribe(self, audio, **options):
+        self.fallbacks.append(len(audio))
+        self.release.wait(5)
+        return {"text": "fallback", "segments": [], "language": "ja"}
+
+
+class FakeBatcher(MicroBatcher):
+    """デコード結果をクリップの長さ（秒）で引く"""
+
+    def __init__(self, results, options=OPTIONS, window_ms=20.0, max_size=4):
+        super().__init__(window_ms, max_size, 30.0, options, model_name="tiny")
+        self.results = results
+        self.batches = []
+
+    def _decode_batch(self, model, clips):
+        self.batches.append(len(clips))
+        return [self.results[len(clip) // SAMPLE_RATE] for clip in clips], FakeTokenizer()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+
+    class FakeBackend:
+        @contextmanager
+        def lease(self, model_name=None, timeout=None):
+            yield model
+
+    monkeypatch.setattr(backends, "get_backend", lambda name=None: FakeBackend())
+    return model
+
+
+def _clip(seconds):
+    return np.zeros(seconds * SAMPLE_RATE, dtype=np.float32)
+
+
+def _transcribe_all(batcher, seconds_list):
+    results = {}
+
+    def run(seconds):
+        results[seconds] = batcher.transcribe(_clip(seconds))
+
+    threads = [threading.Thread(target=run, args=(seconds,)) for seconds in seconds_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_results_are_routed_to_their_callers(model):
+    batcher = FakeBatcher({
+        1: _result([1000, 0, 1, 1050]),
+        2: _result([1000, 2, 3, 1025, 1025, 4, 1050]),
+        3: _result([1000, 5, 1010]),
+    }, window_ms=200)
+    results = _transcribe_all(batcher, [1, 2, 3])
+
+    assert {seconds: result["text"] for seconds, result in results.items()} == {1: "ab", 2: "cde", 3: "f"}
+    assert [(s["start"], s["end"]) for s in results[2]["segments"]] == [(0.0, 0.5), (0.5, 1.0)]
+    assert batcher.batches == [3]
+
+
+def test_batch_flushes_when_full_without_waiting_for_window(model):
+    batcher = FakeBatcher({1: _result([1000, 0, 1010]), 2: _result([1000, 1, 1010])}, window_ms=10000, max_size=2)
+    started = time.monotonic()
+    _transcribe_all(batcher, [1, 2])
+
+    assert batcher.batches == [2]
+    assert time.monotonic() - started < 5
+
+
+def test_batch_flushes_after_window(model):
+    batcher = FakeBatcher({1: _result([1000, 0, 1010])}, window_ms=20, max_size=8)
+
+    assert batcher.transcribe(_clip(1))["text"] == "a"
+    assert batcher.batches == [1]
+
+
+def test_fallback_runs_in_caller_thread_without_blocking_batch(model):
+    batcher = FakeBatcher({
+        1: _result([1000, 0, 1010], compression_ratio=3.0),
+        2: _result([1000, 1, 1010]),
+    }, window_ms=200)
+    model.release.clear()
+    results = {}
+    threads = [
+        threading.Thread(target=lambda seconds=seconds: results.__setitem__(seconds, batcher.transcribe(_clip(seconds))))
+        for seconds in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    # 個別処理が終わらないうちに、同じバッチのもう一方は結果を受け取る
+    threads[1].join(5)
+    assert results[2]["text"] == "b"
+    assert 1 not in results
+
+    model.release.set()
+    threads[0].join(5)
+    assert results[1]["text"] == "fallback"
+    assert model.fallbacks == [SAMPLE_RATE]
+    assert batcher.stats()["fallbacks"] == 1
+
+
+def test_greedy_only_profile_keeps_batch_result(model):
+    batcher = FakeBatcher({1: _result([1000, 0, 1010], compression_ratio=3.0)}, options=GREEDY_OPTIONS)
+
+    assert batcher.transcribe(_clip(1))["text"] == "a"
+    assert model.fallbacks == []
+
+
+def test_silent_clip_is_not_retried(model):
+    batcher = FakeBatcher({1: _result([1000, 0, 1010], compression_ratio=3.0, avg_logprob=-2.0, no_speech_prob=0.9)})
+
+    result = batcher.transcribe(_clip(1))
+    assert result["text"] == "" and result["segments"] == []
+    assert model.fallbacks == []
+
+
+def test_decode_errors_reach_every_caller(model):
+    class BrokenBatcher(FakeBatcher):
+        def _decode_batch(self, model, clips):
+            raise RuntimeError("decode failed")
+
+    batcher = BrokenBatcher({})
+    with pytest.raises(RuntimeError, match="decode failed"):
+        batcher.transcribe(_clip(1))
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({}, False),
+    ({"compression_ratio": 3.0}, True),
+    ({"avg_logprob": -1.5}, True),
+    # 無音とみなせる窓は、圧縮率が高くてもやり直さない（whisper と同じ）
+    ({"compression_ratio": 3.0, "avg_logprob": -1.5, "no_speech_prob": 0.9}, False),
+    # 無音確率が高くても平均対数尤度が高ければ、圧縮率で判定する
+    ({"compression_ratio": 3.0, "no_speech_prob": 0.9}, True),
+])
+def test_needs_fallback_follows_whisper(kwargs, expected):
+    assert needs_fallback(_result([], **kwargs), OPTIONS) is expected
+
+
+def test_profile_thresholds_are_used():
+    assert not needs_fallback(_result([], compression_ratio=3.0), {"compression_ratio_threshold": 3.5})
+    assert is_silent(_result([], avg_logprob=-2.0, no_speech_prob=0.5), {"no_speech_threshold": 0.4})
+
+
+def test_batchers_are_kept_per_profile(monkeypatch):
+    from app.core.profiles import get_profile
+
+    monkeypatch.setenv("BATCH_ENABLED", "1")
+    monkeypatch.setattr(batching, "_batchers", {})
+    fast, accurate = get_profile("fast"), get_profile("accurate")
+    fast_options = {**OPTIONS, **fast.transcribe_options()}
+    accurate_options = {**OPTIONS, **accurate.transcribe_options()}
+
+    batcher = batching.get_micro_batcher(fast, fast_options)
+    assert batching.get_micro_batcher(fast, fast_options) is batcher
+    other = batching.get_micro_batcher(accurate, accurate_options)
+    assert other is not batcher
+    assert (other.model_name, other.options["beam_size"]) == (accurate.model_name, 5)
+
+
+def test_clips_are_padded_to_one_window(monkeypatch):
+    pytest.importorskip("torch")
+    whisper = pytest.importorskip("whisper")
+    captured = {}
+
+    def fake_decode(model, mel, options):
+        captured.update(shape=tuple(mel.shape), options=options)
+        return [_result([]) for _ in range(mel.shape[0])]
+
+    model = SimpleNamespace(dims=SimpleNamespace(n_mels=80), device="cpu", is_multilingual=True, num_languages=99)
+    batcher = MicroBatcher(10, 4, 30.0, {**OPTIONS, "beam_size": 5}, model_name="tiny")
+    monkeypatch.setattr(whisper, "decode", fake_decode)
+    batcher._decode_batch(model, [_clip(1), _clip(7)])
+
+    assert captured["shape"] == (2, 80, 3000)
+    assert (captured["options"].temperature, captured["options"].beam_size) == (0.0, 5)
@@ -0,0 +1,77 @@
+import json
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.__main__ import command_compare, flatten_metrics
+from benchmarks.load import _percentile
+
+
+def _write_result(path, metrics):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"metrics": metrics}, f)
+    return str(path)
+
+
+def test_flatten_metrics_uses_stable_keys():
+    stages = {"speech_10s": {"decode": {"median_sec": 0.1, "runs": 3}, "vad": {"speech_ratio": 0.8}}}
+    loads = [{"endpoint": "transcribe", "fixture": "speech_10s", "concurrency": 2, "p95_sec": 1.5, "errors": 0}]
+
+    assert flatten_metrics(stages, loads) == {
+        "load.transcribe.speech_10s.c2.errors": 0,
+        "load.transcribe.speech_10s.c2.p95_sec": 1.5,
+        "stage.speech_10s.decode.median_sec": 0.1,
+        "stage.speech_10s.vad.speech_ratio": 0.8,
+    }
+
+
+def test_percentile():
+    values = [5.0, 1.0, 3.0, 2.0, 4.0]
+
+    assert _percentile(values, 0.5) == 3.0
+    assert _percentile(values, 0.99) == 5.0
+    assert _percentile(values, 0.0) == 1.0
+
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    base = _write_result(tmp_path / "base.json", {
+        "stage.a.decode.median_sec": 1.0,
+        "load.t.a.c1.requests_per_sec": 10.0,
+        "stage.a.vad.speech_ratio": 0.5,
+    })
+    head = _write_result(tmp_path / "head.json", {
+        "stage.a.decode.median_sec": 1.05,
+        "load.t.a.c1.requests_per_sec": 7.0,
+        "stage.a.vad.speech_ratio": 0.9,
+    })
+
+    with pytest.raises(SystemExit) as exit_info:
+        command_compare(SimpleNamespace(base=base, head=head, threshold=0.1))
+
+    assert exit_info.value.code == 1
+    flagged = [line.split()[0] for line in capsys.readouterr().out.splitlines() if line.endswith("← 悪化")]
+    # スループットの低下だけが悪化。入力の性質を表す指標は比較しない
+    assert flagged == ["load.t.a.c1.requests_per_sec"]
+
+
+def test_compare_passes_within_threshold(tmp_path):
+    base = _write_result(tmp_path / "base.json", {"stage.a.decode.median_sec": 1.0})
+    head = _write_result(tmp_path / "head.json", {"stage.a.decode.median_sec": 0.8})
+
+    command_compare(SimpleNamespace(base=base, head=head, threshold=0.1))
+
+
+def test_fixtures_are_generated_deterministically(tmp_path):
+    pytest.importorskip("numpy")
+    from benchmarks.fixtures import ensure_fixtures
+
+    first = ensure_fixtures(["speech_10s"], str(tmp_path / "a"))[0]
+    second = ensure_fixtures(["speech_10s"], str(tmp_path / "b"))[0]
+
+    with open(first.path, "rb") as a, open(second.path, "rb") as b:
+        assert a.read() == b.read()
+    with wave.open(first.path, "rb") as wav:
+        assert (wav.getframerate(), wav.getnchannels(), wav.getnframes()) == (16000, 1, 160000)
+    with pytest.raises(ValueError):
+        ensure_fixtures(["music_10s"], str(tmp_path))
@@ -0,0 +1,108 @@
+import os
+import time
+
+import pytest
+
+from app.core.broker import STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, SqliteJobBroker
+from app.core.job_queue import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(os.path.join(str(tmp_path), "jobs.sqlite3"))
+
+
+@pytest.fixture
+def broker(store):
+    return SqliteJobBroker(store, max_attempts=2)
+
+
+def _create(store, file_id):
+    store.create(file_id, f"{file_id}.wav", f"/audio/{file_id}.wav")
+    # created_at の順に確保されるので、同じ時刻にならないようにする
+    time.sleep(0.001)
+
+
+def _expire(store, file_id):
+    store.update(file_id, lease_expires_at=time.time() - 1)
+
+
+def test_claim_takes_oldest_queued_job(store, broker):
+    _create(store, "a")
+    _create(store, "b")
+
+    job = broker.claim("w1", lease_sec=60)
+    assert job["file_id"] == "a"
+    assert (job["status"], job["worker_id"], job["attempts"]) == (STATUS_RUNNING, "w1", 1)
+    assert broker.claim("w2", lease_sec=60)["file_id"] == "b"
+    assert broker.claim("w3", lease_sec=60) is None
+    assert broker.pending_count() == 2
+
+
+def test_leased_job_is_not_claimed_twice(store, broker):
+    _create(store, "a")
+    broker.claim("w1", lease_sec=60)
+
+    assert broker.claim("w2", lease_sec=60) is None
+
+
+def test_expired_lease_is_reclaimed(store, broker):
+    _create(store, "a")
+    broker.claim("w1", lease_sec=60)
+    _expire(store, "a")
+
+    job = broker.claim("w2", lease_sec=60)
+    assert (job["file_id"], job["worker_id"], job["attempts"]) == ("a", "w2", 2)
+
+
+def test_heartbeat_extends_lease_only_for_owner(store, broker):
+    _create(store, "a")
+    broker.claim("w1", lease_sec=1)
+    before = store.get("a")["lease_expires_at"]
+
+    assert broker.heartbeat("a", "w1", lease_sec=60)
+    assert store.get("a")["lease_expires_at"] > before + 30
+    assert not broker.heartbeat("a", "w2", lease_sec=60)
+
+
+def test_stale_worker_cannot_finish_reclaimed_job(store, broker):
+    _create(store, "a")
+    broker.claim("w1", lease_sec=60)
+    _expire(store, "a")
+    broker.claim("w2", lease_sec=60)
+
+    assert not broker.heartbeat("a", "w1", lease_sec=60)
+    assert not broker.complete("a", "w1", text_path="stale.txt")
+    assert not broker.fail("a", "w1", "stale")
+    assert store.get("a")["status"] == STATUS_RUNNING
+
+    assert broker.complete("a", "w2", text_path="a.txt")
+    job = store.get("a")
+    assert (job["status"], job["text_path"], job["progress"]) == (STATUS_DONE, "a.txt", 1.0)
+    assert job["lease_expires_at"] is None
+    assert broker.pending_count() == 0
+
+
+def test_job_fails_after_max_attempts(store, broker):
+    _create(store, "a")
+    _create(store, "b")
+    for worker_id in ("w1", "w2"):
+        assert broker.claim(worker_id, lease_sec=60)["file_id"] == "a"
+        _expire(store, "a")
+
+    # 3 回目は上限を超えるので失敗にして、次のジョブを確保する
+    assert broker.claim("w3", lease_sec=60)["file_id"] == "b"
+    job = store.get("a")
+    assert job["status"] == STATUS_FAILED
+    assert "上限" in job["error"]
+
+
+def test_progress_and_fail_are_recorded_for_owner(store, broker):
+    _create(store, "a")
+    broker.claim("w1", lease_sec=60)
+    broker.progress("a", "w1", 0.5)
+    assert store.get("a")["progress"] == 0.5
+
+    assert broker.fail("a", "w1", "decode error")
+    job = store.get("a")
+    assert (job["status"], job["error"]) == (STATUS_FAILED, "decode error")
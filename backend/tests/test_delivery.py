@@ -0,0 +1,178 @@
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("httpx")
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core import delivery
+
+BODY = "".join(f"{index:05d} 文字起こしの結果\n" for index in range(200)).encode("utf-8")
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = os.path.join(str(tmp_path), "delivery")
+    monkeypatch.setattr(delivery, "DELIVERY_CACHE_DIR", directory)
+    return directory
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = os.path.join(str(tmp_path), "segments.bin")
+    with open(path, "wb") as f:
+        f.write(b"source")
+    return path
+
+
+@pytest.fixture
+def variants(cache_dir, source):
+    return delivery.prepare("job1/txt", source, lambda: [BODY])
+
+
+@pytest.fixture
+def client(variants):
+    def endpoint(request):
+        return delivery.respond(request.headers, variants, "text/plain", filename="job1.txt")
+
+    return TestClient(Starlette(routes=[Route("/result", endpoint)]))
+
+
+def test_prepare_writes_variants_once(cache_dir, source, variants):
+    calls = []
+
+    def produce():
+        calls.append(1)
+        return [BODY]
+
+    again = delivery.prepare("job1/txt", source, produce)
+    assert again == variants
+    assert calls == []
+    with open(variants.files["gzip"][0], "rb") as f:
+        assert gzip.decompress(f.read()) == BODY
+    assert not [name for name in os.listdir(os.path.dirname(variants.files["identity"][0])) if name.endswith(".tmp")]
+
+
+def test_prepare_rebuilds_when_source_changes(cache_dir, source, variants):
+    with open(source, "wb") as f:
+        f.write(b"updated source")
+    rebuilt = delivery.prepare("job1/txt", source, lambda: [b"new body"])
+
+    assert rebuilt.etag != variants.etag
+    assert rebuilt.files["identity"][1] == len(b"new body")
+
+
+def test_full_response_uses_negotiated_encoding(client, variants):
+    response = client.get("/result", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == variants.etag_for("gzip")
+    assert response.content == BODY
+
+
+def test_identity_when_compression_not_accepted(client, variants):
+    response = client.get("/result", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == variants.etag_for("identity")
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.content == BODY
+
+
+def test_matching_etag_returns_304(client, variants):
+    response = client.get(
+        "/result", headers={"Accept-Encoding": "gzip", "If-None-Match": variants.etag_for("gzip")},
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == variants.etag_for("gzip")
+
+
+def test_etag_of_other_encoding_does_not_match(client, variants):
+    response = client.get(
+        "/result", headers={"Accept-Encoding": "identity", "If-None-Match": variants.etag_for("gzip")},
+    )
+    assert response.status_code == 200
+
+
+def test_range_returns_partial_identity_body(client):
+    response = client.get("/result", headers={"Accept-Encoding": "gzip", "Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+    assert response.content == BODY[10:20]
+
+
+def test_suffix_range(client):
+    response = client.get("/result", headers={"Range": "bytes=-5"})
+
+    assert response.status_code == 206
+    assert response.content == BODY[-5:]
+
+
+def test_unsatisfiable_range_returns_416(client):
+    response = client.get("/result", headers={"Range": f"bytes={len(BODY)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_stale_if_range_returns_full_body(client):
+    response = client.get("/result", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, zstd", "zstd"),
+    ("gzip;q=0.5, zstd;q=0.1", "identity"),
+    ("gzip;q=0.5, zstd;q=0.1, identity;q=0", "gzip"),
+    ("br", "identity"),
+    ("*", "zstd"),
+    ("", "identity"),
+])
+def test_negotiate_encoding(header, expected):
+    assert delivery.negotiate_encoding(header, ["identity", "gzip", "zstd"]) == expected
+
+
+def test_sweep_removes_entries_whose_source_is_gone(cache_dir, source, variants):
+    assert delivery.sweep(retention_days=0) == 0
+    os.remove(source)
+
+    assert delivery.sweep(retention_days=0) == 1
+    assert not os.path.exists(os.path.join(cache_dir, "job1"))
+
+
+def test_sweep_removes_entries_past_retention(cache_dir, source, variants):
+    meta_path = os.path.join(cache_dir, "job1", "txt", "meta.json")
+    old = time.time() - 3 * 86400
+    os.utime(meta_path, (old, old))
+
+    assert delivery.sweep(retention_days=7) == 0
+    assert delivery.sweep(retention_days=2) == 1
+
+
+def test_sweep_removes_stale_incomplete_entries(cache_dir):
+    directory = os.path.join(cache_dir, "job2", "srt")
+    os.makedirs(directory)
+    assert delivery.sweep(retention_days=0) == 0
+
+    old = time.time() - delivery.INCOMPLETE_STALE_SEC - 60
+    os.utime(directory, (old, old))
+    assert delivery.sweep(retention_days=0) == 1
+
+
+def test_meta_records_source(cache_dir, source, variants):
+    with open(os.path.join(cache_dir, "job1", "txt", "meta.json"), encoding="utf-8") as f:
+        assert json.load(f)["source"] == os.path.abspath(source)
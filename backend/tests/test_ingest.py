@@ -0,0 +1,77 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app.core.ingest import (
+    EmptyUploadError,
+    UnsupportedFormatError,
+    UploadTooLargeError,
+    file_sha256,
+    ingest_stream,
+    is_oversized_request,
+    max_upload_bytes,
+    sniff_format,
+)
+
+WAV = b"RIFF\x24\x00\x00\x00WAVEfmt " + b"\x00" * 32
+
+
+@pytest.mark.parametrize("header, expected", [
+    (WAV, ".wav"),
+    (b"fLaC\x00\x00\x00\x22", ".flac"),
+    (b"OggS\x00\x02\x00\x00", ".ogg"),
+    (b"\x00\x00\x00\x20ftypM4A ", ".m4a"),
+    (b"ID3\x04\x00\x00\x00\x00", ".mp3"),
+    (b"\xff\xfb\x90\x64\x00\x00", ".mp3"),
+    (b"<html><body>", None),
+    (b"RIFF\x24\x00\x00\x00AVI ", None),
+    (b"", None),
+])
+def test_sniff_format_reads_magic_bytes(header, expected):
+    assert sniff_format(header) == expected
+
+
+def test_ingest_stream_writes_and_hashes(tmp_path):
+    body = WAV + os.urandom(3 * 1024 * 1024)
+
+    ingested = ingest_stream(io.BytesIO(body), "talk.dat", str(tmp_path), "job1")
+
+    assert ingested.path == os.path.join(str(tmp_path), "job1.wav")
+    assert ingested.format == ".wav"
+    assert ingested.filename == "talk.dat"
+    assert ingested.size == len(body)
+    assert ingested.sha256 == hashlib.sha256(body).hexdigest()
+    assert file_sha256(ingested.path) == ingested.sha256
+    assert os.listdir(str(tmp_path)) == ["job1.wav"]
+
+
+def test_ingest_stream_rejects_unknown_format(tmp_path):
+    with pytest.raises(UnsupportedFormatError):
+        ingest_stream(io.BytesIO(b"not audio at all"), "a.wav", str(tmp_path), "job1")
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_ingest_stream_stops_at_the_limit(tmp_path):
+    with pytest.raises(UploadTooLargeError) as error:
+        ingest_stream(io.BytesIO(WAV + b"\x00" * 100), "a.wav", str(tmp_path), "job1", max_bytes=64)
+
+    assert error.value.status_code == 413
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_ingest_stream_rejects_empty_upload(tmp_path):
+    with pytest.raises(EmptyUploadError):
+        ingest_stream(io.BytesIO(b""), "a.wav", str(tmp_path), "job1")
+
+
+def test_oversized_request_is_judged_by_content_length():
+    limit = max_upload_bytes()
+
+    assert not is_oversized_request("POST", str(limit))
+    assert is_oversized_request("POST", str(limit * 2))
+    assert not is_oversized_request("GET", str(limit * 2))
+    assert not is_oversized_request("POST", None)
+    assert not is_oversized_request("POST", "abc")
@@ -0,0 +1,125 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from app.core import admission, local_engine, transcribe_logic
+from app.core.job_queue import QueueFullError
+from app.core.local_engine import STATUS_CANCELLED, STATUS_DONE, LocalEngine
+
+
+class Recorder:
+    """ジョブが終わるたびに通知を受け取り、待てるようにする"""
+
+    def __init__(self, engine):
+        self.finished = []
+        self._cond = threading.Condition()
+        engine.subscribe(self)
+
+    def __call__(self, state):
+        # 投入直後の通知が、すでに終わった状態を運んでくることもあるので job_id ごとに 1 回だけ数える
+        if state["status"] in local_engine.FINISHED:
+            with self._cond:
+                if all(item["job_id"] != state["job_id"] for item in self.finished):
+                    self.finished.append(state)
+                self._cond.notify_all()
+
+    def wait(self, count):
+        with self._cond:
+            assert self._cond.wait_for(lambda: len(self.finished) >= count, timeout=5)
+        return self.finished
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    written = []
+
+    @contextmanager
+    def fake_reserve(path, label="", timeout=None, model_name=None):
+        yield
+
+    monkeypatch.setattr(admission, "reserve_for_file", fake_reserve)
+    monkeypatch.setattr(transcribe_logic, "transcribe_result", lambda path, audio_hash=None, profile=None: {"text": path})
+    monkeypatch.setattr(local_engine, "write_result_files", lambda job_id, result: written.append(job_id) or ("a.txt", "a.json"))
+    engine = LocalEngine(max_pending=2)
+    engine.written = written
+    yield engine
+    engine.stop()
+
+
+def test_jobs_run_in_order(engine):
+    recorder = Recorder(engine)
+    jobs = [engine.submit_path(f"/audio/{index}.wav") for index in range(2)]
+
+    finished = recorder.wait(2)
+
+    assert [state["job_id"] for state in finished] == [job.job_id for job in jobs]
+    assert all(state["status"] == STATUS_DONE for state in finished)
+    assert engine.written == [job.job_id for job in jobs]
+
+
+def test_pending_queue_is_bounded(engine, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(path, audio_hash=None, profile=None):
+        started.set()
+        release.wait(5)
+        return {"text": path}
+
+    monkeypatch.setattr(transcribe_logic, "transcribe_result", blocking)
+    recorder = Recorder(engine)
+    engine.submit_path("/audio/running.wav")
+    assert started.wait(5)
+    engine.submit_path("/audio/1.wav")
+    engine.submit_path("/audio/2.wav")
+
+    with pytest.raises(QueueFullError):
+        engine.submit_path("/audio/3.wav")
+
+    release.set()
+    recorder.wait(3)
+
+
+def test_cancel_after_a_cache_hit_skips_the_result(engine, monkeypatch):
+    def cached(path, audio_hash=None, profile=None):
+        # 進捗報告の無いまま返る（キャッシュヒット）間に取り消された
+        engine.cancel(engine.stats()["running"])
+        return {"text": path}
+
+    monkeypatch.setattr(transcribe_logic, "transcribe_result", cached)
+    recorder = Recorder(engine)
+    engine.submit_path("/audio/a.wav")
+
+    assert recorder.wait(1)[0]["status"] == STATUS_CANCELLED
+    assert engine.written == []
+
+
+def test_cancel_while_waiting_for_memory_skips_transcription(engine, monkeypatch):
+    calls = []
+
+    @contextmanager
+    def slow_reserve(path, label="", timeout=None, model_name=None):
+        engine.cancel(engine.stats()["running"])
+        yield
+
+    monkeypatch.setattr(admission, "reserve_for_file", slow_reserve)
+    monkeypatch.setattr(transcribe_logic, "transcribe_result", lambda *args, **kwargs: calls.append(args))
+    recorder = Recorder(engine)
+    engine.submit_path("/audio/a.wav")
+
+    assert recorder.wait(1)[0]["status"] == STATUS_CANCELLED
+    assert calls == []
+
+
+def test_finished_jobs_are_pruned(engine, monkeypatch):
+    monkeypatch.setattr(local_engine, "MAX_FINISHED_JOBS", 2)
+    recorder = Recorder(engine)
+    jobs = []
+    for index in range(4):
+        jobs.append(engine.submit_path(f"/audio/{index}.wav"))
+        recorder.wait(index + 1)
+
+    assert engine.get(jobs[0].job_id) is None
+    assert engine.get(jobs[1].job_id) is None
+    assert engine.get(jobs[3].job_id).status == STATUS_DONE
+    assert engine.stats()["jobs"] == 2
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core import long_audio
+from app.core.long_audio import Chunk, plan_chunks, stitch_segments
+
+
+def _segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_plan_chunks_cuts_at_silence():
+    chunks = plan_chunks(100.0, [(29.0, 31.0), (61.0, 63.0)], target_sec=30.0)
+
+    assert [(chunk.own_start, chunk.own_end) for chunk in chunks] == [(0.0, 30.0), (30.0, 62.0), (62.0, 100.0)]
+    # 無音で切れたところには重なりを付けない
+    assert all(chunk.start == chunk.own_start and chunk.end == chunk.own_end for chunk in chunks)
+
+
+def test_plan_chunks_overlaps_hard_cuts():
+    chunks = plan_chunks(100.0, [], target_sec=40.0, overlap_sec=2.0)
+
+    assert chunks[0] == Chunk(0.0, 42.0, 0.0, 40.0)
+    assert chunks[1].start == 38.0
+
+
+def test_stitch_drops_overlap_duplicates_by_time():
+    chunks = [Chunk(0.0, 42.0, 0.0, 40.0), Chunk(38.0, 80.0, 40.0, 80.0)]
+    first = [_segment(30.0, 35.0, "こんにちは"), _segment(35.0, 40.5, "今日はいい天気ですね。")]
+    # 重なり部分で同じ発話を、句読点違いで書き起こした
+    second = [_segment(35.5, 40.4, "今日はいい天気ですね"), _segment(40.5, 45.0, "そうですね")]
+
+    stitched = stitch_segments(chunks, [first, second])
+
+    assert [segment["text"] for segment in stitched] == ["こんにちは", "今日はいい天気ですね。", "そうですね"]
+    assert [segment["id"] for segment in stitched] == [0, 1, 2]
+
+
+def test_stitch_keeps_segments_that_only_touch():
+    chunks = [Chunk(0.0, 42.0, 0.0, 40.0), Chunk(38.0, 80.0, 40.0, 80.0)]
+    first = [_segment(36.0, 40.2, "はい")]
+    second = [_segment(40.0, 44.0, "はい")]
+
+    stitched = stitch_segments(chunks, [first, second])
+
+    assert len(stitched) == 2
+
+
+def test_transcribe_long_takes_language_from_the_first_chunk(monkeypatch):
+    def fake_chunk(file_path, chunk, options, fallback_budget):
+        language = "ja" if chunk.own_start == 0.0 else "en"
+        return [_segment(chunk.own_start, chunk.own_end, f" {language}")], None, None, language
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(long_audio, "_transcribe_chunk", fake_chunk)
+    monkeypatch.setattr(long_audio, "detect_silences", lambda path: [(29.0, 31.0)])
+    monkeypatch.setattr(long_audio, "get_long_audio_chunk_sec", lambda: 30.0)
+    monkeypatch.setattr(long_audio, "get_long_audio_workers", lambda model_name: 2)
+    monkeypatch.setattr(long_audio, "_acquire_pool", lambda *args: long_audio._Pool("test", executor))
+    monkeypatch.setattr(long_audio, "_release_pool", lambda pool, keep: None)
+
+    result = long_audio.transcribe_long("a.wav", 60.0, "tiny", {})
+    executor.shutdown()
+
+    assert result["language"] == "ja"
+    assert result["text"] == "ja en"
+    assert result["chunks"] == 2
@@ -0,0 +1,27 @@
+from app.core import metrics
+from app.core.metrics import MetricsRegistry
+
+
+def test_external_counters_render_as_counters():
+    registry = MetricsRegistry()
+    text = registry.render(
+        [("whisper_admission_active", "予約中", 1, {})],
+        [
+            ("whisper_admission_rejected_total", "断った数", 3, {"reason": "full"}),
+            ("whisper_admission_rejected_total", "断った数", 1, {"reason": "timeout"}),
+        ],
+    )
+    lines = text.splitlines()
+
+    assert "# TYPE whisper_admission_rejected_total counter" in lines
+    assert lines.count("# TYPE whisper_admission_rejected_total counter") == 1
+    assert 'whisper_admission_rejected_total{reason="full"} 3.0' in lines
+    assert 'whisper_admission_rejected_total{reason="timeout"} 1.0' in lines
+    assert "# TYPE whisper_admission_active gauge" in lines
+
+
+def test_peak_rss_is_never_below_current_rss():
+    memory = metrics.process_memory()
+
+    if memory["rss_mb"] is not None:
+        assert memory["peak_rss_mb"] >= memory["rss_mb"]
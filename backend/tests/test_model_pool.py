@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from app.core.model_pool import ModelPool
+
+
+class FakeLoader:
+    """読み込んだキーを記録し、キーを包んだオブジェクトをモデルとして返す"""
+
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, model_name, device, dtype):
+        self.loads.append((model_name, device, dtype))
+        return {"key": (model_name, device, dtype)}
+
+
+def _pool(max_instances=2, memory_budget_mb=10000, idle_timeout=300.0):
+    loader = FakeLoader()
+    return ModelPool(max_instances, memory_budget_mb, idle_timeout, loader=loader), loader
+
+
+def _use(pool, model_name):
+    with pool.lease(model_name) as model:
+        return model
+
+
+def test_idle_model_is_reused():
+    pool, loader = _pool()
+    first = _use(pool, "tiny")
+    second = _use(pool, "tiny")
+
+    assert first is second
+    assert len(loader.loads) == 1
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["idle"]) == (1, 1, 1)
+
+
+def test_least_recently_used_model_is_evicted_when_full():
+    pool, loader = _pool(max_instances=2)
+    _use(pool, "tiny")
+    _use(pool, "base")
+    _use(pool, "tiny")
+    _use(pool, "small")
+
+    assert sorted(model["model"] for model in pool.stats()["models"]) == ["small", "tiny"]
+    assert pool.stats()["evictions"] == 1
+    _use(pool, "base")
+    assert [load[0] for load in loader.loads] == ["tiny", "base", "small", "base"]
+
+
+def test_memory_budget_evicts_idle_models():
+    # tiny（39MB）と base（139MB）は同時に載らない
+    pool, loader = _pool(max_instances=4, memory_budget_mb=150)
+    _use(pool, "tiny")
+    _use(pool, "base")
+
+    stats = pool.stats()
+    assert [model["model"] for model in stats["models"]] == ["base"]
+    assert stats["resident_mb"] == 139
+
+
+def test_oversized_model_still_loads_alone():
+    pool, loader = _pool(memory_budget_mb=10)
+    assert _use(pool, "large")["key"][0] == "large"
+    assert pool.stats()["instances"] == 1
+
+
+def test_zero_idle_timeout_releases_after_each_lease():
+    pool, loader = _pool(idle_timeout=0)
+    _use(pool, "tiny")
+    _use(pool, "tiny")
+
+    assert len(loader.loads) == 2
+    assert pool.stats()["instances"] == 0
+
+
+def test_pin_keeps_model_until_unpinned():
+    pool, loader = _pool(idle_timeout=0)
+    with pool.pinned("tiny"):
+        for _ in range(3):
+            _use(pool, "tiny")
+        assert len(loader.loads) == 1
+        assert pool.stats()["idle"] == 1
+    assert pool.stats()["instances"] == 0
+
+
+def test_sweep_skips_pinned_models():
+    pool, loader = _pool(idle_timeout=0.01)
+    pool.pin("tiny")
+    _use(pool, "tiny")
+    _use(pool, "base")
+    for entry in pool._idle.values():
+        entry.last_used -= 1
+    pool.sweep()
+
+    assert [model["model"] for model in pool.stats()["models"]] == ["tiny"]
+    pool.unpin("tiny")
+
+
+def test_lease_waits_for_busy_model_and_times_out():
+    pool, loader = _pool(max_instances=1)
+    with pool.lease("tiny"):
+        with pytest.raises(TimeoutError):
+            with pool.lease("base", timeout=0.05):
+                pass
+    assert pool.stats()["waits"] >= 1
+
+
+def test_waiting_lease_gets_model_when_returned():
+    pool, loader = _pool(max_instances=1)
+    results = []
+
+    def worker():
+        with pool.lease("tiny", timeout=5) as model:
+            results.append(model)
+
+    with pool.lease("tiny") as model:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        # 返却を待っている間に with を抜ける
+        time.sleep(0.05)
+    thread.join(5)
+
+    assert results == [model]
+    assert len(loader.loads) == 1
+
+
+def test_failed_load_frees_the_slot():
+    def broken(model_name, device, dtype):
+        raise RuntimeError("load failed")
+
+    pool = ModelPool(1, 10000, 300.0, loader=broken)
+    with pytest.raises(RuntimeError):
+        _use(pool, "tiny")
+    stats = pool.stats()
+    assert (stats["instances"], stats["load_failures"]) == (0, 1)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.profiles import WINDOW_SEC, BudgetedModel, DecodeBudget, get_profile, get_profiles
+
+
+class FakeModel:
+    """decode(mel, options) の呼び出しを記録するだけのモデル"""
+
+    def __init__(self):
+        self.temperatures = []
+        self.dims = "dims"
+
+    def decode(self, mel, options):
+        self.temperatures.append(options.temperature)
+        return f"{mel}@{options.temperature}"
+
+
+def _decode(model, mel, temperature):
+    return model.decode(mel, SimpleNamespace(temperature=temperature))
+
+
+def test_profiles_follow_env_set_after_import(monkeypatch):
+    monkeypatch.setenv("PROFILE_FAST_MODEL", "base")
+    monkeypatch.setenv("TRANSCRIBE_PROFILE", "fast")
+
+    assert get_profile().model_name == "base"
+    assert get_profiles()["fast"].model_name == "base"
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        get_profile("turbo")
+
+
+def test_budget_allows_at_least_one_window():
+    budget = DecodeBudget(0.5)
+    budget.start(10.0)
+
+    assert budget.allow_fallback()
+    assert not budget.allow_fallback()
+    assert budget.summary() == {"fallbacks": 1, "skipped_fallbacks": 1, "budget_sec": WINDOW_SEC, "spent_sec": WINDOW_SEC}
+
+
+def test_budget_scales_with_audio_length():
+    budget = DecodeBudget(0.5)
+    budget.start(240.0)
+
+    assert [budget.allow_fallback() for _ in range(5)] == [True, True, True, True, False]
+
+
+def test_zero_budget_never_falls_back():
+    budget = DecodeBudget(0.0)
+    budget.start(600.0)
+
+    assert not budget.allow_fallback()
+
+
+def test_budgeted_model_stops_fallbacks_once_exhausted():
+    model = FakeModel()
+    budget = DecodeBudget(0.0)
+    budget.start(30.0)
+    budgeted = BudgetedModel(model, budget)
+
+    assert _decode(budgeted, "w1", 0.0) == "w1@0.0"
+    # 上限に達しているので、同じ窓の結果を返してデコードしない
+    assert _decode(budgeted, "w1", 0.2) == "w1@0.0"
+    assert _decode(budgeted, "w1", 0.4) == "w1@0.0"
+    # 次の窓は通常どおりデコードする
+    assert _decode(budgeted, "w2", 0.0) == "w2@0.0"
+
+    assert model.temperatures == [0.0, 0.0]
+    assert budget.summary()["skipped_fallbacks"] == 1
+    assert budgeted.dims == "dims"
+
+
+def test_budgeted_model_spends_budget_per_fallback():
+    model = FakeModel()
+    budget = DecodeBudget(1.0)
+    budget.start(60.0)
+    budgeted = BudgetedModel(model, budget)
+
+    for temperature in (0.0, 0.2, 0.4, 0.6):
+        _decode(budgeted, "w1", temperature)
+
+    assert model.temperatures == [0.0, 0.2, 0.4]
+    assert budget.summary()["fallbacks"] == 2
+    assert budget.summary()["skipped_fallbacks"] == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from app.core import progress
+from app.core.progress import ProgressReporter
+
+
+def test_reporter_keeps_progress_monotonic():
+    states = []
+    reporter = ProgressReporter("job1", total_sec=10.0, on_update=states.append)
+
+    reporter.report(0.5, force=True)
+    reporter.report(0.25, force=True)
+
+    assert [state["progress"] for state in states] == [0.5, 0.5]
+    assert states[-1]["decoded_sec"] == 5.0
+    assert states[-1]["segments"] == 0
+
+
+def test_whisper_hook_reports_from_tqdm_counts(monkeypatch):
+    pytest.importorskip("tqdm")
+    pytest.importorskip("whisper")
+    import importlib
+
+    whisper_transcribe = importlib.import_module("whisper.transcribe")
+    monkeypatch.setattr(progress, "_hook_installed", False)
+    monkeypatch.setattr(whisper_transcribe, "tqdm", whisper_transcribe.tqdm)
+    monkeypatch.setattr(progress, "PUBLISH_INTERVAL_SEC", 0.0)
+
+    states = []
+    with progress.progress_context("job1", total_sec=30.0, on_update=states.append):
+        with whisper_transcribe.tqdm.tqdm(total=3000, disable=True) as bar:
+            bar.update(1500)
+            bar.update(1500)
+
+    assert [state["progress"] for state in states] == [0.5, 1.0]
+    assert all(state["segments"] == 0 for state in states)
@@ -0,0 +1,90 @@
+import os
+
+from app.core.result_cache import ResultCache, make_cache_key
+
+
+def _key(name):
+    return make_cache_key(name, "tiny", "ja", {})
+
+
+def test_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10000)
+    cache.put(_key("a"), {"text": "こんにちは"})
+
+    assert cache.get(_key("a")) == {"text": "こんにちは"}
+    assert cache.get(_key("b")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entry_written_by_another_process_is_found(tmp_path):
+    # 同じディレクトリを使う別プロセス（API とワーカー）を 2 つのインスタンスで表す
+    api = ResultCache(str(tmp_path), max_bytes=10000)
+    worker = ResultCache(str(tmp_path), max_bytes=10000)
+    worker.put(_key("a"), {"text": "worker"})
+
+    assert api.get(_key("a")) == {"text": "worker"}
+    assert api.stats()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=60)
+    cache.put(_key("a"), {"text": "a" * 10})
+    cache.put(_key("b"), {"text": "b" * 10})
+    cache.get(_key("a"))
+    cache.put(_key("c"), {"text": "c" * 10})
+
+    assert cache.get(_key("b")) is None
+    assert cache.get(_key("a")) is not None
+    assert not os.path.exists(cache._path(_key("b")))
+
+
+def test_index_is_loaded_on_start(tmp_path):
+    ResultCache(str(tmp_path), max_bytes=10000).put(_key("a"), {"text": "a"})
+
+    assert ResultCache(str(tmp_path), max_bytes=10000).stats()["entries"] == 1
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10000)
+    cache.put(_key("a"), {"text": "a"})
+    with open(cache._path(_key("a")), "w") as f:
+        f.write("{broken")
+
+    assert cache.get(_key("a")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=0)
+    cache.put(_key("a"), {"text": "a"})
+
+    assert cache.get(_key("a")) is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_cache_hit_does_not_report_original_fallbacks(tmp_path, monkeypatch):
+    from app.core import transcribe_logic
+
+    cache = ResultCache(str(tmp_path), max_bytes=10000)
+    monkeypatch.setattr(transcribe_logic, "get_result_cache", lambda: cache)
+    profile = transcribe_logic.get_profile()
+    key = transcribe_logic._cache_key("a" * 64, transcribe_logic._transcribe_options(profile, None), profile)
+    cache.put(key, {"text": "a", "decoding": {"fallbacks": 3, "skipped_fallbacks": 1}})
+
+    assert transcribe_logic.lookup_cached_result("a" * 64) == {"text": "a"}
+
+
+def test_feature_cache_mode_gets_its_own_key(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.core import transcribe_logic
+
+    profile = transcribe_logic.get_profile()
+    options = transcribe_logic._transcribe_options(profile, None)
+    monkeypatch.setattr(transcribe_logic, "get_feature_cache", lambda: SimpleNamespace(enabled=False))
+    plain = transcribe_logic._cache_key("a" * 64, options, profile)
+    monkeypatch.setattr(transcribe_logic, "get_feature_cache", lambda: SimpleNamespace(enabled=True))
+    windowed = transcribe_logic._cache_key("a" * 64, options, profile)
+
+    assert plain != windowed
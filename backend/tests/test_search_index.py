@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from app.core.search_index import SearchIndex
+
+
+class FakeStore:
+    """SegmentStore と同じ読み出し口を持つ最小限のストア"""
+
+    language = "ja"
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.starts = [float(index) for index in range(len(texts))]
+        self.ends = [float(index + 1) for index in range(len(texts))]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def text_at(self, index):
+        return self.texts[index]
+
+
+class LikeOnlyIndex(SearchIndex):
+    """FTS5 / trigram が使えない SQLite を想定した索引"""
+
+    def _create_fts(self):
+        return False
+
+
+TEXTS = ["今日は会議があります", "明日は休みです", "会社の会議室で話す", "Hello World 100%"]
+
+
+def _index(tmp_path, cls=SearchIndex):
+    index = cls(os.path.join(str(tmp_path), "search.sqlite3"))
+    index.index_transcript("job1", FakeStore(TEXTS), "job1.wav")
+    return index
+
+
+def _texts(result):
+    return sorted(item["text"] for item in result["results"])
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = _index(tmp_path)
+    if not index.fts_enabled:
+        pytest.skip("この SQLite では FTS5 の trigram が使えない")
+    return index
+
+
+def test_long_term_uses_fts(index):
+    result = index.search("会議室")
+
+    assert result["mode"] == "fts"
+    assert _texts(result) == ["会社の会議室で話す"]
+    assert result["results"][0]["highlight"] == "会社の[会議室]で話す"
+    assert result["results"][0]["start_ms"] == 2000
+
+
+def test_two_character_term_uses_bigram_index(index):
+    result = index.search("会議")
+
+    assert result["mode"] == "bigram"
+    assert _texts(result) == ["今日は会議があります", "会社の会議室で話す"]
+    assert "[会議]" in result["results"][0]["highlight"]
+
+
+def test_bigram_candidates_are_confirmed_as_substrings(index):
+    # 「議」と「室」はどちらも含むが「議室」の並びは 1 件だけ
+    assert _texts(index.search("議室")) == ["会社の会議室で話す"]
+    assert index.search("議明")["results"] == []
+
+
+def test_long_and_short_terms_are_combined(index):
+    result = index.search("会社の 会議")
+
+    assert result["mode"] == "fts+bigram"
+    assert _texts(result) == ["会社の会議室で話す"]
+    assert result["results"][0]["highlight"] == "[会社の][会議]室で話す"
+
+
+def test_single_character_term_falls_back_to_like(index):
+    result = index.search("休")
+
+    assert result["mode"] == "like"
+    assert _texts(result) == ["明日は休みです"]
+    assert index.search("会議 休")["mode"] == "bigram+like"
+    assert index.search("会議 休")["results"] == []
+
+
+def test_bigram_match_ignores_ascii_case(index):
+    assert _texts(index.search("LO")) == ["Hello World 100%"]
+
+
+def test_short_term_highlight_ignores_ascii_case(index):
+    assert index.search("LO")["results"][0]["highlight"] == "Hel[lo] World 100%"
+    assert index.search("h")["results"][0]["highlight"] == "[H]ello World 100%"
+
+
+def test_like_wildcards_are_escaped(index):
+    assert _texts(index.search("0%")) == ["Hello World 100%"]
+    assert index.search("_")["results"] == []
+
+
+def test_without_fts_every_term_uses_bigram_and_like(tmp_path):
+    index = _index(tmp_path, LikeOnlyIndex)
+
+    result = index.search("会議室")
+    assert result["mode"] == "bigram"
+    assert _texts(result) == ["会社の会議室で話す"]
+    assert index.stats()["fts"] is False
+
+
+def test_reindex_and_remove_update_bigrams(index):
+    index.index_transcript("job1", FakeStore(["別の内容です"]), "job1.wav")
+    assert index.search("会議")["results"] == []
+    assert _texts(index.search("内容")) == ["別の内容です"]
+
+    index.remove("job1")
+    assert index.search("内容")["results"] == []
+    assert index._conn.execute("SELECT COUNT(*) FROM segment_bigrams").fetchone()[0] == 0
+    assert not index.has("job1")
+
+
+def test_bigrams_are_built_for_existing_segments(tmp_path):
+    index = _index(tmp_path)
+    with index._conn:
+        index._conn.execute("DROP TABLE segment_bigrams")
+
+    reopened = SearchIndex(os.path.join(str(tmp_path), "search.sqlite3"))
+    assert _texts(reopened.search("会議")) == ["今日は会議があります", "会社の会議室で話す"]
+
+
+def test_search_filters_by_file_and_paginates(index):
+    index.index_transcript("job2", FakeStore(["会議の議事録"]), "job2.wav")
+
+    assert [item["file_id"] for item in index.search("会議", file_id="job2")["results"]] == ["job2"]
+    assert len(index.search("会議", limit=2)["results"]) == 2
+    assert len(index.search("会議", limit=2, offset=2)["results"]) == 1
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from app.core import segment_store
+from app.core.segment_store import RENDERERS, SegmentStore, render_result
+
+RESULT = {
+    "language": "ja",
+    "segments": [
+        {"start": 0.0, "end": 1.5, "text": " こんにちは", "avg_logprob": -0.25, "no_speech_prob": 0.01},
+        {"start": 1.5, "end": 3661.25, "text": " 長い録音です。"},
+    ],
+}
+
+
+def _render(name, store, file_id="job1"):
+    return "".join(RENDERERS[name][0](store, file_id))
+
+
+def test_round_trip(tmp_path):
+    path = os.path.join(str(tmp_path), "job1.segments")
+    SegmentStore.from_result(RESULT).save(path)
+
+    store = SegmentStore.load(path)
+
+    assert len(store) == 2
+    assert store.language == "ja"
+    assert store.text == "こんにちは 長い録音です。"
+    assert store.segment(0) == {
+        "id": 0, "start": 0.0, "end": 1.5, "text": " こんにちは", "avg_logprob": -0.25, "no_speech_prob": 0.01,
+    }
+    assert store.segment(1)["end"] == 3661.25
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_empty_result_round_trips(tmp_path):
+    path = os.path.join(str(tmp_path), "empty.segments")
+    SegmentStore.from_result({"segments": []}).save(path)
+
+    store = SegmentStore.load(path)
+
+    assert len(store) == 0
+    assert json.loads(_render("json", store)) == {"file_id": "job1", "language": None, "text": "", "segments": []}
+
+
+def test_corrupt_file_is_rejected(tmp_path):
+    path = os.path.join(str(tmp_path), "bad.segments")
+    with open(path, "wb") as f:
+        f.write(b"not a segment file")
+
+    with pytest.raises(ValueError):
+        SegmentStore.load(path)
+
+
+def test_renderers():
+    store = SegmentStore.from_result(RESULT)
+
+    assert _render("txt", store) == "こんにちは 長い録音です。"
+    assert _render("srt", store) == (
+        "1\n00:00:00,000 --> 00:00:01,500\nこんにちは\n\n"
+        "2\n00:00:01,500 --> 01:01:01,250\n長い録音です。\n\n"
+    )
+    assert _render("vtt", store).startswith("WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nこんにちは\n\n")
+    document = json.loads(_render("json", store))
+    assert [segment["text"] for segment in document["segments"]] == [" こんにちは", " 長い録音です。"]
+    assert json.loads("".join(render_result(store, "job1")))["json"] == document
+
+
+def test_json_is_valid_across_render_batches(monkeypatch):
+    monkeypatch.setattr(segment_store, "RENDER_BATCH", 2)
+    store = SegmentStore()
+    for index in range(5):
+        store.append(float(index), index + 1.0, f" {index}")
+
+    chunks = list(RENDERERS["json"][0](store, "job1"))
+
+    assert len(chunks) > 3
+    assert [segment["id"] for segment in json.loads("".join(chunks))["segments"]] == [0, 1, 2, 3, 4]
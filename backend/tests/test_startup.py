@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core.startup import HEAVY_MODULES, StartupTimer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_timer_records_phases_in_order():
+    timer = StartupTimer()
+    timer.mark("import_fastapi")
+    timer.mark("import_routers")
+    timer.mark_ready()
+
+    report = timer.report()
+
+    assert report["ready"]
+    assert [phase["phase"] for phase in report["phases"]] == ["import_fastapi", "import_routers", "ready"]
+    assert all(phase["took_ms"] >= 0 for phase in report["phases"])
+    assert report["ready_at_ms"] >= report["phases"][-1]["at_ms"]
+    assert set(report["loaded_modules"]) == set(HEAVY_MODULES)
+
+
+def test_importing_the_app_does_not_load_the_ml_stack():
+    pytest.importorskip("fastapi")
+    # 別プロセスで import する（このプロセスでは他のテストが numpy などを読み込んでいる）
+    code = (
+        "import json, sys; import app.main; "
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path), "WHISPER_WARMUP": "off"}
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+from app.core import storage
+from app.core.storage import AudioStore
+
+SHA = "ab" * 32
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    values = {"quota_mb": 0, "retention_days": 30, "sweep_sec": 0, "compress": False}
+    monkeypatch.setattr(storage, "get_storage_settings", lambda: dict(values))
+    return values
+
+
+@pytest.fixture
+def store(tmp_path, settings):
+    return AudioStore(root=str(tmp_path / "audio"), archive_root=str(tmp_path / "archive"))
+
+
+def _ingest(store, file_id, body=b"RIFF-audio"):
+    path = os.path.join(store.incoming_dir, f"{file_id}.part")
+    with open(path, "wb") as f:
+        f.write(body)
+    return store.store(path, SHA, ".wav", file_id)
+
+
+def _age(path, days):
+    past = time.time() - days * 86400
+    os.utime(path, (past, past))
+
+
+def test_archived_blob_is_reused_by_a_later_upload(store):
+    first = _ingest(store, "job1")
+    store.archive(first, SHA)
+
+    blob = store.blob_path(SHA, ".wav")
+    assert os.path.exists(blob)
+
+    second = _ingest(store, "job2")
+    assert os.path.samefile(second, blob)
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_sweep_drops_unreferenced_blobs_after_retention(store):
+    reference = _ingest(store, "job1")
+    destination = store.archive(reference, SHA)
+    blob = store.blob_path(SHA, ".wav")
+
+    store.sweep()
+    assert os.path.exists(blob) and os.path.exists(destination)
+
+    _age(blob, 31)
+    _age(destination, 31)
+    store.sweep()
+    assert not os.path.exists(blob)
+    assert not os.path.exists(destination)
+
+
+def test_sweep_keeps_referenced_blobs(store):
+    reference = _ingest(store, "job1")
+    _age(reference, 31)
+
+    store.sweep()
+
+    assert os.path.exists(store.blob_path(SHA, ".wav"))
+
+
+def test_sweep_skips_files_touched_after_selection(store):
+    reference = _ingest(store, "job1")
+    destination = store.archive(reference, SHA)
+    _age(destination, 31)
+    mtime = os.stat(destination).st_mtime
+
+    # 候補に選ばれた後で同じ内容が再びアーカイブされた
+    os.utime(destination)
+
+    assert not store._delete(destination, mtime)
+    assert os.path.exists(destination)
+
+
+def test_quota_evicts_unreferenced_blobs_before_archives(store, settings):
+    settings["retention_days"] = 0
+    settings["quota_mb"] = 1
+    body = b"x" * (700 * 1024)
+    reference = _ingest(store, "job1", body)
+    destination = store.archive(reference, SHA)
+
+    store.sweep()
+
+    assert not os.path.exists(store.blob_path(SHA, ".wav"))
+    assert os.path.exists(destination)
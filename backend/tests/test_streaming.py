@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core.streaming import PcmDecoder
+
+
+def test_decoder_carries_partial_samples():
+    samples = np.array([1000, -2000, 3000], dtype="<i2").tobytes()
+    decoder = PcmDecoder("s16le")
+
+    first = decoder.decode(samples[:3])
+    second = decoder.decode(samples[3:])
+
+    assert len(first) == 1
+    assert len(second) == 2
+    assert np.allclose(np.concatenate([first, second]) * 32768.0, [1000, -2000, 3000])
+
+
+def test_decoder_handles_float_frames_split_anywhere():
+    samples = np.array([0.25, -0.5], dtype="<f4").tobytes()
+    decoder = PcmDecoder("f32le")
+
+    parts = [decoder.decode(samples[i:i + 3]) for i in range(0, len(samples), 3)]
+
+    assert np.allclose(np.concatenate(parts), [0.25, -0.5])
+
+
+def test_stream_rejects_sessions_over_the_limit(monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from starlette.testclient import TestClient
+
+    from app.api import stream_api
+
+    app = FastAPI()
+    app.include_router(stream_api.router, prefix="/api")
+    monkeypatch.setattr(stream_api, "get_stream_max_sessions", lambda: 1)
+    monkeypatch.setattr(stream_api, "_sessions", 1)
+
+    with TestClient(app).websocket_connect("/api/stream") as websocket:
+        message = websocket.receive_json()
+        closed = websocket.receive()
+
+    assert message["type"] == "error"
+    assert closed["type"] == "websocket.close"
+    assert closed["code"] == 1013
+    assert stream_api._sessions == 1
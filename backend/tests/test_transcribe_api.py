@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from app.api import transcribe_api
+from app.core.broker import STATUS_FAILED, STATUS_QUEUED
+from app.core.profiles import get_profile
+
+
+class FakeStore:
+    def __init__(self, job):
+        self.job = job
+
+    def get(self, file_id):
+        return self.job
+
+
+class FakeQueue:
+    embedded = False
+
+    def __init__(self, job):
+        self.store = FakeStore(job)
+        self.enqueued = []
+
+    def enqueue(self, *args):
+        self.enqueued.append(args)
+
+
+class FakeRequest:
+    def __init__(self, disconnected=False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    def install(job, wait_sec=0.0):
+        queue = FakeQueue(job)
+        monkeypatch.setattr(transcribe_api, "get_job_queue", lambda: queue)
+        monkeypatch.setattr(transcribe_api, "get_job_wait_sec", lambda: wait_sec)
+        monkeypatch.setattr(transcribe_api, "JOB_POLL_SEC", 0)
+        return queue
+
+    return install
+
+
+def _run(request=None):
+    return asyncio.run(transcribe_api._run_as_job(
+        request or FakeRequest(), "job1", "a.wav", "/audio/a.wav", None, {"language": "ja"}, get_profile("fast"),
+    ))
+
+
+def test_job_is_enqueued_with_profile(queue):
+    fake = queue({"status": STATUS_FAILED, "error": "decode error"})
+    with pytest.raises(RuntimeError, match="decode error"):
+        _run()
+    assert fake.enqueued[0][4] == {"language": "ja", "profile": "fast"}
+
+
+def test_missing_job_row_is_an_error(queue):
+    queue(None)
+    with pytest.raises(RuntimeError, match="job1"):
+        _run()
+
+
+def test_wait_times_out_with_504(queue):
+    queue({"status": STATUS_QUEUED})
+    with pytest.raises(HTTPException) as error:
+        _run()
+    assert error.value.status_code == 504
+    assert "/api/status/job1" in error.value.detail
+
+
+def test_client_disconnect_stops_waiting(queue):
+    queue({"status": STATUS_QUEUED}, wait_sec=60)
+    with pytest.raises(HTTPException) as error:
+        _run(FakeRequest(disconnected=True))
+    assert error.value.status_code == 499
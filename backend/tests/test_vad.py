@@ -0,0 +1,94 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core import vad
+from app.core.vad import JOIN_GAP_SEC, SAMPLE_RATE, SpeechRegion, TimeMap, detect_speech, join_regions
+
+
+def _tone(sec, amplitude=0.3, hz=440):
+    t = np.arange(int(sec * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+
+def _silence(sec):
+    return np.zeros(int(sec * SAMPLE_RATE), dtype=np.float32)
+
+
+def test_time_map_maps_joined_time_back():
+    time_map = TimeMap()
+    time_map.add(0.0, SpeechRegion(1.0, 3.0))
+    time_map.add(2.0 + JOIN_GAP_SEC, SpeechRegion(10.0, 12.0))
+
+    assert time_map.to_original(0.0) == pytest.approx(1.0)
+    assert time_map.to_original(1.5) == pytest.approx(2.5)
+    # 区間の間に挟んだ無音は直前の区間の終わりに寄せる
+    assert time_map.to_original(2.1) == pytest.approx(3.0)
+    assert time_map.to_original(2.0 + JOIN_GAP_SEC + 0.5) == pytest.approx(10.5)
+
+
+def test_join_regions_keeps_only_speech():
+    audio = np.concatenate([_silence(1.0), _tone(1.0), _silence(2.0), _tone(0.5)])
+    regions = [SpeechRegion(1.0, 2.0), SpeechRegion(4.0, 4.5)]
+
+    joined, time_map = join_regions(audio, regions)
+
+    assert len(joined) == int((1.0 + JOIN_GAP_SEC + 0.5) * SAMPLE_RATE)
+    assert time_map.to_original(1.0 + JOIN_GAP_SEC + 0.25) == pytest.approx(4.25)
+
+
+def test_detect_speech_finds_tone_between_silences():
+    audio = np.concatenate([_silence(2.0), _tone(1.5), _silence(2.0)])
+
+    result = detect_speech(audio, settings={**vad.get_vad_settings(), "pad_ms": 0})
+
+    assert len(result.regions) == 1
+    region = result.regions[0]
+    assert region.start == pytest.approx(2.0, abs=0.05)
+    assert region.end == pytest.approx(3.5, abs=0.05)
+    assert result.skipped_ratio == pytest.approx(1 - 1.5 / 5.5, abs=0.02)
+
+
+def test_detect_speech_ignores_white_noise():
+    rng = np.random.default_rng(0)
+    audio = (0.3 * rng.standard_normal(3 * SAMPLE_RATE)).astype(np.float32)
+
+    assert detect_speech(audio).regions == []
+
+
+class FakeModel:
+    def __init__(self):
+        self.lengths = []
+
+    def transcribe(self, audio, **options):
+        self.lengths.append(len(audio))
+        end = len(audio) / SAMPLE_RATE
+        return {"text": "x", "segments": [{"start": 0.0, "end": end, "text": "x"}]}
+
+
+def test_transcribe_speech_restores_original_timestamps(monkeypatch):
+    monkeypatch.setattr(vad, "get_vad_settings", lambda: {
+        "enabled": True, "threshold_db": -45.0, "margin_db": 10.0, "flatness": 0.6,
+        "min_speech_ms": 250, "min_silence_ms": 500, "pad_ms": 0,
+    })
+    model = FakeModel()
+    audio = np.concatenate([_silence(3.0), _tone(1.0), _silence(3.0)])
+
+    result = vad.transcribe_speech(model, audio, {})
+
+    assert model.lengths[0] < len(audio)
+    segment = result["segments"][0]
+    assert segment["start"] == pytest.approx(3.0, abs=0.05)
+    assert segment["end"] == pytest.approx(4.0, abs=0.05)
+    assert result["vad"]["regions"] == 1
+
+
+def test_transcribe_speech_passes_audio_through_when_disabled(monkeypatch):
+    monkeypatch.setattr(vad, "get_vad_settings", lambda: {"enabled": False})
+    model = FakeModel()
+    audio = np.concatenate([_silence(3.0), _tone(1.0)])
+
+    result = vad.transcribe_speech(model, audio, {})
+
+    assert model.lengths == [len(audio)]
+    assert "vad" not in result